@@ -233,6 +233,25 @@ REST_FRAMEWORK = {
 }
 
 
+# -------------------------
+# PAGINATION
+# -------------------------
+# Keyset pagination for /api/projects/ and /api/projects/public/.
+# ROLE_PAGE_SIZE_CAPS is opt-in, e.g. {'Student': 50, 'Anonymous': 30}.
+PROJECT_PAGINATION = {
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+    'ROLE_PAGE_SIZE_CAPS': {},
+}
+
+# Keyset pagination for the notification inbox (/api/notifications/); clients
+# may also send `limit` instead of `page_size`.
+NOTIFICATION_PAGINATION = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 200,
+}
+
+
 # -------------------------
 # STATIC FILES
 # -------------------------
@@ -246,6 +265,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@gpms.edu.ye'
 
+# Notification emails (core/notification_email.py) are sent by the scheduler
+# over one connection: every minute one email per notification, or one digest
+# per user when DIGEST is 'hourly' or 'daily'. Notifications older than
+# MAX_AGE_HOURS are never emailed.
+NOTIFICATION_EMAIL = {
+    'DIGEST': None,
+    'BATCH_SIZE': 200,
+    'MAX_AGE_HOURS': 48,
+}
+
 
 # -------------------------
 # CHANNELS (WebSocket)
@@ -275,16 +304,133 @@ REST_AUTH_SERIALIZERS = {
 CELERY_BROKER_URL = 'redis://localhost:6379'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379'
 
+# Background Excel imports (core/import_jobs.py). BACKEND is 'celery' when a
+# worker is running, 'thread' for an in-process pool, or 'sync' (tests).
+IMPORT_JOBS = {
+    'BACKEND': 'thread',
+    'CHUNK_SIZE': 500,
+    'MAX_WORKERS': 2,
+    'STALE_AFTER': 600,
+}
+
+# Student import validation (core/student_import.py): files with at least
+# POOL_MIN_ROWS rows are checked in a process pool (0 disables it), and the
+# result is cached by file hash so the following commit skips revalidation.
+STUDENT_IMPORT_VALIDATION = {
+    'POOL_MIN_ROWS': 20000,
+    'POOL_WORKERS': None,
+    'CACHE_TIMEOUT': 60 * 30,
+}
+
+# WebSocket push of new notifications (core/notification_push.py): everything
+# a user receives within WINDOW seconds is sent as one message, and messages
+# go to the channel layer BATCH_SIZE at a time. WINDOW = 0 sends right after commit.
+NOTIFICATION_PUSH = {
+    'WINDOW': 0.25,
+    'BATCH_SIZE': 200,
+}
+
+# Invitation expiry (core/invitation_expiry.py): the LOAD_LIMIT nearest pending
+# deadlines are kept in memory and each invitation expires on time; the list is
+# reloaded every RELOAD_INTERVAL seconds to pick up invitations from other processes.
+INVITATION_EXPIRY = {
+    'LOAD_LIMIT': 1000,
+    'RELOAD_INTERVAL': 300,
+}
+
+# Periodic jobs (core/scheduler.py) run only on the worker holding the scheduler
+# lease (core/scheduler_leadership.py). The 'database' backend keeps the lease in
+# a table renewed every LEASE_TTL / 3 seconds; 'file' uses a local flock on
+# LOCK_FILE for single-host deployments.
+SCHEDULER_LEADERSHIP = {
+    'BACKEND': 'database',
+    'LEASE_TTL': 60,
+}
+
+# Notification retention (core/notification_retention.py): notifications older
+# than their type's days (TYPES, else DEFAULT_DAYS) are deleted in primary-key
+# batches of BATCH_SIZE. ARCHIVE_READ moves read ones to NotificationArchive
+# first; ARCHIVE_DAYS, when set, bounds the archive itself.
+NOTIFICATION_RETENTION = {
+    'DEFAULT_DAYS': 90,
+    'TYPES': {},
+    'ARCHIVE_READ': False,
+    'ARCHIVE_DAYS': None,
+    'BATCH_SIZE': 1000,
+}
+
+# Outbox for signal-driven notifications (core/outbox.py): events are written in
+# the same transaction as the change and run in the background (IMPORT_JOBS
+# BACKEND) in batches of BATCH_SIZE. A failing event is retried after
+# RETRY_DELAY seconds, doubling each time, and is marked failed after MAX_ATTEMPTS.
+# Done events older than DONE_DAYS are deleted by the notification retention job.
+OUTBOX = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 60,
+    'DONE_DAYS': 7,
+}
+
+# /api/bulk-fetch/ (core/bulk_fetch.py): tables are streamed in chunks of
+# CHUNK_SIZE rows; a per-table `limit` is capped at MAX_LIMIT.
+BULK_FETCH = {
+    'MAX_LIMIT': 5000,
+    'CHUNK_SIZE': 1000,
+}
+
+# Change log behind /api/sync/?since=<seq> (core/change_log.py): at most PAGE_SIZE
+# entries per request; the cursor does not move past entries younger than
+# SETTLE_SECONDS. Entries older than RETENTION_DAYS are pruned daily in batches
+# of BATCH_SIZE; clients behind the pruned range get reset=true.
+CHANGE_LOG = {
+    'PAGE_SIZE': 1000,
+    'SETTLE_SECONDS': 5,
+    'RETENTION_DAYS': 30,
+    'BATCH_SIZE': 5000,
+}
+
+# Project search index (core/search.py): per-field BM25F WEIGHTS with the usual
+# K1 / B parameters. /api/projects/search/ returns at most MAX_RESULTS projects;
+# `manage.py rebuild_search_index` reindexes BATCH_SIZE projects per transaction.
+SEARCH_INDEX = {
+    'WEIGHTS': {'title': 3.0, 'title_en': 3.0, 'field': 2.0, 'tools': 2.0, 'description': 1.0},
+    'K1': 1.2,
+    'B': 0.75,
+    'MAX_RESULTS': 100,
+    'BATCH_SIZE': 500,
+}
+
+# Fuzzy matching of location names on import (core/fuzzy_names.py): a college,
+# department or program name missing under its parent is compared with its
+# siblings by character-trigram Jaccard similarity. At AUTO_MAP_THRESHOLD it is
+# mapped to the existing row; from SUGGEST_THRESHOLD it is shown on validate.
+LOCATION_MATCHING = {
+    'AUTO_MAP_THRESHOLD': 0.8,
+    'SUGGEST_THRESHOLD': 0.5,
+}
+
 
 # -------------------------
 # CACHES
 # -------------------------
+# The default cache holds version keys and counters that every worker process
+# must see (role profiles, location tree, unread counters, bulk-fetch versions),
+# so it lives in the Redis instance used by CHANNEL_LAYERS / Celery (database 1).
+# `manage.py check --deploy` fails on a per-process backend (core/checks.py).
 CACHES = {
     'default': {
-
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-
-        'LOCATION': 'unique-snowflake'
-
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+        'KEY_PREFIX': 'graduation',
     }
 }
+
+# Role profiles (core/permissions.py) are cached per user under a version
+# key; a role change in one process is seen by the others through the shared cache.
+ROLE_PROFILE_CACHE_TIMEOUT = 60 * 15
+# The location tree (core/location_tree.py) is versioned the same way and
+# invalidated by signals; the timeout is only an upper bound.
+LOCATION_TREE_CACHE_TIMEOUT = 60 * 60 * 24
+# Per-user unread notification counters (core/notification_counters.py);
+# the timeout bounds any drift between concurrent updates.
+NOTIFICATION_COUNTER_TIMEOUT = 60 * 15
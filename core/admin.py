@@ -14,8 +14,10 @@ from .models import (
     GroupMembers, GroupSupervisors, Role, Permission, RolePermission, UserRoles,
     Staff,
     GroupInvitation, ApprovalRequest, NotificationLog, SystemSettings, ApprovalSequence,
-    GroupCreationRequest, GroupMemberApproval,Student, StudentEnrollmentPeriod,CompanyType, Sector, ExternalCompany
+    GroupCreationRequest, GroupMemberApproval,Student, StudentEnrollmentPeriod,CompanyType, Sector, ExternalCompany,
+    ScheduledJobRun,
 )
+from .notification_counters import invalidate_unread_counts
 
 # ============================================================================== 
 # Admin Site Customization
@@ -576,7 +578,9 @@ class NotificationLogAdmin(admin.ModelAdmin):
 
     @admin.action(description='Mark selected notifications as read')
     def mark_as_read(self, request, queryset):
+        recipients = set(queryset.values_list('recipient_id', flat=True))
         queryset.update(is_read=True, read_at=timezone.now())
+        invalidate_unread_counts(*recipients)
         self.message_user(request, f"{queryset.count()} notifications marked as read.")
 
 @admin.register(SystemSettings)
@@ -661,3 +665,13 @@ class ExternalCompanyAdmin(admin.ModelAdmin):
     list_display = ('name', 'company_type', 'sector', 'contact_email', 'contact_phone', 'created_by', 'created_at')
     list_filter = ('company_type', 'sector', 'created_at')
     search_fields = ('name', 'description', 'contact_email', 'contact_phone', 'created_by__name')
+
+# ===============================
+# ScheduledJobRun
+# ===============================
+@admin.register(ScheduledJobRun)
+class ScheduledJobRunAdmin(admin.ModelAdmin):
+    list_display = ('job_id', 'status', 'rows_affected', 'duration_ms', 'owner', 'started_at')
+    list_filter = ('job_id', 'status', 'started_at')
+    search_fields = ('job_id', 'owner', 'error_message')
+    readonly_fields = ('job_id', 'owner', 'status', 'rows_affected', 'duration_ms', 'error_message', 'started_at', 'finished_at')
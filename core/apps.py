@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # إشارات إبطال ملف الأدوار وشجرة المواقع المخزّنة مؤقتاً وتحديث إحصائيات الكليات
+        # وعدادات الإشعارات غير المقروءة ومواعيد انتهاء الدعوات ونسخ جداول bulk-fetch وسجل التغييرات وفهرس البحث
+        from . import permissions  # noqa: F401
+        from . import college_stats  # noqa: F401
+        from . import location_tree  # noqa: F401
+        from . import notification_counters  # noqa: F401
+        from . import invitation_expiry  # noqa: F401
+        from . import bulk_fetch  # noqa: F401
+        from . import change_log  # noqa: F401
+        from . import search  # noqa: F401
+        # إشعارات الدعوات وطلبات الموافقة عبر صندوق الأحداث الصادرة
+        from . import signals  # noqa: F401
+        # فحص النشر: الكاش المشترك بين العمليات
+        from . import checks  # noqa: F401
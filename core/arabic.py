@@ -0,0 +1,40 @@
+# core/arabic.py
+
+"""
+تطبيع النصوص العربية، المكان الوحيد لهذه القواعد في المشروع.
+
+normalize_arabic للمقارنة (وليس للعرض):
+  - حذف التشكيل والتطويل
+  - توحيد أشكال الألف (أ إ آ ٱ -> ا) والياء (ى -> ي) والتاء المربوطة (ة -> ه)
+  - توحيد المسافات وحالة الأحرف اللاتينية
+فيتطابق "جامعة  صنعاء" و"جامعه صنعاء" و"جَامعة صنعاء". النماذج التي يُبحث فيها بالاسم
+تحفظ النتيجة في normalized_name (NormalizedNameMixin في core/models.py).
+
+clean_text للقيم المحفوظة والمعروضة: توحيد المسافات فقط.
+"""
+
+import re
+
+_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_LETTERS = str.maketrans({
+    "\u0623": "\u0627",  # أ
+    "\u0625": "\u0627",  # إ
+    "\u0622": "\u0627",  # آ
+    "\u0671": "\u0627",  # ٱ
+    "\u0649": "\u064a",  # ى
+    "\u0629": "\u0647",  # ة
+})
+
+
+def normalize_arabic(value):
+    if value is None:
+        return ""
+    text = _DIACRITICS.sub("", str(value))
+    text = text.translate(_LETTERS)
+    return " ".join(text.split()).lower()
+
+
+def clean_text(value):
+    if value is None:
+        return ""
+    return " ".join(str(value).split())
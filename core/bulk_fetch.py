@@ -0,0 +1,292 @@
+# core/bulk_fetch.py
+
+"""
+جداول /api/bulk-fetch/ وتنفيذ طلباتها كاستجابة JSON متدفقة.
+
+  - كل جدول يُقرأ بـ values().iterator() ويُكتب على أجزاء، بدون تحميل الجدول في قائمة
+  - limit / after_pk لكل جدول: صفحات بترتيب المفتاح الأساسي، و _meta[table].next_after_pk
+    للصفحة التالية
+  - fields لكل جدول من قائمة مسموحة (BULK_FETCH_FIELDS، نفس حقول /api/sync/): بدون كلمات
+    المرور ولا حقول الجداول المرتبطة (__)
+  - filters لكل جدول من قائمة مسموحة (BULK_FETCH_FILTERS): قيمة مفردة أو قائمة
+  - لكل جدول نسخة (watermark) تتغير مع أي حفظ/حذف عبر الإشارات أدناه (وعمليات bulk
+    تستدعي bump_bulk_fetch_version)؛ إذا أرسل العميل since مساوية للنسخة الحالية لا تُرسل
+    الصفوف ويُعاد _meta[table].unchanged = true
+"""
+
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    AcademicAffiliation, College, Department, Group, GroupMembers, GroupSupervisors,
+    Project, Staff, User, UserRoles,
+)
+
+BULK_FETCH_DEFAULTS = {
+    'MAX_LIMIT': 5000,     # أقصى limit لكل جدول
+    'CHUNK_SIZE': 1000,    # صفوف كل جزء من الاستجابة (وكل دفعة من iterator)
+}
+
+BULK_FETCH_TABLES = {
+    'projects': Project,
+    'groups': Group,
+    'group_members': GroupMembers,
+    'group_supervisors': GroupSupervisors,
+    'users': User,
+    'staff': Staff,
+    'academic_affiliations': AcademicAffiliation,
+    'colleges': College,
+    'departments': Department,
+}
+
+_TABLES_BY_MODEL = {model: table for table, model in BULK_FETCH_TABLES.items()}
+
+# الحقول المسموح طلبها لكل جدول (الاسم أو الاسم مع _id للمفاتيح الأجنبية)؛ SYNC_FIELDS في
+# core/change_log.py تأخذ منها، فالأول في كل قائمة هو المفتاح الأساسي
+BULK_FETCH_FIELDS = {
+    'projects': (
+        'project_id', 'title', 'title_en', 'project_type', 'state', 'university', 'branch', 'college',
+        'department', 'program', 'created_by', 'external_company', 'start_date', 'end_date',
+        'description', 'field', 'tools', 'logo', 'documentation',
+    ),
+    'groups': ('group_id', 'academic_year', 'pattern', 'project'),
+    'group_members': ('id', 'user', 'group'),
+    'group_supervisors': ('id', 'user', 'group', 'type'),
+    'users': ('id', 'username', 'name', 'first_name', 'last_name', 'email', 'phone', 'gender', 'is_active'),
+    'staff': ('staff_id', 'user', 'role', 'Qualification', 'Office_Hours'),
+    'academic_affiliations': (
+        'affiliation_id', 'user', 'university', 'college', 'department', 'Program', 'start_date', 'end_date',
+    ),
+    'colleges': ('cid', 'name_ar', 'name_en', 'branch'),
+    'departments': ('department_id', 'name', 'college'),
+}
+
+# الحقول المسموح الفلترة بها لكل جدول (الاسم أو الاسم مع _id للمفاتيح الأجنبية)
+BULK_FETCH_FILTERS = {
+    'projects': (
+        'state', 'project_type', 'university', 'branch', 'college', 'department', 'program',
+        'created_by', 'external_company', 'start_date', 'end_date',
+    ),
+    'groups': ('project', 'academic_year', 'pattern'),
+    'group_members': ('user', 'group'),
+    'group_supervisors': ('user', 'group', 'type'),
+    'users': ('is_active', 'is_staff', 'gender'),
+    'staff': ('user', 'role'),
+    'academic_affiliations': ('user', 'university', 'college', 'department', 'Program'),
+    'colleges': ('branch',),
+    'departments': ('college',),
+}
+
+
+class BulkFetchError(ValueError):
+    """خطأ في طلب جدول واحد؛ يُعاد في مكان صفوفه"""
+
+
+def bulk_fetch_config():
+    return {**BULK_FETCH_DEFAULTS, **getattr(settings, 'BULK_FETCH', {})}
+
+
+# ---------------------------
+# النسخ (watermarks)
+# ---------------------------
+def _version_key(table):
+    return f'bulk_fetch:version:{table}'
+
+
+def table_versions(tables):
+    keys = {_version_key(t): t for t in tables}
+    found = cache.get_many(keys)
+    for key, table in keys.items():
+        if key not in found:
+            cache.add(key, uuid.uuid4().hex, None)
+            found[key] = cache.get(key)
+    return {table: found[key] for key, table in keys.items()}
+
+
+def bump_bulk_fetch_version(*tables):
+    """
+    إبطال نسخ الجداول (تلقائياً من الإشارات أدناه، ويدوياً بعد bulk_create / update)؛
+    كل عنصر اسم جدول أو نموذج، والنماذج التي لا تُجلب تُتجاهل
+    """
+    tables = [_TABLES_BY_MODEL.get(t, t) for t in tables]
+    tables = [t for t in tables if t in BULK_FETCH_TABLES]
+    if not tables:
+        return
+    _bump(tables)
+    # طلب آخر قد يقرأ البيانات القديمة بالنسخة الجديدة قبل انتهاء المعاملة
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(tables))
+
+
+def _bump(tables):
+    cache.set_many({_version_key(t): uuid.uuid4().hex for t in tables}, None)
+
+
+# ---------------------------
+# تجهيز الطلبات
+# ---------------------------
+def _fields(table, raw):
+    allowed = BULK_FETCH_FIELDS[table]
+    if not raw:
+        return list(allowed)
+    if not isinstance(raw, list):
+        raise BulkFetchError('fields must be a list')
+    for name in raw:
+        field = name[:-3] if isinstance(name, str) and name.endswith('_id') else name
+        if not isinstance(name, str) or '__' in name or (name not in allowed and field not in allowed):
+            raise BulkFetchError(f'field not allowed: {name}')
+    return raw
+
+
+def _filters(table, model, raw):
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise BulkFetchError('filters must be an object')
+    allowed = BULK_FETCH_FILTERS.get(table, ())
+    lookups = {}
+    for name, value in raw.items():
+        field = name[:-3] if name.endswith('_id') and name[:-3] in allowed else name
+        if field not in allowed:
+            raise BulkFetchError(f'filter not allowed: {name}')
+        if isinstance(value, list):
+            lookups[f'{field}__in'] = value
+        else:
+            lookups[field] = value
+    return lookups
+
+
+def scope_queryset(table, qs, user):
+    """الجهة الخارجية ترى مشاريعها فقط"""
+    if table == 'projects' and UserRoles.objects.filter(user=user, role__type__icontains='External').exists():
+        return qs.filter(created_by=user)
+    return qs
+
+
+def _positive_int(value, name):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise BulkFetchError(f'{name} must be an integer')
+    if value < 0:
+        raise BulkFetchError(f'{name} must be positive')
+    return value
+
+
+def plan_request(spec, user, version):
+    """
+    طلب جدول واحد -> dict فيه queryset جاهز (الحقول والفلاتر تُتحقق هنا قبل بدء الاستجابة)
+    """
+    table = spec.get('table')
+    model = BULK_FETCH_TABLES.get(table)
+    if model is None:
+        raise BulkFetchError('unsupported table')
+    pk = model._meta.pk.name
+    fields = _fields(table, spec.get('fields'))
+
+    plan = {'table': table, 'fields': fields, 'version': version, 'limit': None, 'unchanged': False}
+    if spec.get('since') and spec['since'] == version:
+        plan['unchanged'] = True
+        return plan
+
+    try:
+        qs = scope_queryset(table, model.objects.filter(**_filters(table, model, spec.get('filters'))), user)
+
+        paged = spec.get('limit') is not None or spec.get('after_pk') is not None
+        if spec.get('after_pk') is not None:
+            qs = qs.filter(pk__gt=_positive_int(spec['after_pk'], 'after_pk'))
+        if paged:
+            limit = _positive_int(spec.get('limit', bulk_fetch_config()['MAX_LIMIT']), 'limit')
+            plan['limit'] = min(limit, bulk_fetch_config()['MAX_LIMIT'])
+            qs = qs.order_by(pk)
+        # المفتاح الأساسي مطلوب لمؤشر الصفحة التالية حتى لو لم يطلبه العميل
+        plan['pk_alias'] = None if pk in fields or not paged else '_bulk_fetch_pk'
+        expressions = {plan['pk_alias']: F(model._meta.pk.attname)} if plan['pk_alias'] else {}
+        plan['queryset'] = qs.values(*fields, **expressions)
+        plan['pk'] = plan['pk_alias'] or pk
+    except (FieldError, ValueError, TypeError) as e:
+        raise BulkFetchError(str(e))
+    return plan
+
+
+# ---------------------------
+# الاستجابة المتدفقة
+# ---------------------------
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _stream_rows(plan, meta):
+    chunk_size = bulk_fetch_config()['CHUNK_SIZE']
+    qs = plan['queryset']
+    limit = plan['limit']
+    if limit is not None:
+        qs = qs[:limit + 1]  # صف إضافي لمعرفة وجود صفحة تالية
+
+    yield '['
+    buffer = []
+    count = 0
+    last_pk = None
+    for row in qs.iterator(chunk_size=chunk_size):
+        if limit is not None and count == limit:
+            meta['next_after_pk'] = last_pk
+            break
+        last_pk = row[plan['pk']] if limit is not None else None
+        if plan['pk_alias']:
+            del row[plan['pk_alias']]
+        buffer.append(_dumps(row))
+        count += 1
+        if len(buffer) >= chunk_size:
+            yield (',' if count > len(buffer) else '') + ','.join(buffer)
+            buffer = []
+    if buffer:
+        yield (',' if count > len(buffer) else '') + ','.join(buffer)
+    yield ']'
+    meta['count'] = count
+
+
+def stream_bulk_fetch(plans):
+    """
+    plans: [(table, plan أو {'error': ...})] -> أجزاء نص JSON:
+    {"table": [rows] أو {"error"}, ..., "_meta": {table: {watermark, count, next_after_pk, unchanged}}}
+    """
+    yield '{'
+    meta = {}
+    for i, (table, plan) in enumerate(plans):
+        yield (',' if i else '') + _dumps(table) + ':'
+        if 'error' in plan:
+            yield _dumps({'error': plan['error']})
+            continue
+        table_meta = meta[table] = {'watermark': plan['version']}
+        if plan['unchanged']:
+            table_meta['unchanged'] = True
+            yield '[]'
+            continue
+        yield from _stream_rows(plan, table_meta)
+    yield (',' if plans else '') + '"_meta":' + _dumps(meta) + '}'
+
+
+# ---------------------------
+# إشارات الإبطال
+# ---------------------------
+# sender لكل نموذج: مستقبل بدون sender يمنع Django من الحذف السريع (fast delete) لكل الجداول
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=GroupMembers)
+@receiver([post_save, post_delete], sender=GroupSupervisors)
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Staff)
+@receiver([post_save, post_delete], sender=AcademicAffiliation)
+@receiver([post_save, post_delete], sender=College)
+@receiver([post_save, post_delete], sender=Department)
+def _table_changed(sender, **kwargs):
+    bump_bulk_fetch_version(sender)
@@ -0,0 +1,250 @@
+# core/change_log.py
+
+"""
+سجل التغييرات لجداول الواجهة ومزامنتها بالفروقات عبر /api/sync/?since=<seq>.
+
+  - كل حفظ/حذف لصف في CHANGE_LOG_TABLES يُضاف كـ ChangeLogEntry (table, object_id, op) عبر
+    post_save / post_delete؛ عمليات bulk تستدعي record_changes يدوياً
+  - المدخلات تُكتب بعد نجاح المعاملة (on_commit) دفعة واحدة لكل معاملة: seq يُحجز عند الكتابة،
+    فمعاملة طويلة (استيراد طلاب) لا تحجز تسلسلات منخفضة يتجاوزها المؤشر قبل أن تُرى؛
+    المعاملة الملغاة لا تكتب شيئاً
+  - الحفظ بـ update_fields لا تشمل حقلاً من SYNC_FIELDS (last_login، ملخص التقييم) لا يُسجل
+  - changes_since يجمع آخر عملية لكل صف بعد since: upsert بالحقول المختصرة للصفوف الموجودة
+    و delete بالمعرفات فقط
+  - المؤشر التالي (next) لا يتجاوز مدخلات أحدث من SETTLE_SECONDS: كتابات السجل المتزامنة
+    قد تُرى خارج ترتيبها، فالمدخلات الحديثة تُعاد مرة أخرى في الطلب التالي (التطبيق idempotent)؛
+    صفحة لم يتقدم فيها المؤشر تعيد has_more = false فينتظر العميل الاستطلاع التالي
+  - prune_change_log يحذف الأقدم من RETENTION_DAYS على دفعات ويبقي آخر مدخل دائماً؛ عميل
+    مؤشره أقدم من أول مدخل محفوظ يحصل على reset = true ويعيد التحميل الكامل (bulk-fetch)
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .bulk_fetch import BULK_FETCH_FIELDS, scope_queryset
+from .models import (
+    ChangeLogEntry, College, Department, Group, GroupMembers, GroupSupervisors, Program, Project, User,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_DEFAULTS = {
+    'PAGE_SIZE': 1000,       # مدخلات السجل في كل طلب مزامنة
+    'SETTLE_SECONDS': 5,     # المدخلات الأحدث لا يتقدم بعدها المؤشر
+    'RETENTION_DAYS': 30,
+    'BATCH_SIZE': 5000,      # حذف السجل القديم على دفعات
+}
+
+# نفس أسماء جداول /api/bulk-fetch/
+CHANGE_LOG_TABLES = {
+    'projects': Project,
+    'groups': Group,
+    'group_members': GroupMembers,
+    'group_supervisors': GroupSupervisors,
+    'users': User,
+    'colleges': College,
+    'departments': Department,
+    'programs': Program,
+}
+
+# الحقول المرسلة لكل صف معدل (المفاتيح الأجنبية كمعرفات): نفس قائمة bulk-fetch المسموحة
+SYNC_FIELDS = {
+    **{table: BULK_FETCH_FIELDS[table] for table in CHANGE_LOG_TABLES if table in BULK_FETCH_FIELDS},
+    'programs': ('pid', 'p_name', 'department', 'duration'),
+}
+
+
+def change_log_config():
+    return {**CHANGE_LOG_DEFAULTS, **getattr(settings, 'CHANGE_LOG', {})}
+
+
+# ---------------------------
+# الكتابة
+# ---------------------------
+_TABLES_BY_MODEL = {model: table for table, model in CHANGE_LOG_TABLES.items()}
+
+
+class _PendingEntries(list):
+    """
+    مدخلات معاملة واحدة، مسجلة كاستدعاء on_commit لهذه المعاملة؛ إذا أُلغيت المعاملة
+    (rollback) يُحذف الاستدعاء مع مدخلاته
+    """
+    flushed = False
+
+    def __call__(self):
+        self.flushed = True
+        ChangeLogEntry.objects.bulk_create(self, batch_size=change_log_config()['BATCH_SIZE'])
+
+
+def _pending_entries():
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return None
+    for entry in connection.run_on_commit:
+        if isinstance(entry[1], _PendingEntries) and not entry[1].flushed:
+            return entry[1]
+    pending = _PendingEntries()
+    transaction.on_commit(pending)
+    return pending
+
+
+def _log(table, object_ids, op):
+    pending = _pending_entries()
+    autocommit = pending is None
+    if autocommit:
+        pending = _PendingEntries()
+    pending.extend(ChangeLogEntry(table=table, object_id=pk, op=op) for pk in object_ids)
+    if autocommit:
+        pending()
+
+
+def record_changes(table, object_ids, op):
+    """
+    تسجيل عملية واحدة لعدة صفوف (بعد bulk_create / bulk_update)؛ table اسم الجدول أو
+    النموذج، والنماذج غير المتتبعة تُتجاهل
+    """
+    table = _TABLES_BY_MODEL.get(table, table)
+    if table not in CHANGE_LOG_TABLES:
+        return
+    _log(table, object_ids, op)
+
+
+def _synced_fields(table):
+    return {CHANGE_LOG_TABLES[table]._meta.get_field(name).name for name in SYNC_FIELDS[table]}
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=GroupMembers)
+@receiver(post_save, sender=GroupSupervisors)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=College)
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Program)
+def _row_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    table = _TABLES_BY_MODEL[sender]
+    if raw:
+        return
+    if update_fields and not set(update_fields) & _synced_fields(table):
+        return
+    _log(table, [instance.pk], 'insert' if created else 'update')
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=GroupMembers)
+@receiver(post_delete, sender=GroupSupervisors)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=College)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Program)
+def _row_deleted(sender, instance, **kwargs):
+    _log(_TABLES_BY_MODEL[sender], [instance.pk], 'delete')
+
+
+# ---------------------------
+# القراءة
+# ---------------------------
+def latest_seq():
+    return ChangeLogEntry.objects.aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def changes_since(since, user, tables=None, limit=None, now=None):
+    """
+    الفروقات بعد since:
+    {'since', 'next', 'has_more', 'reset', 'changes': {table: {'upsert': [rows], 'delete': [ids]}}}
+    """
+    config = change_log_config()
+    limit = limit or config['PAGE_SIZE']
+    now = now or timezone.now()
+
+    oldest = ChangeLogEntry.objects.aggregate(seq=Min('seq'))['seq']
+    if oldest is not None and since < oldest - 1:
+        # مدخلات لم يرها العميل حُذفت من السجل
+        return {'since': since, 'next': latest_seq(), 'has_more': False, 'reset': True, 'changes': {}}
+
+    entries = ChangeLogEntry.objects.filter(seq__gt=since)
+    if tables:
+        entries = entries.filter(table__in=tables)
+    entries = list(entries.order_by('seq').values_list('seq', 'table', 'object_id', 'op', 'created_at')[:limit])
+
+    settled_before = now - timedelta(seconds=config['SETTLE_SECONDS'])
+    next_seq = since
+    settled = True
+    latest_ops = {}
+    for seq, table, object_id, op, created_at in entries:
+        # المؤشر يتقدم فقط على البادئة المستقرة من المدخلات
+        settled = settled and created_at <= settled_before
+        if settled:
+            next_seq = seq
+        latest_ops.setdefault(table, {})[object_id] = op
+
+    changes = {}
+    for table, ops in latest_ops.items():
+        model = CHANGE_LOG_TABLES.get(table)
+        if model is None:
+            continue
+        live = [pk for pk, op in ops.items() if op != 'delete']
+        rows = []
+        if live:
+            rows = list(scope_queryset(table, model.objects.filter(pk__in=live), user).values(*SYNC_FIELDS[table]))
+        found = {row[model._meta.pk.name] for row in rows}
+        # صف حُذف بعد آخر مدخل في هذه الصفحة (أو خارج نطاق المستخدم) يُرسل كحذف
+        deleted = sorted(pk for pk in ops if pk not in found)
+        changes[table] = {'upsert': rows, 'delete': deleted}
+
+    return {
+        'since': since,
+        'next': next_seq,
+        # صفحة كاملة غير مستقرة: لا فائدة من طلب فوري بنفس المؤشر
+        'has_more': len(entries) == limit and next_seq != since,
+        'reset': False,
+        'changes': changes,
+    }
+
+
+# ---------------------------
+# الاحتفاظ
+# ---------------------------
+def prune_change_log(now=None, days=None, batch_size=None):
+    """
+    حذف المدخلات الأقدم من RETENTION_DAYS على دفعات (آخر مدخل يبقى دائماً)؛ يعيد تقريراً:
+    {'job', 'rows', 'batches', 'duration_ms'}
+    """
+    started = time.monotonic()
+    config = change_log_config()
+    now = now or timezone.now()
+    days = config['RETENTION_DAYS'] if days is None else days
+    batch_size = batch_size or config['BATCH_SIZE']
+
+    expired = ChangeLogEntry.objects.filter(
+        created_at__lt=now - timedelta(days=days), seq__lt=latest_seq(),
+    )
+    deleted = batches = 0
+    while True:
+        ids = list(expired.order_by('seq').values_list('seq', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            deleted += ChangeLogEntry.objects.filter(seq__in=ids).delete()[0]
+        batches += 1
+        if len(ids) < batch_size:
+            break
+
+    report = {
+        'job': 'prune_change_log',
+        'rows': deleted,
+        'batches': batches,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+    }
+    if deleted:
+        logger.info("prune_change_log: %(rows)s entries deleted in %(batches)s batches (%(duration_ms)sms)", report)
+    return report
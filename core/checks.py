@@ -0,0 +1,30 @@
+# core/checks.py
+
+"""
+فحوص النشر (manage.py check --deploy).
+
+  - core.E001: الكاش الافتراضي يجب أن يكون مشتركاً بين العمليات (Redis...)؛ مفاتيح النسخ
+    (ملفات الأدوار، شجرة المواقع، bulk-fetch) وعدادات الإشعارات غير المقروءة في كاش خاص
+    بكل عملية لا تصل تغييراتها إلى العمليات الأخرى
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs=None, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHE_BACKENDS:
+        return []
+    return [Error(
+        f"CACHES['default'] uses {backend}, which is not shared between worker processes.",
+        hint="Use a shared backend such as django.core.cache.backends.redis.RedisCache: role profile, "
+             "location tree and bulk-fetch versions and unread counters must be seen by every worker.",
+        id='core.E001',
+    )]
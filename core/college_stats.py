@@ -0,0 +1,253 @@
+# core/college_stats.py
+
+"""
+إحصائيات لوحة العميد المخزنة في CollegeStats.
+
+كل تغيير على الانتماءات / الأدوار / المشاريع / روابط البرامج / طلبات الموافقة
+يسجّل الكليات المتأثرة فقط، وبعد نجاح المعاملة (on_commit) يُعاد حساب صفوف هذه
+الكليات دفعة واحدة باستعلامات مجمّعة (GROUP BY college)، مهما كان عدد
+التغييرات داخل المعاملة. أمر rebuild_college_stats يعيد بناء كل الكليات.
+"""
+
+import logging
+
+from asgiref.local import Local
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .arabic import normalize_arabic
+from .models import (
+    AcademicAffiliation, ApprovalRequest, College, CollegeStats,
+    Program, Project, Role, UserRoles, programgroup,
+)
+
+logger = logging.getLogger(__name__)
+
+# نفس مطابقة dean_stats القديمة: type أو role_type بدون حساسية لحالة الأحرف
+STUDENT_ROLE_TYPES = ['student']
+SUPERVISOR_ROLE_TYPES = ['supervisor']
+CO_SUPERVISOR_ROLE_TYPES = ['co-supervisor', 'co_supervisor']
+
+_pending = Local()
+
+
+def _role_q(prefix, role_types):
+    """
+    جدول الأدوار صغير: نطابق الأسماء مرة واحدة في الذاكرة ثم role_id IN (...) بدون
+    ربط جدول Role و iexact لكل صف
+    """
+    wanted = {normalize_arabic(t) for t in role_types}
+    role_ids = [
+        pk for pk, type_, role_type in Role.objects.values_list('pk', 'type', 'role_type')
+        if normalize_arabic(type_) in wanted or normalize_arabic(role_type) in wanted
+    ]
+    return Q(**{f'{prefix}__in': role_ids})
+
+
+# ---------------------------
+# إعادة الحساب
+# ---------------------------
+def compute_college_stats(college_ids=None):
+    """
+    {college_id: {field: count}} للكليات المعطاة (أو كل الكليات)
+    """
+    colleges = College.objects.all()
+    if college_ids is not None:
+        # الكليات المحذوفة تُتجاهل (صفها يُحذف مع الكلية)
+        colleges = colleges.filter(cid__in=[cid for cid in set(college_ids) if cid])
+    college_ids = list(colleges.values_list('cid', flat=True))
+    stats = {
+        cid: {
+            'students': 0, 'supervisors': 0, 'co_supervisors': 0,
+            'projects': 0, 'groups': 0, 'pending_approvals': 0,
+        }
+        for cid in college_ids
+    }
+    if not stats:
+        return stats
+
+    role = 'user__userroles__role'
+    users = (
+        AcademicAffiliation.objects.filter(college_id__in=college_ids)
+        .values('college_id')
+        .annotate(
+            students=Count('user', filter=_role_q(role, STUDENT_ROLE_TYPES), distinct=True),
+            supervisors=Count('user', filter=_role_q(role, SUPERVISOR_ROLE_TYPES), distinct=True),
+            co_supervisors=Count('user', filter=_role_q(role, CO_SUPERVISOR_ROLE_TYPES), distinct=True),
+        )
+    )
+    for row in users:
+        stats[row['college_id']].update(
+            students=row['students'],
+            supervisors=row['supervisors'],
+            co_supervisors=row['co_supervisors'],
+        )
+
+    projects = (
+        Project.objects.filter(college_id__in=college_ids)
+        .values('college_id')
+        .annotate(n=Count('project_id'))
+    )
+    for row in projects:
+        stats[row['college_id']]['projects'] = row['n']
+
+    groups = (
+        programgroup.objects.filter(program__department__college_id__in=college_ids)
+        .values('program__department__college_id')
+        .annotate(n=Count('group_id', distinct=True))
+    )
+    for row in groups:
+        stats[row['program__department__college_id']]['groups'] = row['n']
+
+    # طلب الموافقة يتبع كلية المشروع
+    pending = (
+        ApprovalRequest.objects.filter(status='pending', project__college_id__in=college_ids)
+        .values('project__college_id')
+        .annotate(n=Count('approval_id'))
+    )
+    for row in pending:
+        stats[row['project__college_id']]['pending_approvals'] = row['n']
+
+    return stats
+
+
+def refresh_college_stats(college_ids=None):
+    """
+    إعادة حساب صفوف CollegeStats وحفظها، وإرجاع عدد الصفوف المحدثة
+    """
+    stats = compute_college_stats(college_ids)
+    if not stats:
+        return 0
+
+    existing = set(
+        CollegeStats.objects.filter(college_id__in=stats.keys()).values_list('college_id', flat=True)
+    )
+    fields = ['students', 'supervisors', 'co_supervisors', 'projects', 'groups', 'pending_approvals']
+    now = timezone.now()  # bulk_update لا يطبق auto_now
+    rows = [CollegeStats(college_id=cid, updated_at=now, **values) for cid, values in stats.items()]
+
+    with transaction.atomic():
+        CollegeStats.objects.bulk_create([r for r in rows if r.college_id not in existing])
+        CollegeStats.objects.bulk_update([r for r in rows if r.college_id in existing], fields + ['updated_at'])
+    return len(rows)
+
+
+def get_college_stats(college_id):
+    """
+    صف الإحصائيات للكلية (يُنشأ عند أول طلب إذا لم يكن موجوداً)
+    """
+    row = CollegeStats.objects.filter(college_id=college_id).first()
+    if row is None:
+        refresh_college_stats([college_id])
+        row = CollegeStats.objects.filter(college_id=college_id).first()
+    return row
+
+
+# ---------------------------
+# تجميع التحديثات حتى نهاية المعاملة
+# ---------------------------
+def _flush_pending():
+    college_ids = getattr(_pending, 'college_ids', None) or set()
+    _pending.college_ids = None
+    if not college_ids:
+        return
+    try:
+        refresh_college_stats(college_ids)
+    except Exception:
+        # الإحصائيات ليست حرجة: لا نفشل الطلب، ويمكن إصلاحها بـ rebuild_college_stats
+        logger.exception("Failed to refresh college stats for %s", sorted(college_ids))
+
+
+def mark_colleges_dirty(*college_ids):
+    college_ids = {cid for cid in college_ids if cid}
+    if not college_ids:
+        return
+    pending = getattr(_pending, 'college_ids', None)
+    fresh = pending is None
+    if fresh:
+        pending = _pending.college_ids = set()
+    pending.update(college_ids)
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _flush_pending()
+        return
+    # استدعاء واحد لكل معاملة، ويُعاد تسجيله إذا أُلغي مع rollback
+    if fresh or not any(entry[1] is _flush_pending for entry in connection.run_on_commit):
+        transaction.on_commit(_flush_pending)
+
+
+def _user_college_ids(user_id):
+    return AcademicAffiliation.objects.filter(
+        user_id=user_id, college_id__isnull=False
+    ).values_list('college_id', flat=True)
+
+
+def _touches_college(kwargs):
+    # حفظ جزئي لا يمس الكلية (مثل ملخص التقييمات في Project) لا يغير الإحصائيات
+    update_fields = kwargs.get('update_fields')
+    return update_fields is None or 'college' in update_fields or 'college_id' in update_fields
+
+
+def _remember_old_value(sender, instance, field):
+    """pre_save: يحفظ القيمة القديمة للحقل حتى تُحدَّث الكلية السابقة أيضاً"""
+    old = None
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    instance._college_stats_old = old
+
+
+# ---------------------------
+# الإشارات
+# ---------------------------
+@receiver(pre_save, sender=AcademicAffiliation)
+@receiver(pre_save, sender=Project)
+def _remember_old_college(sender, instance, **kwargs):
+    if _touches_college(kwargs):
+        _remember_old_value(sender, instance, 'college_id')
+
+
+@receiver(pre_save, sender=ApprovalRequest)
+def _remember_old_approval_project(sender, instance, **kwargs):
+    _remember_old_value(sender, instance, 'project__college_id')
+
+
+@receiver(post_save, sender=AcademicAffiliation)
+@receiver(post_delete, sender=AcademicAffiliation)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def _college_field_changed(sender, instance, **kwargs):
+    if not _touches_college(kwargs):
+        return
+    mark_colleges_dirty(instance.college_id, getattr(instance, '_college_stats_old', None))
+
+
+@receiver(post_save, sender=UserRoles)
+@receiver(post_delete, sender=UserRoles)
+def _user_role_changed(sender, instance, **kwargs):
+    mark_colleges_dirty(*_user_college_ids(instance.user_id))
+
+
+@receiver(post_save, sender=programgroup)
+@receiver(post_delete, sender=programgroup)
+def _program_link_changed(sender, instance, **kwargs):
+    college_id = (
+        Program.objects.filter(pk=instance.program_id)
+        .values_list('department__college_id', flat=True)
+        .first()
+    )
+    mark_colleges_dirty(college_id)
+
+
+@receiver(post_save, sender=ApprovalRequest)
+@receiver(post_delete, sender=ApprovalRequest)
+def _approval_changed(sender, instance, **kwargs):
+    college_id = None
+    if instance.project_id:
+        college_id = (
+            Project.objects.filter(pk=instance.project_id).values_list('college_id', flat=True).first()
+        )
+    mark_colleges_dirty(college_id, getattr(instance, '_college_stats_old', None))
@@ -3,7 +3,9 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.utils import timezone
 from .models import NotificationLog, User
+from .notification_counters import get_unread_counts
 from .serializers import NotificationLogSerializer
 
 
@@ -34,6 +36,9 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         print(f"المستخدم {self.user.username} متصل بـ WebSocket")
+
+        # العدد الحالي عند الاتصال، وبعدها يصل كل تغيير عبر notification_batch
+        await self.send_unread_count(await self.get_unread_counts())
     
     async def disconnect(self, close_code):
         """
@@ -59,11 +64,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 await self.mark_notification_as_read(notification_id)
             
             elif message_type == 'get_unread_count':
-                count = await self.get_unread_count()
-                await self.send(text_data=json.dumps({
-                    'type': 'unread_count',
-                    'count': count
-                }))
+                await self.send_unread_count(await self.get_unread_counts())
         
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -81,6 +82,36 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'type': 'notification',
             'notification': notification_data
         }))
+
+    async def notification_batch(self, event):
+        """
+        الإشعارات الجديدة للمستخدم خلال نافذة التجميع مع العدد الأخير (core/notification_push.py)
+        """
+        notifications = event['notifications']
+        if len(notifications) == 1:
+            await self.notification_message({'notification': notifications[0]})
+        elif notifications:
+            await self.send(text_data=json.dumps({
+                'type': 'notifications',
+                'notifications': notifications
+            }))
+        await self.send_unread_count(event)
+
+    async def send_unread_count(self, counts):
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'count': counts['count'],
+            'by_type': counts['by_type']
+        }))
+
+    async def import_job_progress(self, event):
+        """
+        تقدم مهمة استيراد في الخلفية (core/import_jobs.py)
+        """
+        await self.send(text_data=json.dumps({
+            'type': 'import_job',
+            'job': event['job']
+        }))
     
     @database_sync_to_async
     def mark_notification_as_read(self, notification_id):
@@ -93,20 +124,18 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 recipient=self.user
             )
             notification.is_read = True
+            notification.read_at = timezone.now()
             notification.save()
             return True
         except NotificationLog.DoesNotExist:
             return False
     
     @database_sync_to_async
-    def get_unread_count(self):
+    def get_unread_counts(self):
         """
-        الحصول على عدد الإشعارات غير المقروءة
+        الحصول على عدد الإشعارات غير المقروءة (الإجمالي وحسب النوع) من العدادات
         """
-        return NotificationLog.objects.filter(
-            recipient=self.user,
-            is_read=False
-        ).count()
+        return get_unread_counts(self.user_id)
 
 
 class ApprovalConsumer(AsyncWebsocketConsumer):
@@ -0,0 +1,105 @@
+# core/fuzzy_names.py
+
+"""
+مطابقة تقريبية لأسماء المواقع (كلية، قسم، برنامج) في الاستيراد.
+
+  - مفتاح الاسم: كلماته بعد normalize_arabic مع حذف "ال" والحروف الملتصقة بها
+    (strip_article في core/search.py)، فـ "كليه هندسه" و "كلية الهندسة" مفتاح واحد؛
+    الأرقام والكلمات القصيرة تبقى جزءاً من المفتاح
+  - NameIndex فهرس مقلوب في الذاكرة: ثلاثية حروف (trigram) -> الأسماء التي تحتويها،
+    والتشابه Jaccard = |المشترك| / |الاتحاد| محسوب من عدّ الثلاثيات المشتركة للمرشحين فقط
+  - best(name) يعيد أفضل اسم ودرجته؛ can_auto_map لا يربط عند تساوي أفضل اسمين ولا عند
+    اختلاف الأرقام ("فيزياء 1" و "فيزياء 2" اسمان مختلفان مهما كانت الدرجة)
+  - العتبات من LOCATION_MATCHING: AUTO_MAP_THRESHOLD للربط التلقائي بالموجود،
+    SUGGEST_THRESHOLD لاقتراح الاسم في مرحلة التحقق
+"""
+
+import re
+from collections import Counter, namedtuple
+
+from django.conf import settings
+
+from .arabic import normalize_arabic
+from .search import strip_article
+
+LOCATION_MATCHING_DEFAULTS = {
+    'AUTO_MAP_THRESHOLD': 0.8,
+    'SUGGEST_THRESHOLD': 0.5,
+}
+
+NGRAM = 3
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d+")
+
+NameMatch = namedtuple("NameMatch", "name score ambiguous")
+
+
+def location_matching_config():
+    return {**LOCATION_MATCHING_DEFAULTS, **getattr(settings, 'LOCATION_MATCHING', {})}
+
+
+def match_key(name):
+    """الاسم بالشكل الذي تُقارن به الثلاثيات"""
+    return " ".join(strip_article(word) for word in _WORD.findall(normalize_arabic(name))) or normalize_arabic(name)
+
+
+def numbers(name):
+    """الأرقام في الاسم كقيم (١ و 1 رقم واحد)"""
+    return sorted(int(number) for number in _NUMBER.findall(name))
+
+
+def can_auto_map(name, match, threshold):
+    """match (NameMatch لـ name) تطابق مؤكدة: فوق العتبة، بلا تعادل، وبنفس الأرقام"""
+    return (
+        match is not None
+        and match.score >= threshold
+        and not match.ambiguous
+        and numbers(name) == numbers(match.name)
+    )
+
+
+def ngrams(name):
+    padded = f" {match_key(name)} "
+    return {padded[i:i + NGRAM] for i in range(max(len(padded) - NGRAM + 1, 1))}
+
+
+class NameIndex:
+    """
+    فهرس ثلاثيات لقائمة أسماء تنمو فقط (add)؛ يُبنى مرة واحدة لكل استيراد
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self._sizes = []
+        self._postings = {}   # ثلاثية -> [مواقع الأسماء في self.names]
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        grams = ngrams(name)
+        position = len(self.names)
+        self.names.append(name)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(position)
+
+    def best(self, name):
+        """NameMatch لأقرب اسم، أو None إذا لا يشترك أي اسم في ثلاثية"""
+        grams = ngrams(name)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        if not shared:
+            return None
+        top = second = 0.0
+        top_position = None
+        for position, common in shared.items():
+            score = common / (len(grams) + self._sizes[position] - common)
+            if score > top:
+                top, second, top_position = score, top, position
+            elif score > second:
+                second = score
+        return NameMatch(self.names[top_position], top, ambiguous=second == top)
@@ -0,0 +1,276 @@
+# core/import_jobs.py
+
+"""
+مهام استيراد Excel في الخلفية (مستخدمين / مشاريع / طلاب).
+
+  - start_import_job يحفظ الملف المرفوع وينشئ ImportJob ثم يرسلها للعامل بعد نجاح المعاملة
+  - العامل: مهمة Celery (tasks.run_import_job_task) أو مجمع خيوط محلي أو تنفيذ مباشر،
+    حسب IMPORT_JOBS['BACKEND'] في settings.py
+  - run_import_job يقرأ الملف ويتحقق منه ثم يكتب الصفوف على دفعات، كل دفعة في معاملة
+    مستقلة يتقدم معها next_row، فالمهمة الفاشلة تُستأنف من آخر دفعة محفوظة
+  - بعد كل دفعة يُرسل التقدم (الصفوف المعالجة، الأخطاء، الوقت المتبقي) إلى مجموعة
+    notifications_{user_id} في WebSocket، ويمكن أيضاً الاستعلام عنه من /api/import-jobs/<id>/
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+IMPORT_JOB_DEFAULTS = {
+    'BACKEND': 'thread',   # 'celery' | 'thread' | 'sync'
+    'CHUNK_SIZE': 500,
+    'MAX_WORKERS': 2,
+    'STALE_AFTER': 600,    # ثوانٍ بدون تقدم قبل اعتبار مهمة "running" متوقفة
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def import_job_config():
+    return {**IMPORT_JOB_DEFAULTS, **getattr(settings, 'IMPORT_JOBS', {})}
+
+
+# ---------------------------
+# معالجات أنواع الاستيراد
+# ---------------------------
+class UsersImportHandler:
+    """core/views/import_views.py: نفس التحقق والكتابة في طلب HTTP"""
+
+    def load(self, job, file_obj):
+        from .views.import_views import read_excel, validate_rows
+        rows, file_errors = read_excel(file_obj)
+        if file_errors:
+            return None, file_errors
+        valid, errors = validate_rows(rows)
+        if errors:
+            return None, errors
+        return valid, []
+
+    def write(self, job, chunk):
+        from .views.import_views import commit_user_rows
+        return commit_user_rows(chunk), []
+
+
+class ProjectsImportHandler:
+    """core/views/import_projects.py"""
+
+    def load(self, job, file_obj):
+        from .locations import LocationResolver
+        from .views.import_projects import read_excel_projects
+        rows, file_errors = read_excel_projects(file_obj)
+        if file_errors:
+            return None, file_errors
+        self.locations = LocationResolver()
+        return rows, []
+
+    def write(self, job, chunk):
+        from .views.import_projects import commit_project_rows
+        return commit_project_rows(chunk, locations=self.locations)
+
+
+class StudentsImportHandler:
+    """core/views/ImportStudents.py + core/student_import.py"""
+
+    def load(self, job, file_obj):
+        from .locations import LocationResolver
+        from .student_import import commit_validation, read_excel_students
+        from .views.ImportStudents import parse_preselected
+        self.preselected = parse_preselected(job.options)
+        rows, file_errors = read_excel_students(file_obj)
+        if file_errors:
+            return None, file_errors
+        errors, _ = commit_validation(file_obj, rows, preselected=self.preselected)
+        if errors:
+            return None, errors
+        # خريطة المواقع تُحمّل مرة واحدة لكل تشغيل وتُشارك بين الدفعات
+        self.locations = LocationResolver()
+        return rows, []
+
+    def write(self, job, chunk):
+        from .student_import import StudentImporter
+        importer = StudentImporter(preselected=self.preselected, locations=self.locations)
+        return importer.run(chunk)
+
+
+IMPORT_HANDLERS = {
+    'users': UsersImportHandler,
+    'projects': ProjectsImportHandler,
+    'students': StudentsImportHandler,
+}
+
+
+# ---------------------------
+# الإنشاء والإرسال للعامل
+# ---------------------------
+def wants_background(request):
+    """background=1 في النموذج أو في الرابط يحول الاستيراد إلى مهمة في الخلفية"""
+    value = request.data.get('background') or request.query_params.get('background') or ''
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def start_import_job(kind, uploaded_file, user, options=None):
+    uploaded_file.seek(0)  # الملف قُرئ مسبقاً للتحقق
+    job = ImportJob(kind=kind, created_by=user, options=options or {})
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+    transaction.on_commit(lambda: dispatch_import_job(job.pk))
+    return job
+
+
+def resume_import_job(job):
+    """
+    إعادة إرسال مهمة فاشلة (أو متوقفة) للعامل؛ تستكمل من job.next_row.
+    يعيد False إذا كانت المهمة مكتملة أو ما زالت تعمل.
+    """
+    if job.status == 'completed' or (job.status == 'running' and not is_stale(job)):
+        return False
+    transaction.on_commit(lambda: dispatch_import_job(job.pk))
+    return True
+
+
+def is_stale(job):
+    stale_after = timedelta(seconds=import_job_config()['STALE_AFTER'])
+    return job.updated_at is not None and timezone.now() - job.updated_at > stale_after
+
+
+def dispatch_import_job(job_id):
+    backend = import_job_config()['BACKEND']
+    if backend == 'celery':
+        from .tasks import run_import_job_task
+        run_import_job_task.delay(job_id)
+    elif backend == 'sync':
+        run_import_job(job_id)
+    else:
+        run_in_background(run_import_job, job_id)
+
+
+def run_in_background(func, *args):
+    """تنفيذ func في مجمع الخيوط المحلي (BACKEND = 'thread')؛ تستخدمه أيضاً مهام الإشعارات"""
+    _get_executor().submit(_run_in_thread, func, *args)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=import_job_config()['MAX_WORKERS'],
+                thread_name_prefix='import-job',
+            )
+        return _executor
+
+
+def _run_in_thread(func, *args):
+    try:
+        func(*args)
+    finally:
+        # اتصالات قاعدة البيانات خاصة بكل خيط
+        connections.close_all()
+
+
+# ---------------------------
+# التنفيذ
+# ---------------------------
+def _claim(job_id):
+    """حجز المهمة للتشغيل (مرة واحدة فقط حتى مع إرسال مكرر)"""
+    with transaction.atomic():
+        job = ImportJob.objects.select_for_update().filter(pk=job_id).first()
+        if job is None or job.status == 'completed':
+            return None
+        if job.status == 'running' and not is_stale(job):
+            return None
+        if job.next_row == 0:
+            job.errors = []
+            job.result = {}
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.finished_at = None
+        job.resumed_from = job.next_row
+        job.error_message = ''
+        job.save()
+    return job
+
+
+def _merge_stats(total, stats):
+    merged = dict(total)
+    for key, value in stats.items():
+        merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def run_import_job(job_id):
+    job = _claim(job_id)
+    if job is None:
+        return None
+
+    handler = IMPORT_HANDLERS[job.kind]()
+    chunk_size = import_job_config()['CHUNK_SIZE']
+    try:
+        with job.file.open('rb') as file_obj:
+            rows, errors = handler.load(job, file_obj)
+        if errors:
+            job.errors = errors
+            _finish(job, 'failed', 'لا يمكن الاستيراد بسبب وجود أخطاء')
+            return job
+
+        job.total_rows = len(rows)
+        job.save(update_fields=['total_rows', 'updated_at'])
+        push_import_progress(job)
+
+        for start in range(job.next_row, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            with transaction.atomic():
+                stats, row_errors = handler.write(job, chunk)
+                # المؤشر يُحفظ مع بيانات الدفعة في نفس المعاملة
+                job.next_row = job.processed_rows = start + len(chunk)
+                job.result = _merge_stats(job.result, stats)
+                job.errors = job.errors + row_errors
+                job.save(update_fields=['next_row', 'processed_rows', 'result', 'errors', 'updated_at'])
+            push_import_progress(job)
+    except Exception as e:
+        logger.exception("Import job %s failed at row %s", job.pk, job.next_row)
+        # القيم في الذاكرة قد تخص دفعة أُلغيت: نعيد القراءة من قاعدة البيانات
+        job.refresh_from_db()
+        _finish(job, 'failed', str(e))
+        return job
+
+    _finish(job, 'completed')
+    if job.file:
+        job.file.delete(save=False)
+        job.save(update_fields=['file'])
+    return job
+
+
+def _finish(job, status, message=''):
+    job.status = status
+    job.error_message = message
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'errors', 'finished_at', 'updated_at'])
+    push_import_progress(job)
+
+
+def push_import_progress(job):
+    """إرسال التقدم إلى مجموعة الإشعارات الخاصة بصاحب المهمة (NotificationConsumer)"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f'notifications_{job.created_by_id}',
+            {'type': 'import_job_progress', 'job': job.progress()},
+        )
+    except Exception:
+        # WebSocket اختياري: العميل يستطيع الاستعلام عن المهمة
+        logger.warning("Could not push progress of import job %s", job.pk, exc_info=True)
@@ -0,0 +1,219 @@
+# core/invitation_expiry.py
+
+"""
+انتهاء صلاحية الدعوات في وقتها بدل الفحص الدوري لجدول GroupInvitation كاملاً.
+
+  - أقرب LOAD_LIMIT موعد انتهاء للدعوات المعلقة يُحمّل في min-heap من استعلام واحد
+    على الفهرس (status, expires_at)
+  - خيط واحد ينام حتى أقرب موعد ثم يستدعي expire_pending_invitations (UPDATE واحد
+    لكل ما انتهى)، ويُعاد ضبطه على الموعد التالي
+  - إنشاء دعوة أو الرد عليها (post_save بعد نجاح المعاملة) يضيف موعدها أو يلغيه؛
+    الإلغاء كسول: المدخلات القديمة في الـ heap تُتجاوز عند خروجها
+  - الدعوات التي تُنشأ في عمليات أخرى (عمال الويب) لا تصل إشاراتها هنا، لذلك يُعاد
+    التحميل كل RELOAD_INTERVAL ثانية (نفس الاستعلام المفهرس المحدود، وليس مسحاً للجدول)
+
+يبدأ مع NotificationScheduler.start() (core/scheduler.py).
+"""
+
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .invitation_jobs import expire_pending_invitations
+from .models import GroupInvitation
+
+logger = logging.getLogger(__name__)
+
+INVITATION_EXPIRY_DEFAULTS = {
+    'LOAD_LIMIT': 1000,        # أقرب المواعيد المحملة في الذاكرة
+    'RELOAD_INTERVAL': 300,    # ثوانٍ بين إعادة التحميل (دعوات من عمليات أخرى)
+}
+
+
+def invitation_expiry_config():
+    return {**INVITATION_EXPIRY_DEFAULTS, **getattr(settings, 'INVITATION_EXPIRY', {})}
+
+
+class InvitationExpiryScheduler:
+    """
+    min-heap من (expires_at, invitation_id) مع قاموس للموعد الحالي لكل دعوة.
+    load / track / untrack / run_due تعمل بدون الخيط (الاختبارات)؛ start يشغل الخيط.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}    # invitation_id -> expires_at الحالي
+        self._horizon = None    # آخر موعد محمّل إذا لم تُحمّل كل الدعوات
+        self._loaded = False
+        self._loaded_at = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    # ---------------------------
+    # الحالة
+    # ---------------------------
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self):
+        """إعادة بناء الـ heap من أقرب المواعيد (استعلام واحد على (status, expires_at))"""
+        limit = invitation_expiry_config()['LOAD_LIMIT']
+        rows = list(
+            GroupInvitation.objects.filter(status='pending')
+            .order_by('expires_at')
+            .values_list('expires_at', 'invitation_id')[:limit]
+        )
+        with self._cond:
+            self._heap = rows  # مرتبة تصاعدياً: heap صالح
+            self._deadlines = {invitation_id: expires_at for expires_at, invitation_id in rows}
+            self._horizon = rows[-1][0] if len(rows) == limit else None
+            self._loaded = True
+            self._loaded_at = timezone.now()
+            self._cond.notify()
+        return len(rows)
+
+    def reset(self):
+        with self._cond:
+            self._heap = []
+            self._deadlines = {}
+            self._horizon = None
+            self._loaded = False
+            self._loaded_at = None
+
+    def next_deadline(self):
+        with self._cond:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def track(self, invitation_id, expires_at):
+        """دعوة معلقة جديدة أو تغير موعدها"""
+        with self._cond:
+            if not self._loaded:
+                return
+            if self._horizon is not None and expires_at > self._horizon:
+                # خارج المحمّل: تُقرأ عند إعادة التحميل
+                self._deadlines.pop(invitation_id, None)
+                return
+            earliest = self._heap[0][0] if self._heap else None
+            self._deadlines[invitation_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, invitation_id))
+            if earliest is None or expires_at < earliest:
+                self._cond.notify()  # الخيط ينام حتى موعد أبعد
+
+    def untrack(self, invitation_id):
+        """دعوة رُد عليها أو حُذفت"""
+        with self._cond:
+            self._deadlines.pop(invitation_id, None)
+
+    def _drop_stale(self):
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    # ---------------------------
+    # التنفيذ
+    # ---------------------------
+    def run_due(self, now=None):
+        """
+        إنهاء الدعوات التي حان موعدها؛ يعيد تقرير expire_pending_invitations
+        أو None إذا لم يحن أي موعد
+        """
+        now = now or timezone.now()
+        due = False
+        with self._cond:
+            while self._heap and self._heap[0][0] < now:
+                expires_at, invitation_id = heapq.heappop(self._heap)
+                if self._deadlines.get(invitation_id) == expires_at:
+                    del self._deadlines[invitation_id]
+                    due = True
+            exhausted = not self._heap and self._horizon is not None
+        report = expire_pending_invitations(now=now, notify='student') if due else None
+        if exhausted:
+            self.load()
+        return report
+
+    def _seconds_until_next(self, now):
+        self._drop_stale()
+        if not self._heap:
+            return None
+        return (self._heap[0][0] - now).total_seconds()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self.load()
+        self._thread = threading.Thread(target=self._run, name='invitation-expiry', daemon=True)
+        self._thread.start()
+        logger.info("Invitation expiry scheduler started (next deadline: %s)", self.next_deadline())
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.reset()
+
+    def _run(self):
+        reload_interval = invitation_expiry_config()['RELOAD_INTERVAL']
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = timezone.now()
+                until_reload = reload_interval - (now - self._loaded_at).total_seconds()
+                delay = self._seconds_until_next(now)
+                if delay is None or delay >= 0:
+                    wait = until_reload if delay is None else min(delay, until_reload)
+                    if wait > 0:
+                        self._cond.wait(timeout=wait)
+                        continue
+            try:
+                close_old_connections()
+                if until_reload <= 0:
+                    self.load()
+                else:
+                    # expires_at < now: الموعد نفسه لا ينتهي إلا بعد تجاوزه
+                    self.run_due(now + timedelta(microseconds=1))
+            except Exception:
+                logger.exception("Invitation expiry scheduler failed")
+                with self._cond:
+                    self._cond.wait(timeout=min(reload_interval, 60))
+
+
+expiry_scheduler = InvitationExpiryScheduler()
+
+
+# ---------------------------
+# إعادة الضبط عند إنشاء الدعوات والرد عليها
+# ---------------------------
+@receiver(post_save, sender=GroupInvitation)
+def _invitation_saved(sender, instance, **kwargs):
+    if not expiry_scheduler.loaded:
+        return
+    invitation_id, status, expires_at = instance.pk, instance.status, instance.expires_at
+
+    def update():
+        if status == 'pending' and expires_at:
+            expiry_scheduler.track(invitation_id, expires_at)
+        else:
+            expiry_scheduler.untrack(invitation_id)
+
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=GroupInvitation)
+def _invitation_deleted(sender, instance, **kwargs):
+    if expiry_scheduler.loaded:
+        invitation_id = instance.pk
+        transaction.on_commit(lambda: expiry_scheduler.untrack(invitation_id))
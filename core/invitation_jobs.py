@@ -0,0 +1,170 @@
+# core/invitation_jobs.py
+
+"""
+مهام الدعوات الدورية بعمليات على مستوى المجموعة (set-based) بدل الحلقات صفاً صفاً:
+
+  - expire_pending_invitations: UPDATE واحد لكل الدعوات المنتهية ثم إشعاراتها بـ bulk_create
+  - remind_expiring_invitations / remind_pending_invitations: استعلام واحد بـ NOT EXISTS
+    لإيجاد الدعوات بدون تذكير حديث، ثم إدراج التذكيرات دفعة واحدة
+
+يستخدمها NotificationScheduler (core/scheduler.py) ومهام Celery (core/tasks.py).
+كل مهمة تعيد تقريراً: {'job', 'rows', 'notifications', 'duration_ms'} وتسجله في السجل.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import GroupInvitation, NotificationLog
+from .notification_manager import NotificationManager
+
+logger = logging.getLogger(__name__)
+
+INVITATION_FIELDS = (
+    'invitation_id', 'group_id', 'group__project__title', 'expires_at',
+    'invited_student_id', 'invited_student__name', 'invited_student__username', 'invited_by_id',
+)
+
+
+def _group_label(row):
+    # Group بدون اسم: عنوان المشروع أو رقم المجموعة
+    return row['group__project__title'] or f"رقم {row['group_id']}"
+
+
+def _format_time(value):
+    # USE_TZ = False في الإعدادات: التواريخ قد تكون بدون منطقة زمنية
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime("%Y-%m-%d %H:%M")
+
+
+def _student_name(row):
+    return row['invited_student__name'] or row['invited_student__username']
+
+
+def _report(job, started, rows, notifications):
+    report = {
+        'job': job,
+        'rows': rows,
+        'notifications': notifications,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info("%(job)s: %(rows)s rows, %(notifications)s notifications in %(duration_ms)sms", report)
+    return report
+
+
+def _without_recent_reminder(qs, since):
+    """NOT EXISTS: لا يوجد تذكير للطالب عن نفس المجموعة منذ since"""
+    recent = NotificationLog.objects.filter(
+        recipient_id=OuterRef('invited_student_id'),
+        related_group_id=OuterRef('group_id'),
+        notification_type='reminder',
+        created_at__gte=since,
+    )
+    return qs.filter(~Exists(recent))
+
+
+# ---------------------------
+# انتهاء الصلاحية
+# ---------------------------
+def expire_pending_invitations(now=None, notify='student'):
+    """
+    تحويل كل الدعوات المعلقة المنتهية إلى expired بـ UPDATE واحد.
+    notify: 'student' (إشعار invitation_expired للطالب، سلوك المجدول) أو
+            'inviter' (تذكير لمرسل الدعوة، سلوك مهمة Celery)
+    """
+    started = time.monotonic()
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = GroupInvitation.objects.filter(status='pending', expires_at__lt=now)
+        # قفل الصفوف (بدون JOIN) حتى لا يتغير أي منها بين القراءة والتحديث
+        list(expired.select_for_update().values_list('pk', flat=True))
+        rows = list(expired.values(*INVITATION_FIELDS))
+        updated = expired.update(status='expired')
+
+        if notify == 'inviter':
+            notifications = (
+                NotificationLog(
+                    recipient_id=row['invited_by_id'],
+                    notification_type='reminder',
+                    title='انتهت صلاحية الدعوة',
+                    message=f'انتهت صلاحية دعوة {_student_name(row)} للانضمام إلى مجموعة {_group_label(row)}',
+                    related_group_id=row['group_id'],
+                    related_user_id=row['invited_student_id'],
+                )
+                for row in rows
+            )
+        else:
+            notifications = (
+                NotificationLog(
+                    recipient_id=row['invited_student_id'],
+                    notification_type='invitation_expired',
+                    title='انتهت صلاحية الدعوة',
+                    message=f'انتهت صلاحية دعوتك للانضمام إلى مجموعة "{_group_label(row)}"',
+                    related_group_id=row['group_id'],
+                )
+                for row in rows
+            )
+        sent = NotificationManager.bulk_create_notifications(notifications)
+    return _report('expire_pending_invitations', started, updated, sent)
+
+
+# ---------------------------
+# التذكيرات
+# ---------------------------
+def remind_expiring_invitations(now=None, within=timedelta(hours=1), quiet=timedelta(hours=2)):
+    """
+    تذكير الطلاب بالدعوات التي تنتهي خلال within، إلا إذا وصلهم تذكير خلال quiet
+    """
+    started = time.monotonic()
+    now = now or timezone.now()
+    expiring = GroupInvitation.objects.filter(
+        status='pending', expires_at__gte=now, expires_at__lte=now + within
+    )
+    rows = list(_without_recent_reminder(expiring, now - quiet).values(*INVITATION_FIELDS))
+    sent = NotificationManager.bulk_create_notifications(
+        NotificationLog(
+            recipient_id=row['invited_student_id'],
+            notification_type='reminder',
+            title='تذكير: انتهاء صلاحية الدعوة قريباً',
+            message=(
+                f'ستنتهي صلاحية دعوتك للانضمام إلى مجموعة "{_group_label(row)}" '
+                f'في {_format_time(row["expires_at"])}'
+            ),
+            related_group_id=row['group_id'],
+        )
+        for row in rows
+    )
+    return _report('remind_expiring_invitations', started, len(rows), sent)
+
+
+def remind_pending_invitations(now=None, older_than=timedelta(hours=24), quiet=timedelta(hours=12)):
+    """
+    تذكير الطلاب بالدعوات المعلقة منذ أكثر من older_than (وغير المنتهية)،
+    مرة واحدة كل quiet على الأكثر لكل دعوة
+    """
+    started = time.monotonic()
+    now = now or timezone.now()
+    pending = GroupInvitation.objects.filter(
+        status='pending', created_at__lte=now - older_than, expires_at__gt=now
+    )
+    rows = list(_without_recent_reminder(pending, now - quiet).values(*INVITATION_FIELDS))
+    sent = NotificationManager.bulk_create_notifications(
+        NotificationLog(
+            recipient_id=row['invited_student_id'],
+            notification_type='reminder',
+            title='تذكير: دعوة مجموعة معلقة',
+            message=(
+                f'لديك دعوة معلقة للانضمام إلى مجموعة {_group_label(row)}. '
+                f'الدعوة تنتهي صلاحيتها في {int((row["expires_at"] - now).total_seconds() // 3600)} ساعات'
+            ),
+            related_group_id=row['group_id'],
+            related_user_id=row['invited_by_id'],
+        )
+        for row in rows
+    )
+    return _report('remind_pending_invitations', started, len(rows), sent)
@@ -0,0 +1,170 @@
+# core/location_tree.py
+
+"""
+شجرة الهيكل الأكاديمي كاملة: جامعة -> فرع -> كلية -> قسم -> برنامج.
+
+  - تُبنى من خمسة استعلامات مسطحة (values) وتُركّب في الذاكرة، بدون حقول
+    SerializerMethodField ولا استعلامات لكل عنصر
+  - تُخزن في الكاش تحت مفتاح يحمل رقم النسخة؛ أي حفظ/حذف على جداول الموقع
+    يغيّر النسخة عبر الإشارات أدناه (وعمليات bulk تستدعي bump_location_tree_version)
+  - النسخة نفسها هي ETag لنقطة /api/locations/tree/، فالشجرة غير المتغيرة تكلف 304
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Branch, City, College, Department, Program, University
+
+LOCATION_TREE_CACHE_TIMEOUT = getattr(settings, 'LOCATION_TREE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+_VERSION_KEY = 'location_tree:version'
+
+# مستويات الشجرة بالترتيب: (اسم المعامل في الرابط، مفتاح المعرف، مفتاح الأبناء)
+TREE_LEVELS = (
+    ('university', 'uid', 'branches'),
+    ('branch', 'ubid', 'colleges'),
+    ('college', 'cid', 'departments'),
+    ('department', 'department_id', 'programs'),
+    ('program', 'pid', None),
+)
+
+
+# ---------------------------
+# النسخة
+# ---------------------------
+def location_tree_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def bump_location_tree_version():
+    """
+    إبطال الشجرة المخزنة (يُستدعى تلقائياً من الإشارات أدناه،
+    ويجب استدعاؤه يدوياً بعد أي bulk_create / update على جداول الموقع)
+    """
+    _bump()
+    # طلب آخر قد يبني الشجرة من البيانات القديمة قبل انتهاء المعاملة: نبطلها مرة أخرى بعدها
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_bump)
+
+
+def _bump():
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+# ---------------------------
+# البناء
+# ---------------------------
+def build_location_tree():
+    """قائمة الجامعات مع فروعها وكلياتها وأقسامها وبرامجها (5 استعلامات)"""
+    universities = [
+        {**row, 'branches': []}
+        for row in University.objects.order_by('uname_ar', 'uid').values('uid', 'uname_ar', 'uname_en', 'type')
+    ]
+    branches = Branch.objects.order_by('city__bname_ar', 'ubid').values(
+        'ubid', 'university_id', 'city_id', 'city__bname_ar', 'city__bname_en', 'location',
+    )
+    colleges = College.objects.filter(branch__isnull=False).order_by('name_ar', 'cid').values(
+        'cid', 'branch_id', 'name_ar', 'name_en',
+    )
+    departments = Department.objects.order_by('name', 'department_id').values('department_id', 'college_id', 'name')
+    programs = Program.objects.order_by('p_name', 'pid').values('pid', 'department_id', 'p_name', 'duration')
+
+    by_university = {u['uid']: u['branches'] for u in universities}
+    by_branch = {}
+    for b in branches:
+        node = {
+            'ubid': b['ubid'],
+            'university': b['university_id'],
+            'city': b['city_id'],
+            'city_name_ar': b['city__bname_ar'],
+            'city_name_en': b['city__bname_en'],
+            'location': b['location'],
+            'colleges': [],
+        }
+        by_university[b['university_id']].append(node)
+        by_branch[b['ubid']] = node['colleges']
+
+    by_college = {}
+    for c in colleges:
+        node = {**c, 'branch': c.pop('branch_id'), 'departments': []}
+        by_branch[node['branch']].append(node)
+        by_college[node['cid']] = node['departments']
+
+    by_department = {}
+    for d in departments:
+        siblings = by_college.get(d['college_id'])
+        if siblings is None:
+            continue  # كلية بدون فرع خارج الشجرة
+        node = {**d, 'college': d.pop('college_id'), 'programs': []}
+        siblings.append(node)
+        by_department[node['department_id']] = node['programs']
+
+    for p in programs:
+        siblings = by_department.get(p['department_id'])
+        if siblings is not None:
+            siblings.append({**p, 'department': p.pop('department_id')})
+
+    return universities
+
+
+def get_location_tree():
+    """(version, tree) من الكاش، أو تُبنى وتُخزن تحت النسخة الحالية"""
+    version = location_tree_version()
+    key = f'location_tree:{version}'
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_location_tree()
+        cache.set(key, tree, LOCATION_TREE_CACHE_TIMEOUT)
+    return version, tree
+
+
+def find_subtree(tree, **filters):
+    """
+    العقدة المطلوبة من الشجرة، مثل find_subtree(tree, college=5) أو
+    find_subtree(tree, university=1, branch=2). يعيد None إذا لم توجد.
+    """
+    deepest = max(
+        (i for i, (param, _, _) in enumerate(TREE_LEVELS) if filters.get(param) is not None),
+        default=None,
+    )
+    if deepest is None:
+        return tree
+
+    # البحث مستوى بمستوى؛ المستويات غير المحددة فوق المطلوب تُبحث كلها
+    nodes = tree
+    for param, id_key, children_key in TREE_LEVELS[:deepest + 1]:
+        wanted = filters.get(param)
+        if wanted is not None:
+            nodes = [n for n in nodes if n[id_key] == wanted]
+        if param == TREE_LEVELS[deepest][0]:
+            return nodes[0] if nodes else None
+        nodes = [child for n in nodes for child in n[children_key]]
+    return None
+
+
+# ---------------------------
+# إشارات الإبطال
+# ---------------------------
+@receiver(post_save, sender=University)
+@receiver(post_delete, sender=University)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+@receiver(post_save, sender=College)
+@receiver(post_delete, sender=College)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Program)
+@receiver(post_delete, sender=Program)
+def _location_changed(sender, **kwargs):
+    bump_location_tree_version()
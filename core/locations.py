@@ -0,0 +1,417 @@
+# core/locations.py
+
+"""
+محلل الهيكل الأكاديمي للاستيراد: جامعة -> (مدينة -> فرع) -> كلية -> قسم -> برنامج.
+
+يُحمّل الهيكل الموجود مرة واحدة لكل استيراد في شجرة (trie) مفاتيحها الأسماء
+بعد التطبيع العربي (normalized_name المحفوظ، core/arabic.py)، ثم:
+  - ensure(paths) ينشئ العناصر الناقصة لكل المسارات بعملية bulk واحدة لكل مستوى
+  - resolve(path) بحث في الذاكرة فقط، بدون استعلامات لكل صف
+يستخدمه استيراد الطلاب (core/student_import.py) واستيراد المشاريع (core/project_import.py).
+
+المسار بدون مدينة (الطلاب): الكلية تُطابق في أي فرع من فروع الجامعة، وتُنشأ في أول فرع.
+المسار مع مدينة (المشاريع): الفرع (جامعة، مدينة) يُنشأ إذا لم يوجد، والكلية تُطابق داخله.
+
+الكلية/القسم/البرنامج غير الموجودة بالاسم نفسه تُطابق تقريبياً (core/fuzzy_names.py) مع
+أسماء الأب نفسه: فوق AUTO_MAP_THRESHOLD تُربط بالموجود بدل إنشاء نسخة مكررة، و suggest()
+يعيد المطابقات والاقتراحات لمرحلة التحقق بدون إنشاء أي شيء.
+"""
+
+from collections import Counter, namedtuple
+from itertools import islice
+
+from django.db.models import Q
+
+from .arabic import clean_text, normalize_arabic
+from .bulk_fetch import bump_bulk_fetch_version
+from .change_log import record_changes
+from .fuzzy_names import NameIndex, can_auto_map, location_matching_config, match_key
+from .location_tree import bump_location_tree_version
+from .models import Branch, City, College, Department, Program, University
+
+# كل قيمة: كائن (محدد مسبقاً) أو اسم أو None
+LocationPath = namedtuple(
+    "LocationPath", "university college department program city", defaults=(None,)
+)
+ResolvedLocation = namedtuple(
+    "ResolvedLocation", "university_id branch_id college_id department_id program_id"
+)
+
+LEVELS = ("university", "city", "branch", "college", "department", "program")
+FUZZY_LEVELS = ("college", "department", "program")
+
+
+def _is_instance(value):
+    return hasattr(value, "pk")
+
+
+def _pk(node):
+    return node.pk if node is not None else None
+
+
+class _Node:
+    __slots__ = ("kind", "pk", "name", "parent", "children", "branches")
+
+    def __init__(self, kind, pk, parent=None):
+        self.kind = kind
+        self.pk = pk
+        self.name = ""       # الاسم كما هو محفوظ (لعرض الاقتراحات)
+        self.parent = parent
+        self.children = {}   # الاسم المطبّع -> عقدة المستوى التالي
+        self.branches = {}   # للجامعة فقط: city_id -> عقدة الفرع
+
+
+class LocationResolver:
+
+    def __init__(self):
+        self._nodes = {kind: {} for kind in ("university", "branch", "college", "department", "program")}
+        self.universities = {}
+        self.cities = {}
+        self.colleges_by_name = {}
+        self.departments_by_name = {}
+        self.programs_by_name = {}
+        self._resolved = {}
+        self.matching = location_matching_config()
+        self._indexes = {}   # id(قاموس الأسماء) -> NameIndex
+        self._fuzzy = {}     # (id(قاموس الأسماء), الاسم المطبّع) -> (حجم الفهرس، العقدة، المطابقة)
+        self._matched = []   # المطابقات التقريبية في آخر _walk
+
+        for pk, name in University.objects.order_by("pk").values_list("pk", "normalized_name"):
+            self.universities.setdefault(name, self._node("university", pk))
+
+        for pk, name in City.objects.order_by("pk").values_list("pk", "normalized_name"):
+            self.cities.setdefault(name, pk)
+
+        for pk, uni_id, city_id in Branch.objects.order_by("pk").values_list("pk", "university_id", "city_id"):
+            uni = self._node("university", uni_id)
+            uni.branches.setdefault(city_id, self._node("branch", pk, parent=uni))
+
+        colleges = College.objects.order_by("pk").values_list(
+            "pk", "normalized_name", "name_ar", "branch_id", "branch__university_id"
+        )
+        for pk, name, display, branch_id, uni_id in colleges:
+            node = self._node("college", pk)
+            node.name = display
+            if branch_id:
+                self._node("branch", branch_id, parent=self._node("university", uni_id)).children.setdefault(name, node)
+                self._node("university", uni_id).children.setdefault(name, node)
+            self.colleges_by_name.setdefault(name, node)
+
+        departments = Department.objects.order_by("pk").values_list("pk", "normalized_name", "name", "college_id")
+        for pk, name, display, college_id in departments:
+            node = self._node("department", pk)
+            node.name = display
+            self._node("college", college_id).children.setdefault(name, node)
+            self.departments_by_name.setdefault(name, node)
+
+        for pk, name, display, dept_id in Program.objects.order_by("pk").values_list(
+            "pk", "normalized_name", "p_name", "department_id"
+        ):
+            node = self._node("program", pk)
+            node.name = display
+            self._node("department", dept_id).children.setdefault(name, node)
+            self.programs_by_name.setdefault(name, node)
+
+    def _node(self, kind, pk, parent=None):
+        nodes = self._nodes[kind]
+        if pk not in nodes:
+            nodes[pk] = _Node(kind, pk, parent)
+        elif parent is not None and nodes[pk].parent is None:
+            nodes[pk].parent = parent
+        return nodes[pk]
+
+    # ---------------------------
+    # المطابقة التقريبية
+    # ---------------------------
+    def _index(self, names):
+        """فهرس الثلاثيات لقاموس أسماء، يُبنى أول مرة ثم يُلحق به ما أُنشئ بعدها"""
+        index = self._indexes.get(id(names))
+        if index is None:
+            index = self._indexes[id(names)] = NameIndex()
+        # القواميس تنمو فقط: الأسماء الجديدة في آخرها
+        for name in islice(names, len(index), None):
+            index.add(name)
+        return index
+
+    def _lookup(self, level, names, value):
+        """العقدة بالاسم المطبّع، وإلا بأقرب اسم فوق AUTO_MAP_THRESHOLD"""
+        name = normalize_arabic(value)
+        node = names.get(name)
+        if node is not None or level not in FUZZY_LEVELS:
+            return node
+
+        index = self._index(names)
+        key = (id(names), name)
+        cached = self._fuzzy.get(key)
+        if cached is None or cached[0] != len(index):
+            node = match = None
+            best = index.best(name)
+            if best is not None and best.score >= self.matching["SUGGEST_THRESHOLD"]:
+                auto = can_auto_map(name, best, self.matching["AUTO_MAP_THRESHOLD"])
+                if auto:
+                    node = names[best.name]
+                match = {
+                    "level": level,
+                    "value": clean_text(value),
+                    "match": names[best.name].name,
+                    "score": round(best.score, 2),
+                    "auto_mapped": auto,
+                }
+            cached = self._fuzzy[key] = (len(index), node, match)
+        _, node, match = cached
+        if match is not None:
+            self._matched.append(match)
+        return node
+
+    def _distinct(self, missing):
+        """
+        الأسماء الناقصة المتقاربة تحت الأب نفسه تُنشأ مرة واحدة (أولها في الملف)،
+        والبقية تُربط بها في المرور التالي من ensure
+        """
+        threshold = self.matching["AUTO_MAP_THRESHOLD"]
+        indexes = {}
+        distinct = []
+        for miss in missing:
+            name = normalize_arabic(miss[2])
+            index = indexes.setdefault(id(miss[1]), NameIndex())
+            if not can_auto_map(name, index.best(name), threshold):
+                index.add(name)
+                distinct.append(miss)
+        return distinct
+
+    def suggest(self, numbered_paths):
+        """
+        مرحلة التحقق (بدون إنشاء): [(excel_row, LocationPath)] ->
+        [{"row", "rows", "level", "value", "match", "score", "auto_mapped"}] لكل قيمة مختلفة،
+        row أول صف تظهر فيه و rows عدد صفوفها
+        """
+        walked = {}
+        reports = {}
+        for excel_row, path in numbered_paths:
+            key = tuple(v.pk if _is_instance(v) else v for v in path)
+            if key not in walked:
+                self._matched = []
+                try:
+                    self._walk(path)
+                except ValueError:
+                    pass
+                walked[key] = self._matched
+            for match in walked[key]:
+                report_key = (match["level"], match["value"], match["match"])
+                if report_key in reports:
+                    reports[report_key]["rows"] += 1
+                else:
+                    reports[report_key] = {"row": excel_row, "rows": 1, **match}
+        self._matched = []
+        return list(reports.values())
+
+    # ---------------------------
+    # البحث في الذاكرة
+    # ---------------------------
+    def _walk(self, path):
+        """
+        يعيد (ResolvedLocation, None) إذا وُجد المسار كاملاً، أو (None, missing) حيث
+        missing = (level, parent, value) لأول عنصر ناقص يمكن إنشاؤه.
+        ValueError إذا كان العنصر الناقص لا يمكن إنشاؤه (قسم بدون كلية...).
+        """
+        uni = branch = college = dept = program = None
+
+        value = path.university
+        if _is_instance(value):
+            uni = self._node("university", value.pk)
+        elif value:
+            uni = self.universities.get(normalize_arabic(value))
+            if uni is None:
+                return None, ("university", None, value)
+
+        city_mode = path.city is not None
+        if city_mode:
+            value = path.city
+            if _is_instance(value):
+                city_id = value.pk
+            else:
+                city_id = self.cities.get(normalize_arabic(value))
+                if city_id is None:
+                    return None, ("city", None, value)
+            if uni is not None:
+                branch = uni.branches.get(city_id)
+                if branch is None:
+                    return None, ("branch", uni, city_id)
+
+        value = path.college
+        if _is_instance(value):
+            college = self._node("college", value.pk)
+        elif value:
+            parent = branch if city_mode else uni
+            college = self._lookup("college", parent.children if parent else self.colleges_by_name, value)
+            if college is None:
+                return None, ("college", parent, value)
+
+        value = path.department
+        if _is_instance(value):
+            dept = self._node("department", value.pk)
+        elif value:
+            if college is not None:
+                dept = self._lookup("department", college.children, value)
+                if dept is None:
+                    return None, ("department", college, value)
+            else:
+                dept = self._lookup("department", self.departments_by_name, value)
+                if dept is None:
+                    raise ValueError(f"لا يمكن إنشاء القسم '{clean_text(value)}' بدون كلية")
+
+        value = path.program
+        if _is_instance(value):
+            program = self._node("program", value.pk)
+        elif value:
+            if dept is not None:
+                program = self._lookup("program", dept.children, value)
+                if program is None:
+                    return None, ("program", dept, value)
+            else:
+                program = self._lookup("program", self.programs_by_name, value)
+                if program is None:
+                    raise ValueError(f"لا يمكن إنشاء البرنامج '{clean_text(value)}' بدون قسم")
+
+        return ResolvedLocation(_pk(uni), _pk(branch), _pk(college), _pk(dept), _pk(program)), None
+
+    def resolve(self, university, college, department, program, city=None):
+        """
+        ResolvedLocation للمسار (يُنشئ الناقص إذا لم يمر عبر ensure).
+        ValueError إذا تعذر الحل.
+        """
+        path = LocationPath(university, college, department, program, city)
+        key = tuple(v.pk if _is_instance(v) else v for v in path)
+        if key not in self._resolved:
+            self.ensure([path])
+            resolved, missing = self._walk(path)
+            if missing:
+                raise ValueError(f"تعذر تحديد {missing[0]} '{missing[2]}'")
+            self._resolved[key] = resolved
+        return self._resolved[key]
+
+    # ---------------------------
+    # إنشاء الناقص دفعة واحدة لكل مستوى
+    # ---------------------------
+    def ensure(self, paths):
+        # بترتيب الملف: أول صيغة لاسم جديد هي التي تُنشأ
+        pending = list(dict.fromkeys(paths))
+        for _ in LEVELS:
+            missing = {level: {} for level in LEVELS}
+            still_pending = []
+            for path in pending:
+                try:
+                    resolved, miss = self._walk(path)
+                except ValueError:
+                    continue  # resolve() سيعيد الخطأ لهذا الصف
+                if miss is None:
+                    continue
+                level, parent, value = miss
+                if level == "branch":
+                    name = value
+                elif level in FUZZY_LEVELS:
+                    name = match_key(normalize_arabic(value))
+                else:
+                    name = normalize_arabic(value)
+                missing[level].setdefault((id(parent), name), miss)
+                still_pending.append(path)
+            if not still_pending:
+                return
+            for level in LEVELS:
+                if missing[level]:
+                    misses = list(missing[level].values())
+                    if level in FUZZY_LEVELS:
+                        misses = self._distinct(misses)
+                    getattr(self, f"_create_{level}")(misses)
+            pending = still_pending
+
+    def _bulk_create(self, model, objs, key_fields):
+        """bulk_create ثم قراءة المفاتيح إذا لم تُعَد (MySQL)"""
+        for obj in objs:
+            if hasattr(obj, "fill_normalized_name"):
+                obj.fill_normalized_name()  # bulk_create لا يمر بـ save()
+        model.objects.bulk_create(objs)
+        if not all(obj.pk for obj in objs):
+            self._read_pks(model, objs, key_fields)
+        # bulk_create لا يرسل إشارات شجرة المواقع وسجل التغييرات و bulk-fetch
+        bump_location_tree_version()
+        bump_bulk_fetch_version(model)
+        record_changes(model, [obj.pk for obj in objs], "insert")
+        return objs
+
+    @staticmethod
+    def _read_pks(model, objs, key_fields):
+        q = Q()
+        for field in key_fields:
+            values = {getattr(obj, field) for obj in objs}
+            field_q = Q(**{f"{field}__in": [v for v in values if v is not None]})
+            if None in values:
+                field_q |= Q(**{f"{field}__isnull": True})
+            q &= field_q
+        def key(obj):
+            return tuple(getattr(obj, field) for field in key_fields)
+
+        pks = {}
+        for row in model.objects.filter(q).order_by("pk").values_list("pk", *key_fields):
+            pks.setdefault(tuple(row[1:]), []).append(row[0])
+        # الصفوف الجديدة هي الأحدث لكل مفتاح
+        created = {k: pks[k][-n:] for k, n in Counter(key(obj) for obj in objs).items()}
+        for obj in objs:
+            obj.pk = created[key(obj)].pop(0)
+
+    def _create_university(self, missing):
+        objs = [University(uname_ar=clean_text(value)) for _, _, value in missing]
+        for obj in self._bulk_create(University, objs, ["uname_ar"]):
+            self.universities[obj.normalized_name] = self._node("university", obj.pk)
+
+    def _create_city(self, missing):
+        objs = [City(bname_ar=clean_text(value)) for _, _, value in missing]
+        for obj in self._bulk_create(City, objs, ["bname_ar"]):
+            self.cities[obj.normalized_name] = obj.pk
+
+    def _create_branch(self, missing):
+        objs = [Branch(university_id=uni.pk, city_id=city_id) for _, uni, city_id in missing]
+        self._bulk_create(Branch, objs, ["university_id", "city_id"])
+        for (_, uni, city_id), obj in zip(missing, objs):
+            uni.branches[city_id] = self._node("branch", obj.pk, parent=uni)
+
+    def _create_college(self, missing):
+        objs = []
+        for _, parent, value in missing:
+            if parent is None:
+                branch_id = None
+            elif parent.kind == "branch":
+                branch_id = parent.pk
+            else:
+                branch_id = min((b.pk for b in parent.branches.values()), default=None)
+            objs.append(College(branch_id=branch_id, name_ar=clean_text(value)))
+        self._bulk_create(College, objs, ["branch_id", "name_ar"])
+        for (_, parent, value), obj in zip(missing, objs):
+            name = normalize_arabic(value)
+            node = self._node("college", obj.pk)
+            node.name = obj.name_ar
+            if parent is not None:
+                parent.children[name] = node
+                if parent.kind == "branch":
+                    parent.parent.children.setdefault(name, node)
+            self.colleges_by_name.setdefault(name, node)
+
+    def _create_department(self, missing):
+        objs = [Department(college_id=college.pk, name=clean_text(value)) for _, college, value in missing]
+        self._bulk_create(Department, objs, ["college_id", "name"])
+        for (_, college, value), obj in zip(missing, objs):
+            name = normalize_arabic(value)
+            node = self._node("department", obj.pk)
+            node.name = obj.name
+            college.children[name] = node
+            self.departments_by_name.setdefault(name, node)
+
+    def _create_program(self, missing):
+        objs = [Program(department_id=dept.pk, p_name=clean_text(value)) for _, dept, value in missing]
+        self._bulk_create(Program, objs, ["department_id", "p_name"])
+        for (_, dept, value), obj in zip(missing, objs):
+            name = normalize_arabic(value)
+            node = self._node("program", obj.pk)
+            node.name = obj.p_name
+            dept.children[name] = node
+            self.programs_by_name.setdefault(name, node)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.college_stats import refresh_college_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dean dashboard statistics (CollegeStats) of every college."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--college', type=int, action='append', dest='college_ids',
+            help='Only rebuild the given college id (can be repeated).'
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = refresh_college_stats(options.get('college_ids'))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics for {rebuilt} colleges"))
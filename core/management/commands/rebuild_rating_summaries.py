@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Project
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored rating summary (sum, count, 1-5 histogram) of every project."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project', type=int, action='append', dest='project_ids',
+            help='Only rebuild the given project id (can be repeated).'
+        )
+
+    def handle(self, *args, **options):
+        qs = Project.objects.all()
+        if options.get('project_ids'):
+            qs = qs.filter(project_id__in=options['project_ids'])
+
+        rebuilt = 0
+        for project_id in qs.values_list('project_id', flat=True).iterator():
+            with transaction.atomic():
+                project = Project.objects.select_for_update().get(pk=project_id)
+                project.rebuild_rating_summary()
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating summaries for {rebuilt} projects"))
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.3 on 2026-10-17 10:12
+
+import core.models
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_summary(apps, schema_editor):
+    Project = apps.get_model("core", "Project")
+    ProjectRating = apps.get_model("core", "ProjectRating")
+
+    summaries = {}
+    rows = ProjectRating.objects.values("project_id", "rating").annotate(n=Count("id"))
+    for row in rows:
+        summary = summaries.setdefault(
+            row["project_id"], {"sum": 0, "count": 0, "hist": core.models.empty_rating_histogram()}
+        )
+        summary["sum"] += row["rating"] * row["n"]
+        summary["count"] += row["n"]
+        summary["hist"][str(row["rating"])] = row["n"]
+
+    for project_id, summary in summaries.items():
+        Project.objects.filter(pk=project_id).update(
+            rating_sum=summary["sum"],
+            rating_count=summary["count"],
+            rating_histogram=summary["hist"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_academicaffiliation_program_project_department_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="rating_histogram",
+            field=models.JSONField(default=core.models.empty_rating_histogram),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.3 on 2026-10-17 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_project_rating_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollegeStats",
+            fields=[
+                (
+                    "college",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="core.college",
+                    ),
+                ),
+                ("students", models.PositiveIntegerField(default=0)),
+                ("supervisors", models.PositiveIntegerField(default=0)),
+                ("co_supervisors", models.PositiveIntegerField(default=0)),
+                ("projects", models.PositiveIntegerField(default=0)),
+                ("groups", models.PositiveIntegerField(default=0)),
+                ("pending_approvals", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "College Stats",
+            },
+        ),
+    ]
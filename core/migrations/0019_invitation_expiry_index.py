@@ -0,0 +1,19 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_notification_jobs"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="groupinvitation",
+            index=models.Index(
+                fields=["status", "expires_at"], name="core_groupi_status_053be2_idx"
+            ),
+        ),
+    ]
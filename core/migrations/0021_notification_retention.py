@@ -0,0 +1,65 @@
+# Generated by Django 6.0.3 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_scheduler_leadership"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationArchive",
+            fields=[
+                (
+                    "notification_id",
+                    models.IntegerField(primary_key=True, serialize=False),
+                ),
+                ("notification_type", models.CharField(max_length=50, null=True)),
+                ("title", models.CharField(max_length=255)),
+                ("message", models.TextField()),
+                ("related_group_id", models.IntegerField(blank=True, null=True)),
+                ("related_project_id", models.IntegerField(blank=True, null=True)),
+                ("created_at", models.DateTimeField()),
+                ("read_at", models.DateTimeField(blank=True, null=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name_plural": "Notification Archive",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="notificationlog",
+            index=models.Index(
+                fields=["created_at"], name="core_notifi_created_db2a22_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationarchive",
+            name="recipient",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_notifications",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationarchive",
+            index=models.Index(
+                fields=["recipient", "-created_at"],
+                name="core_notifi_recipie_639038_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationarchive",
+            index=models.Index(
+                fields=["archived_at"], name="core_notifi_archive_795a45_idx"
+            ),
+        ),
+    ]
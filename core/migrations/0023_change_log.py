@@ -0,0 +1,36 @@
+# Generated by Django 6.0.3 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0022_outbox_events"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLogEntry",
+            fields=[
+                ("seq", models.BigAutoField(primary_key=True, serialize=False)),
+                ("table", models.CharField(max_length=50)),
+                ("object_id", models.PositiveBigIntegerField()),
+                (
+                    "op",
+                    models.CharField(
+                        choices=[
+                            ("insert", "إضافة"),
+                            ("update", "تعديل"),
+                            ("delete", "حذف"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                "ordering": ["seq"],
+            },
+        ),
+    ]
@@ -0,0 +1,152 @@
+# Generated by Django 6.0.3 on 2026-10-18 12:05
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of core.arabic.normalize_arabic and core.search.tokenize as of this
+# migration; later changes to the tokenizer are applied with rebuild_search_index.
+SEARCH_FIELDS = ("title", "title_en", "description", "field", "tools")
+WEIGHTS = {"title": 3.0, "title_en": 3.0, "field": 2.0, "tools": 2.0, "description": 1.0}
+BATCH_SIZE = 500
+STOP_WORDS = frozenset((
+    "في", "من", "علي", "الي", "عن", "مع", "او", "ثم", "هذا", "هذه", "ذلك", "تلك", "التي", "الذي",
+    "الذين", "ما", "لا", "كل", "بين", "عند", "قد", "تم", "هو", "هي",
+    "the", "and", "or", "of", "for", "to", "in", "on", "with", "by", "is", "an", "at", "as",
+))
+PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+WORD = re.compile(r"\w+")
+DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+LETTERS = str.maketrans({
+    "\u0623": "\u0627",
+    "\u0625": "\u0627",
+    "\u0622": "\u0627",
+    "\u0671": "\u0627",
+    "\u0649": "\u064a",
+    "\u0629": "\u0647",
+})
+
+
+def normalize(value):
+    if value is None:
+        return ""
+    text = DIACRITICS.sub("", str(value)).translate(LETTERS)
+    return " ".join(text.split()).lower()
+
+
+def tokenize(text):
+    terms = []
+    for word in WORD.findall(normalize(text)):
+        if len(word) < 2 or word in STOP_WORDS:
+            continue
+        for prefix in PREFIXES:
+            if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+                word = word[len(prefix):]
+                break
+        if word not in STOP_WORDS:
+            terms.append(word[:100])
+    return terms
+
+
+def backfill_search_index(apps, schema_editor):
+    Project = apps.get_model("core", "Project")
+    ProjectSearchPosting = apps.get_model("core", "ProjectSearchPosting")
+    ProjectSearchDocument = apps.get_model("core", "ProjectSearchDocument")
+    weights = {**WEIGHTS, **getattr(settings, "SEARCH_INDEX", {}).get("WEIGHTS", {})}
+
+    projects = Project.objects.only("project_id", *SEARCH_FIELDS).order_by("project_id")
+    last_id = 0
+    while True:
+        batch = list(projects.filter(project_id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        postings, documents = [], []
+        for project in batch:
+            length = 0.0
+            for field in SEARCH_FIELDS:
+                counts = Counter(tokenize(getattr(project, field)))
+                length += weights.get(field, 1.0) * sum(counts.values())
+                postings.extend(
+                    ProjectSearchPosting(term=term, field=field, project_id=project.pk, tf=tf)
+                    for term, tf in counts.items()
+                )
+            documents.append(ProjectSearchDocument(project_id=project.pk, length=round(length)))
+        ProjectSearchPosting.objects.bulk_create(postings, batch_size=1000)
+        ProjectSearchDocument.objects.bulk_create(documents, batch_size=1000)
+        last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0023_change_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectSearchDocument",
+            fields=[
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="core.project",
+                    ),
+                ),
+                ("length", models.PositiveIntegerField(default=0)),
+                ("indexed_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProjectSearchPosting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=100)),
+                (
+                    "field",
+                    models.CharField(
+                        choices=[
+                            ("title", "العنوان"),
+                            ("title_en", "العنوان بالإنجليزية"),
+                            ("description", "الوصف"),
+                            ("field", "المجال"),
+                            ("tools", "الأدوات"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("tf", models.PositiveIntegerField(default=1)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_postings",
+                        to="core.project",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("term", "field", "project"),
+                        name="unique_search_posting",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0.3 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+from core.arabic import normalize_arabic
+
+NORMALIZED_SOURCES = {
+    "City": "bname_ar",
+    "University": "uname_ar",
+    "College": "name_ar",
+    "Department": "name",
+    "Program": "p_name",
+}
+
+
+def backfill_normalized_names(apps, schema_editor):
+    for model_name, source in NORMALIZED_SOURCES.items():
+        model = apps.get_model("core", model_name)
+        batch = []
+        for obj in model.objects.only("pk", source).iterator(chunk_size=2000):
+            obj.normalized_name = normalize_arabic(getattr(obj, source))[:255]
+            batch.append(obj)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ["normalized_name"])
+                batch = []
+        model.objects.bulk_update(batch, ["normalized_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0024_project_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="city",
+            name="normalized_name",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="college",
+            name="normalized_name",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="department",
+            name="normalized_name",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="program",
+            name="normalized_name",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="university",
+            name="normalized_name",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(backfill_normalized_names, migrations.RunPython.noop),
+    ]
@@ -10,15 +10,39 @@ import datetime
 from django.core.validators import RegexValidator
 from django.db.models import Avg, Count
 
+from .arabic import normalize_arabic
+
+
+class NormalizedNameMixin:
+    """
+    normalized_name = normalize_arabic(normalized_source) يُحدّث مع كل save()، فالمطابقة
+    بالاسم مساواة على عمود مفهرس بدل iexact. bulk_create / bulk_update لا تمر بـ save():
+    استدعِ fill_normalized_name() وأضف normalized_name إلى حقول bulk_update.
+    """
+    normalized_source = None
+
+    def fill_normalized_name(self):
+        self.normalized_name = normalize_arabic(getattr(self, self.normalized_source))[:255]
+        return self
+
+    def save(self, *args, **kwargs):
+        self.fill_normalized_name()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.normalized_source in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
 
 
 # ============================================================================== 
 # 1. نموذج المدينة (City)
 # ==============================================================================
-class City(models.Model):
+class City(NormalizedNameMixin, models.Model):
     bid = models.AutoField(primary_key=True)
     bname_ar = models.CharField(max_length=255)
     bname_en = models.CharField(max_length=255, blank=True, null=True)
+    normalized_name = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+
+    normalized_source = 'bname_ar'
 
     def __str__(self):
         return self.bname_ar
@@ -38,10 +62,11 @@ def university_image_path(instance, filename):
     safe_name = "".join(c if c.isalnum() else "_" for c in instance.uname_ar)
     return os.path.join('university_images', f"{safe_name}.{ext}")
 
-class University(models.Model):
+class University(NormalizedNameMixin, models.Model):
     uid = models.AutoField(primary_key=True)
     uname_ar = models.CharField(max_length=255)
     uname_en = models.CharField(max_length=255, blank=True, null=True)
+    normalized_name = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
     type = models.CharField(max_length=100, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     # Image field with custom upload path
@@ -51,6 +76,8 @@ class University(models.Model):
         null=True
     )
 
+    normalized_source = 'uname_ar'
+
     def __str__(self):
         return self.uname_ar
 
@@ -79,13 +106,16 @@ def college_image_path(instance, filename):
     safe_name = "".join(c if c.isalnum() else "_" for c in instance.name_ar)
     return f"college_images/{safe_name}.{ext}"  # relative to MEDIA_ROOT
 
-class College(models.Model):
+class College(NormalizedNameMixin, models.Model):
     cid = models.AutoField(primary_key=True)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True)
     name_ar = models.CharField(max_length=255)
     name_en = models.CharField(max_length=255, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to=college_image_path, blank=True, null=True)
+    normalized_name = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+
+    normalized_source = 'name_ar'
 
     def __str__(self):
         return f"{self.name_ar} - {self.branch}"
@@ -95,11 +125,14 @@ class College(models.Model):
 
 
 
-class Department(models.Model):
+class Department(NormalizedNameMixin, models.Model):
     department_id = models.AutoField(primary_key=True)
     college = models.ForeignKey(College, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
+    normalized_name = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+
+    normalized_source = 'name'
 
     # Many-to-many relationship handled via DepartmentProgressPattern intermediate table
 
@@ -238,11 +271,14 @@ class DepartmentProgressPattern(models.Model):
         return f"{self.department.name} - {self.pattern.name}"
 
 
-class Program(models.Model):
+class Program(NormalizedNameMixin, models.Model):
     pid = models.AutoField(primary_key=True)
     p_name = models.CharField(max_length=255)
     department = models.ForeignKey(Department, on_delete=models.CASCADE)
     duration = models.PositiveIntegerField(default=4, help_text="عدد سنوات البرنامج")
+    normalized_name = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+
+    normalized_source = 'p_name'
 
 
     def __str__(self):
@@ -421,6 +457,13 @@ def project_documentation_path(instance, filename):
     ext = filename.split('.')[-1]
     return f'projects_documentation/{safe_title}.{ext}'
 
+RATING_VALUES = range(1, 6)
+
+
+def empty_rating_histogram():
+    return {str(v): 0 for v in RATING_VALUES}
+
+
 class Project(models.Model): 
     PROJECT_TYPE_CHOICES = [
         ('Governmental', 'حكومي'),
@@ -456,16 +499,55 @@ class Project(models.Model):
     logo = models.ImageField(upload_to=project_logo_path, blank=True, null=True)
     documentation = models.FileField(upload_to=project_documentation_path, blank=True, null=True)
 
+    # ملخص التقييمات (مخزن مسبقاً لتجنب استعلامات AVG/COUNT لكل مشروع)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_histogram = models.JSONField(default=empty_rating_histogram)
+
     def __str__(self):
         return self.title
     @property
     def average_rating(self):
-        avg = self.ratings.aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 2) if avg else 0  # ضمان عدم رجوع None
+        if not self.rating_count:
+            return 0  # ضمان عدم رجوع None
+        return round(self.rating_sum / self.rating_count, 2)
 
     @property
     def ratings_count(self):
-        return self.ratings.count()
+        return self.rating_count
+
+    def apply_rating_change(self, added=None, removed=None):
+        """
+        Adjust the stored rating summary for one added and/or removed rating.
+        The caller must hold a row lock (select_for_update) on this project.
+        """
+        histogram = dict(empty_rating_histogram(), **(self.rating_histogram or {}))
+        if added is not None:
+            self.rating_sum += added
+            self.rating_count += 1
+            histogram[str(added)] = histogram.get(str(added), 0) + 1
+        if removed is not None:
+            self.rating_sum = max(self.rating_sum - removed, 0)
+            self.rating_count = max(self.rating_count - 1, 0)
+            histogram[str(removed)] = max(histogram.get(str(removed), 0) - 1, 0)
+        self.rating_histogram = histogram
+        self.save(update_fields=['rating_sum', 'rating_count', 'rating_histogram'])
+
+    def rebuild_rating_summary(self):
+        """
+        Recompute the rating summary from ProjectRating rows.
+        """
+        histogram = empty_rating_histogram()
+        rows = self.ratings.values('rating').annotate(n=Count('id'))
+        total = count = 0
+        for row in rows:
+            histogram[str(row['rating'])] = row['n']
+            total += row['rating'] * row['n']
+            count += row['n']
+        self.rating_sum = total
+        self.rating_count = count
+        self.rating_histogram = histogram
+        self.save(update_fields=['rating_sum', 'rating_count', 'rating_histogram'])
     
 # ===========================
 # موديل الطالب
@@ -801,6 +883,10 @@ class GroupInvitation(models.Model):
     class Meta:
         verbose_name_plural = "Group Invitations"
         unique_together = ('group', 'invited_student')
+        indexes = [
+            # أقرب مواعيد انتهاء الدعوات المعلقة (core/invitation_expiry.py)
+            models.Index(fields=['status', 'expires_at']),
+        ]
 
     def is_expired(self):
         return timezone.now() > self.expires_at and self.status == 'pending'
@@ -887,6 +973,36 @@ class NotificationLog(models.Model):
         indexes = [
             models.Index(fields=['recipient', '-created_at']),
             models.Index(fields=['is_read', 'recipient']),
+            # سياسة الاحتفاظ تحذف بالأقدم أولاً (core/notification_retention.py)
+            models.Index(fields=['created_at']),
+        ]
+
+
+class NotificationArchive(models.Model):
+    """
+    نسخة مختصرة من الإشعارات المقروءة بعد انتهاء مدة الاحتفاظ بها في NotificationLog
+    (بنفس المعرف)؛ المراجع للمجموعة والمشروع أرقام فقط بدون مفاتيح أجنبية
+    """
+    notification_id = models.IntegerField(primary_key=True)
+    recipient = models.ForeignKey('User', on_delete=models.CASCADE, related_name='archived_notifications', null=True)
+    notification_type = models.CharField(max_length=50, null=True)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    related_group_id = models.IntegerField(null=True, blank=True)
+    related_project_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.notification_type} - {self.recipient_id} (archived)"
+
+    class Meta:
+        verbose_name_plural = "Notification Archive"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at']),
+            models.Index(fields=['archived_at']),
         ]
 # ============================================================================== 
 # 7. إعدادات النظام وتسلسل الموافقات
@@ -1007,10 +1123,293 @@ class ProjectRating(models.Model):
     def __str__(self):
         return f"{self.project} - {self.rating}"
 
-@property
-def average_rating(self):
-    avg = self.ratings.aggregate(Avg('rating'))['rating__avg']
-    return avg or 0  # إذا لم يوجد تقييم، ترجع 0
-@property
-def ratings_count(self):
-    return self.ratings.count()
\ No newline at end of file
+
+# ==============================================================================
+# 9. إحصائيات الكليات (لوحة العميد)
+# ==============================================================================
+
+class CollegeStats(models.Model):
+    """
+    صف واحد لكل كلية يحتوي أعداد لوحة العميد، يُحدَّث من core/college_stats.py
+    عند تغيّر الانتماءات أو الأدوار أو المشاريع أو المجموعات أو طلبات الموافقة
+    """
+    college = models.OneToOneField(College, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    students = models.PositiveIntegerField(default=0)
+    supervisors = models.PositiveIntegerField(default=0)
+    co_supervisors = models.PositiveIntegerField(default=0)
+    projects = models.PositiveIntegerField(default=0)
+    groups = models.PositiveIntegerField(default=0)
+    pending_approvals = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats - {self.college_id}"
+
+    class Meta:
+        verbose_name_plural = "College Stats"
+
+
+# ==============================================================================
+# 10. مهام الاستيراد في الخلفية
+# ==============================================================================
+
+def import_job_file_path(instance, filename):
+    return os.path.join('imports', instance.kind, filename)
+
+
+class ImportJob(models.Model):
+    """
+    مهمة استيراد Excel (مستخدمين / مشاريع / طلاب) تُنفذ في الخلفية على دفعات.
+    next_row يتقدم مع كل دفعة في نفس المعاملة، فالمهمة الفاشلة تُستأنف منه.
+    """
+    KIND_CHOICES = [
+        ('users', 'Users'),
+        ('projects', 'Projects'),
+        ('students', 'Students'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    file = models.FileField(upload_to=import_job_file_path, blank=True, null=True)
+    options = models.JSONField(default=dict, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    next_row = models.PositiveIntegerField(default=0)
+    resumed_from = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error_message = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} import #{self.pk} ({self.status})"
+
+    @property
+    def eta_seconds(self):
+        """الوقت المتبقي التقديري حسب سرعة التشغيل الحالي"""
+        if self.status != 'running' or not self.started_at:
+            return None
+        done = self.processed_rows - self.resumed_from
+        if done <= 0:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        return round(elapsed / done * max(self.total_rows - self.processed_rows, 0), 1)
+
+    def progress(self):
+        return {
+            'id': self.pk,
+            'kind': self.kind,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'errors_count': len(self.errors),
+            'eta_seconds': self.eta_seconds,
+        }
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+# ==============================================================================
+# 11. الإشعارات الجماعية في الخلفية
+# ==============================================================================
+
+class NotificationJob(models.Model):
+    """
+    إرسال نفس الإشعار لعدد كبير من المستخدمين في الخلفية على دفعات.
+    recipient_ids = None تعني كل المستخدمين النشطين. المستلمون يُقرأون بترتيب المعرف،
+    و last_recipient_id يتقدم مع كل دفعة في نفس المعاملة، فالمهمة الفاشلة تُستأنف منه.
+    """
+    STATUS_CHOICES = ImportJob.STATUS_CHOICES
+
+    notification_type = models.CharField(max_length=50)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    recipient_ids = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_jobs')
+
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    last_recipient_id = models.BigIntegerField(default=0)
+    error_message = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.notification_type} notification job #{self.pk} ({self.status})"
+
+    def progress(self):
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'total_recipients': self.total_recipients,
+            'sent_count': self.sent_count,
+        }
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+# ==============================================================================
+# 12. قيادة المجدول وسجل تشغيل المهام
+# ==============================================================================
+
+class SchedulerLease(models.Model):
+    """
+    قفل بمدة (lease) في قاعدة البيانات: العامل الذي يملك الصف قبل expires_at هو
+    القائد الوحيد الذي يشغل مهام NotificationScheduler (core/scheduler_leadership.py)
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=255)
+    acquired_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.owner} until {self.expires_at}"
+
+
+class ScheduledJobRun(models.Model):
+    """تشغيل واحد لمهمة دورية: المدة وعدد الصفوف المتأثرة والخطأ إن وجد"""
+    STATUS_CHOICES = [
+        ('running', 'قيد التنفيذ'),
+        ('completed', 'مكتملة'),
+        ('failed', 'فشلت'),
+    ]
+
+    job_id = models.CharField(max_length=100)
+    owner = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    rows_affected = models.PositiveIntegerField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    error_message = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.job_id} run #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job_id', '-started_at']),
+        ]
+
+
+# ==============================================================================
+# 13. صندوق الأحداث الصادرة (Outbox)
+# ==============================================================================
+
+class OutboxEvent(models.Model):
+    """
+    حدث يُكتب في نفس معاملة التغيير الذي سببه (core/signals.py) وينفذه لاحقاً
+    المرسل في الخلفية (core/outbox.py)؛ dedupe_key يمنع تكرار نفس الحدث
+    """
+    STATUS_CHOICES = [
+        ('pending', 'قيد الانتظار'),
+        ('done', 'تم'),
+        ('failed', 'فشل'),
+    ]
+
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+
+# ==============================================================================
+# 14. سجل التغييرات (مزامنة الواجهة)
+# ==============================================================================
+
+class ChangeLogEntry(models.Model):
+    """
+    إضافة/تعديل/حذف صف في أحد الجداول التي تزامنها الواجهة (core/change_log.py)؛
+    seq تسلسل متزايد يستخدمه العميل كمؤشر في /api/sync/?since=
+    """
+    OP_CHOICES = [
+        ('insert', 'إضافة'),
+        ('update', 'تعديل'),
+        ('delete', 'حذف'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    table = models.CharField(max_length=50)
+    object_id = models.PositiveBigIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} {self.table}:{self.object_id}"
+
+    class Meta:
+        ordering = ['seq']
+
+
+# ==============================================================================
+# 15. فهرس البحث في المشاريع
+# ==============================================================================
+
+class ProjectSearchDocument(models.Model):
+    """طول المشروع في الفهرس (عدد كلماته الموزون) لترتيب BM25 (core/search.py)"""
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True, related_name='search_document'
+    )
+    length = models.PositiveIntegerField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"search document {self.project_id} ({self.length})"
+
+
+class ProjectSearchPosting(models.Model):
+    """كلمة (بعد التطبيع) في حقل من حقول المشروع وعدد مراتها"""
+    FIELD_CHOICES = [
+        ('title', 'العنوان'),
+        ('title_en', 'العنوان بالإنجليزية'),
+        ('description', 'الوصف'),
+        ('field', 'المجال'),
+        ('tools', 'الأدوات'),
+    ]
+
+    term = models.CharField(max_length=100)
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='search_postings')
+    tf = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.term} @ {self.field} #{self.project_id}"
+
+    class Meta:
+        constraints = [
+            # يخدم أيضاً البحث بالكلمة (وبالكلمة في حقل محدد)
+            models.UniqueConstraint(fields=['term', 'field', 'project'], name='unique_search_posting'),
+        ]
@@ -0,0 +1,196 @@
+# core/notification_counters.py
+
+"""
+عدادات الإشعارات غير المقروءة لكل مستخدم (الإجمالي وحسب notification_type) في الكاش.
+
+  - لكل مستخدم مفتاح بقائمة الأنواع المعروفة، ومفتاح عداد لكل نوع يتغير بـ incr / decr
+    (عمليات ذرية في الكاش)، والإجمالي مجموع الأنواع
+  - الإنشاء / القراءة / الحذف عبر الإشارات أدناه تُجمع حتى نهاية المعاملة وتُطبق
+    بعد نجاحها (on_commit) مرة واحدة لكل (مستخدم، نوع)، وتُهمل إذا أُلغيت المعاملة
+  - عمليات update / bulk (تحديد الكل كمقروء...) تستدعي invalidate_unread_counts
+  - أي مفتاح ناقص (أول طلب، انتهاء المهلة، نوع جديد) يعني إعادة بناء كسولة باستعلام
+    GROUP BY واحد عند القراءة التالية؛ المهلة تصحح أي انحراف نادر بين العمليات المتزامنة
+  - بعد تطبيق التغييرات تُسلم الإشعارات الجديدة والعدد لطبقة الإرسال (core/notification_push.py)
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import NotificationLog
+from .notification_push import dispatch, serialize_notification
+
+NOTIFICATION_COUNTER_TIMEOUT = getattr(settings, 'NOTIFICATION_COUNTER_TIMEOUT', 60 * 15)
+
+
+def _types_key(user_id):
+    return f'notification_unread:{user_id}:types'
+
+
+def _count_key(user_id, notification_type):
+    # notification_type يقبل NULL
+    return f'notification_unread:{user_id}:type:{notification_type or "-"}'
+
+
+# ---------------------------
+# القراءة وإعادة البناء
+# ---------------------------
+def rebuild_unread_counts(user_id):
+    """{type: count} من NotificationLog (استعلام واحد) وحفظها في الكاش"""
+    rows = (
+        NotificationLog.objects.filter(recipient_id=user_id, is_read=False)
+        .values_list('notification_type')
+        .annotate(n=Count('notification_id'))
+        .order_by()
+    )
+    by_type = dict(rows)
+    values = {_count_key(user_id, t): n for t, n in by_type.items()}
+    values[_types_key(user_id)] = list(by_type)
+    cache.set_many(values, NOTIFICATION_COUNTER_TIMEOUT)
+    return by_type
+
+
+def get_unread_counts(user_id):
+    """
+    {'count': الإجمالي, 'by_type': {type: count}} من الكاش، أو بعد إعادة البناء
+    """
+    types = cache.get(_types_key(user_id))
+    by_type = None
+    if types is not None:
+        keys = {_count_key(user_id, t): t for t in types}
+        found = cache.get_many(keys)
+        if len(found) == len(keys) and all(n >= 0 for n in found.values()):
+            by_type = {keys[key]: n for key, n in found.items()}
+    if by_type is None:
+        by_type = rebuild_unread_counts(user_id)
+    by_type = {t: n for t, n in by_type.items() if n}
+    return {'count': sum(by_type.values()), 'by_type': by_type}
+
+
+def get_unread_count(user_id):
+    return get_unread_counts(user_id)['count']
+
+
+# ---------------------------
+# التحديث
+# ---------------------------
+def _apply_delta(user_id, notification_type, delta):
+    types = cache.get(_types_key(user_id))
+    if types is None:
+        return  # لا عدادات لهذا المستخدم: تُبنى عند أول قراءة
+    if notification_type not in types:
+        # نوع جديد: القائمة تتغير، فنترك إعادة البناء تحسب كل الأنواع
+        cache.delete(_types_key(user_id))
+        return
+    try:
+        cache.incr(_count_key(user_id, notification_type), delta)
+    except ValueError:
+        # المفتاح انتهى أو حُذف
+        cache.delete(_types_key(user_id))
+
+
+def invalidate_unread_counts(*user_ids):
+    """
+    إعادة بناء العدادات عند القراءة التالية (بعد update / bulk على NotificationLog)
+    """
+    for user_id in {uid for uid in user_ids if uid}:
+        _queue(user_id, invalidate=True)
+
+
+def queue_new_notifications(notifications):
+    """
+    إشعارات أُنشئت بدون إشارات (bulk_create): تُضاف للعدادات وتُرسل بعد المعاملة
+    """
+    for notification in notifications:
+        if notification.recipient_id and not notification.is_read:
+            _queue(notification.recipient_id, notification.notification_type, 1, notification)
+
+
+class _PendingChanges(dict):
+    """
+    تغييرات معاملة واحدة {user_id: change}، مسجلة كاستدعاء on_commit لهذه المعاملة؛
+    إذا أُلغيت المعاملة (rollback) يُحذف الاستدعاء مع تغييراته
+    """
+    flushed = False
+
+    def __call__(self):
+        self.flushed = True
+        _flush(self)
+
+
+def _pending_changes():
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return None
+    for entry in connection.run_on_commit:
+        if isinstance(entry[1], _PendingChanges) and not entry[1].flushed:
+            return entry[1]
+    pending = _PendingChanges()
+    transaction.on_commit(pending)
+    return pending
+
+
+def _queue(user_id, notification_type=None, delta=0, notification=None, invalidate=False):
+    pending = _pending_changes()
+    autocommit = pending is None
+    if autocommit:
+        pending = _PendingChanges()
+    change = pending.setdefault(user_id, {'deltas': Counter(), 'invalidate': False, 'notifications': []})
+    if delta:
+        change['deltas'][notification_type] += delta
+    if invalidate:
+        change['invalidate'] = True
+    if notification is not None:
+        change['notifications'].append(serialize_notification(notification))
+    if autocommit:
+        pending()
+
+
+def _flush(changes):
+    for user_id, change in changes.items():
+        if change['invalidate']:
+            cache.delete(_types_key(user_id))
+        else:
+            for notification_type, delta in change['deltas'].items():
+                if delta:
+                    _apply_delta(user_id, notification_type, delta)
+    # العدادات محدثة الآن: الإشعارات الجديدة والعدد تُرسل معاً لكل مستخدم
+    dispatch({user_id: change['notifications'] for user_id, change in changes.items()})
+
+
+# ---------------------------
+# الإشارات
+# ---------------------------
+@receiver(pre_save, sender=NotificationLog)
+def _remember_old_state(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = (
+            NotificationLog.objects.filter(pk=instance.pk)
+            .values_list('recipient_id', 'notification_type', 'is_read')
+            .first()
+        )
+    instance._unread_counter_old = old
+
+
+@receiver(post_save, sender=NotificationLog)
+def _notification_saved(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_unread_counter_old', None)
+    new = (instance.recipient_id, instance.notification_type, instance.is_read)
+    if old == new:
+        return
+    if old and not old[2] and old[0]:
+        _queue(old[0], old[1], -1)
+    if not instance.is_read and instance.recipient_id:
+        _queue(instance.recipient_id, instance.notification_type, 1, instance if created else None)
+
+
+@receiver(post_delete, sender=NotificationLog)
+def _notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read and instance.recipient_id:
+        _queue(instance.recipient_id, instance.notification_type, -1)
@@ -0,0 +1,209 @@
+# core/notification_email.py
+
+"""
+إرسال إشعارات NotificationLog بالبريد على دفعات بدل رسالة واتصال SMTP لكل إشعار.
+
+  - الإشعارات التي لم تُرسل (is_sent_email = False) وعمرها أقل من MAX_AGE_HOURS تُقرأ
+    على دفعات من المستلمين (BATCH_SIZE مستخدم، بترتيب المعرف)
+  - كل الرسائل تُرسل عبر اتصال واحد مفتوح طوال التشغيل، كل رسالة وحدها، ثم تُعلَّم
+    إشعارات الرسائل المسلَّمة فقط بـ UPDATE واحد لكل دفعة
+  - DIGEST = 'hourly' | 'daily' يجمع إشعارات كل مستخدم في رسالة ملخص واحدة، والمجدول
+    يشغل الإرسال بنفس الفترة؛ None ترسل كل إشعار في رسالة خلال دقيقة من إنشائه
+  - مستلم فشلت رسالته يُحسب في failed ولا تُرسل بقية رسائله في هذا التشغيل؛ إشعاراته
+    تبقى غير مُعلَّمة وتُعاد في التشغيل التالي حتى MAX_AGE_HOURS، وبقية الدفعة لا تتأثر
+يعمل مع أي EMAIL_BACKEND (console في التطوير، locmem في الاختبارات).
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import NotificationLog
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_EMAIL_DEFAULTS = {
+    'DIGEST': None,         # None | 'hourly' | 'daily'
+    'BATCH_SIZE': 200,      # مستخدمون في كل دفعة
+    'MAX_AGE_HOURS': 48,    # الإشعارات الأقدم لا تُرسل بالبريد
+}
+
+DIGEST_INTERVALS = {
+    None: timedelta(minutes=1),
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+
+EMAIL_FIELDS = (
+    'notification_id', 'recipient_id', 'recipient__email', 'recipient__name', 'recipient__username',
+    'notification_type', 'title', 'message', 'created_at',
+)
+
+TYPE_LABELS = dict(NotificationLog.NOTIFICATION_TYPE_CHOICES)
+
+
+def notification_email_config():
+    return {**NOTIFICATION_EMAIL_DEFAULTS, **getattr(settings, 'NOTIFICATION_EMAIL', {})}
+
+
+def pending_emails(now=None):
+    config = notification_email_config()
+    now = now or timezone.now()
+    return (
+        NotificationLog.objects.filter(
+            is_sent_email=False,
+            created_at__gte=now - timedelta(hours=config['MAX_AGE_HOURS']),
+            recipient__is_active=True,
+        )
+        .exclude(recipient__email__isnull=True)
+        .exclude(recipient__email='')
+    )
+
+
+# ---------------------------
+# الرسائل
+# ---------------------------
+def _type_label(row):
+    return TYPE_LABELS.get(row['notification_type'], row['notification_type'] or '')
+
+
+def _timestamp(row):
+    return row['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+
+
+def build_single_email(row):
+    subject = f"[{_type_label(row)}] {row['title']}"
+    message = f"{row['message']}\n\nتم الإرسال في: {_timestamp(row)}"
+    return subject, message
+
+
+def build_digest_email(rows):
+    first = rows[0]
+    name = first['recipient__name'] or first['recipient__username']
+    subject = f"ملخص الإشعارات: {len(rows)} إشعار جديد"
+    lines = [f"مرحباً {name}،", "", f"لديك {len(rows)} إشعار جديد:", ""]
+    for row in rows:
+        lines.append(f"- [{_type_label(row)}] {row['title']}")
+        lines.append(f"  {row['message']}")
+        lines.append(f"  ({_timestamp(row)})")
+    return subject, "\n".join(lines)
+
+
+def _messages(rows, digest):
+    """[(recipient_id, (subject, body, from, to), [notification ids])] بترتيب الصفوف"""
+    by_recipient = {}
+    for row in rows:
+        by_recipient.setdefault(row['recipient_id'], []).append(row)
+    messages = []
+    for recipient_id, user_rows in by_recipient.items():
+        to = [user_rows[0]['recipient__email']]
+        if digest:
+            messages.append((recipient_id, (*build_digest_email(user_rows), settings.DEFAULT_FROM_EMAIL, to),
+                             [row['notification_id'] for row in user_rows]))
+        else:
+            messages.extend(
+                (recipient_id, (*build_single_email(row), settings.DEFAULT_FROM_EMAIL, to), [row['notification_id']])
+                for row in user_rows
+            )
+    return messages
+
+
+# ---------------------------
+# الإرسال
+# ---------------------------
+def _send_batch(rows, digest, connection):
+    """
+    يعيد (الرسائل، الإشعارات المرسلة، الإشعارات الفاشلة)؛ تُعلَّم فقط إشعارات الرسائل
+    التي قبلها الاتصال
+    """
+    sent_ids, failed_ids, failed_recipients = [], [], set()
+    emails = 0
+    for recipient_id, (subject, body, from_email, to), ids in _messages(rows, digest):
+        if recipient_id in failed_recipients:
+            failed_ids.extend(ids)
+            continue
+        try:
+            connection.send_messages([EmailMessage(subject, body, from_email, to, connection=connection)])
+        except Exception:
+            logger.exception("Could not send notification email to user %s", recipient_id)
+            failed_recipients.add(recipient_id)
+            failed_ids.extend(ids)
+            continue
+        emails += 1
+        sent_ids.extend(ids)
+    if sent_ids:
+        # update لا يمر بإشارات العدادات، و is_sent_email لا يغير عدد غير المقروء
+        NotificationLog.objects.filter(pk__in=sent_ids).update(is_sent_email=True)
+    return emails, len(sent_ids), len(failed_ids)
+
+
+def send_pending_notification_emails(digest=None, now=None, batch_size=None):
+    """
+    إرسال كل الإشعارات المعلقة. digest: 'hourly' / 'daily' ملخص لكل مستخدم،
+    False رسالة لكل إشعار، None من NOTIFICATION_EMAIL['DIGEST'].
+    يعيد تقريراً: {'job', 'rows', 'emails', 'failed', 'duration_ms'}
+    """
+    started = time.monotonic()
+    config = notification_email_config()
+    digest = config['DIGEST'] if digest is None else digest
+    batch_size = batch_size or config['BATCH_SIZE']
+    pending = pending_emails(now)
+
+    rows_sent = emails = failed = 0
+    last_recipient_id = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        while True:
+            recipient_ids = list(
+                pending.filter(recipient_id__gt=last_recipient_id)
+                .order_by('recipient_id')
+                .values_list('recipient_id', flat=True)
+                .distinct()[:batch_size]
+            )
+            if not recipient_ids:
+                break
+            last_recipient_id = recipient_ids[-1]
+            rows = list(
+                pending.filter(recipient_id__in=recipient_ids)
+                .order_by('recipient_id', 'notification_id')
+                .values(*EMAIL_FIELDS)
+            )
+            batch_emails, batch_rows, batch_failed = _send_batch(rows, digest, connection)
+            emails += batch_emails
+            rows_sent += batch_rows
+            failed += batch_failed
+    finally:
+        connection.close()
+
+    report = {
+        'job': 'send_notification_emails',
+        'rows': rows_sent,
+        'emails': emails,
+        'failed': failed,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+    }
+    if rows_sent or failed:
+        logger.info("send_notification_emails: %(rows)s notifications in %(emails)s emails, "
+                    "%(failed)s failed (%(duration_ms)sms)", report)
+    return report
+
+
+def send_notification_emails(notification_ids):
+    """إرسال إشعارات محددة الآن (كل إشعار رسالة) عبر اتصال واحد؛ يعيد عدد الرسائل"""
+    rows = list(
+        NotificationLog.objects.filter(pk__in=list(notification_ids), is_sent_email=False)
+        .exclude(recipient__email__isnull=True)
+        .exclude(recipient__email='')
+        .order_by('recipient_id', 'notification_id')
+        .values(*EMAIL_FIELDS)
+    )
+    connection = get_connection()
+    try:
+        return _send_batch(rows, None, connection)[0]
+    finally:
+        connection.close()
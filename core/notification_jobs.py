@@ -0,0 +1,116 @@
+# core/notification_jobs.py
+
+"""
+الإشعارات الجماعية في الخلفية (NotificationJob).
+
+  - start_notification_job ينشئ المهمة ثم يرسلها للعامل بعد نجاح المعاملة، بنفس
+    BACKEND مهام الاستيراد (IMPORT_JOBS في settings.py)
+  - run_notification_job يقرأ معرفات المستلمين بـ iterator() بترتيب المعرف ويكتب كل دفعة
+    بـ NotificationManager.notify_users في معاملة مستقلة يتقدم معها last_recipient_id
+  - التقدم (sent_count / total_recipients) من /api/notification-jobs/<id>/
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .import_jobs import import_job_config, is_stale, run_in_background
+from .models import NotificationJob, User
+from .notification_manager import BULK_CHUNK_SIZE, NotificationManager, _chunked
+
+logger = logging.getLogger(__name__)
+
+
+def start_notification_job(user, notification_type, title, message, recipient_ids=None):
+    job = NotificationJob.objects.create(
+        created_by=user,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        recipient_ids=sorted({int(uid) for uid in recipient_ids}) if recipient_ids is not None else None,
+    )
+    transaction.on_commit(lambda: dispatch_notification_job(job.pk))
+    return job
+
+
+def resume_notification_job(job):
+    """مثل resume_import_job: يعيد False إذا كانت المهمة مكتملة أو ما زالت تعمل"""
+    if job.status == 'completed' or (job.status == 'running' and not is_stale(job)):
+        return False
+    transaction.on_commit(lambda: dispatch_notification_job(job.pk))
+    return True
+
+
+def dispatch_notification_job(job_id):
+    backend = import_job_config()['BACKEND']
+    if backend == 'celery':
+        from .tasks import run_notification_job_task
+        run_notification_job_task.delay(job_id)
+    elif backend == 'sync':
+        run_notification_job(job_id)
+    else:
+        run_in_background(run_notification_job, job_id)
+
+
+def recipients_queryset(job):
+    qs = User.objects.filter(is_active=True)
+    if job.recipient_ids is not None:
+        qs = qs.filter(id__in=job.recipient_ids)
+    return qs
+
+
+def _claim(job_id):
+    with transaction.atomic():
+        job = NotificationJob.objects.select_for_update().filter(pk=job_id).first()
+        if job is None or job.status == 'completed':
+            return None
+        if job.status == 'running' and not is_stale(job):
+            return None
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.finished_at = None
+        job.error_message = ''
+        job.save()
+    return job
+
+
+def run_notification_job(job_id):
+    job = _claim(job_id)
+    if job is None:
+        return None
+
+    try:
+        qs = recipients_queryset(job)
+        job.total_recipients = qs.count()
+        job.save(update_fields=['total_recipients', 'updated_at'])
+
+        recipient_ids = (
+            qs.filter(id__gt=job.last_recipient_id)
+            .order_by('id')
+            .values_list('id', flat=True)
+            .iterator(chunk_size=BULK_CHUNK_SIZE)
+        )
+        for chunk in _chunked(recipient_ids, BULK_CHUNK_SIZE):
+            with transaction.atomic():
+                NotificationManager.notify_users(chunk, job.notification_type, job.title, job.message)
+                # المؤشر يُحفظ مع الإشعارات في نفس المعاملة
+                job.last_recipient_id = chunk[-1]
+                job.sent_count += len(chunk)
+                job.save(update_fields=['last_recipient_id', 'sent_count', 'updated_at'])
+    except Exception as e:
+        logger.exception("Notification job %s failed after recipient %s", job.pk, job.last_recipient_id)
+        job.refresh_from_db()
+        _finish(job, 'failed', str(e))
+        return job
+
+    _finish(job, 'completed')
+    return job
+
+
+def _finish(job, status, message=''):
+    job.status = status
+    job.error_message = message
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+    logger.info("Notification job %s %s: %s/%s", job.pk, status, job.sent_count, job.total_recipients)
@@ -1,13 +1,56 @@
 # core/notification_manager.py
 
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Count
 from .models import NotificationLog, GroupInvitation, ApprovalRequest
-from datetime import timedelta
+from .notification_counters import get_unread_counts, invalidate_unread_counts, queue_new_notifications
+from itertools import islice
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
+# عدد صفوف NotificationLog في كل bulk_create
+BULK_CHUNK_SIZE = 1000
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _time_left(expires_at, now=None):
+    """المهلة المتبقية حتى expires_at بالساعات (مقربة للأعلى) كنص عربي"""
+    hours = max(math.ceil((expires_at - (now or timezone.now())).total_seconds() / 3600), 1)
+    if hours == 1:
+        return 'ساعة واحدة'
+    if hours == 2:
+        return 'ساعتان'
+    if hours <= 10:
+        return f'{hours} ساعات'
+    return f'{hours} ساعة'
+
+
+def _fill_missing_pks(notifications):
+    """MySQL لا يعيد المفاتيح من bulk_create: نقرأها بـ (المستلم، وقت الإنشاء)"""
+    missing = [n for n in notifications if n.pk is None]
+    if not missing:
+        return
+    times = [n.created_at for n in missing]
+    rows = NotificationLog.objects.filter(
+        recipient_id__in={n.recipient_id for n in missing},
+        created_at__gte=min(times),
+        created_at__lte=max(times),
+    ).values_list('recipient_id', 'created_at', 'notification_id')
+    pks = {(recipient_id, created_at): pk for recipient_id, created_at, pk in rows}
+    for notification in missing:
+        notification.pk = pks.get((notification.recipient_id, notification.created_at))
+
 
 class NotificationManager:
     """
@@ -118,6 +161,57 @@ class NotificationManager:
             logger.error(f"✗ خطأ في إنشاء الإشعار: {str(e)}")
             return None
     
+    @staticmethod
+    def bulk_create_notifications(notifications, chunk_size=None):
+        """
+        إنشاء عدد كبير من الإشعارات بـ bulk_create على دفعات
+        
+        Args:
+            notifications: أي iterable (يفضل مولّد) من NotificationLog غير محفوظة
+            chunk_size: عدد الصفوف في كل INSERT (BULK_CHUNK_SIZE افتراضياً)
+        
+        Returns:
+            int: عدد الإشعارات المنشأة
+        """
+        count = 0
+        for chunk in _chunked(notifications, chunk_size or BULK_CHUNK_SIZE):
+            with transaction.atomic():
+                NotificationLog.objects.bulk_create(chunk)
+                _fill_missing_pks(chunk)
+                # bulk_create لا يرسل الإشارات: العدادات والإرسال الفوري بعد المعاملة
+                queue_new_notifications(chunk)
+            count += len(chunk)
+        return count
+    
+    @staticmethod
+    def notify_users(recipient_ids, notification_type, title, message,
+                     related_group=None, related_project=None,
+                     related_user=None, related_approval=None,
+                     chunk_size=None):
+        """
+        نفس الإشعار لقائمة مستخدمين (معرفات، تُقرأ تدريجياً مثل values_list(...).iterator())
+        
+        Returns:
+            int: عدد الإشعارات المنشأة
+        """
+        notifications = (
+            NotificationLog(
+                recipient_id=recipient_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                related_group=related_group,
+                related_project=related_project,
+                related_user=related_user,
+                related_approval=related_approval,
+                is_read=False
+            )
+            for recipient_id in recipient_ids
+        )
+        count = NotificationManager.bulk_create_notifications(notifications, chunk_size=chunk_size)
+        logger.info(f"✓ تم إنشاء {count} إشعار من نوع {notification_type}")
+        return count
+    
     @staticmethod
     def get_user_notifications(user, limit=50, unread_only=False):
         """
@@ -149,10 +243,7 @@ class NotificationManager:
         Returns:
             int: عدد الإشعارات غير المقروءة
         """
-        return NotificationLog.objects.filter(
-            recipient=user,
-            is_read=False
-        ).count()
+        return get_unread_counts(user.pk)['count']
     
     @staticmethod
     def get_unread_by_type(user):
@@ -163,12 +254,10 @@ class NotificationManager:
             user: المستخدم
         
         Returns:
-            QuerySet: إحصائيات الإشعارات حسب النوع
+            list: [{'notification_type': ..., 'count': ...}]
         """
-        return NotificationLog.objects.filter(
-            recipient=user,
-            is_read=False
-        ).values('notification_type').annotate(count=Count('notification_id'))
+        by_type = get_unread_counts(user.pk)['by_type']
+        return [{'notification_type': t, 'count': n} for t, n in by_type.items()]
     
     @staticmethod
     def mark_as_read(notification_id, user):
@@ -214,6 +303,8 @@ class NotificationManager:
             is_read=True,
             read_at=timezone.now()
         )
+        # update لا يرسل إشارات العدادات
+        invalidate_unread_counts(user.pk)
         logger.info(f"✓ تم تحديد {count} إشعار كمقروء للمستخدم {user.username}")
         return count
     
@@ -242,22 +333,22 @@ class NotificationManager:
             return False
     
     @staticmethod
-    def delete_old_notifications(days=90):
+    def delete_old_notifications(days=None):
         """
-        حذف الإشعارات القديمة
+        حذف الإشعارات القديمة على دفعات حسب سياسة الاحتفاظ
+        (NOTIFICATION_RETENTION، core/notification_retention.py)
         
         Args:
-            days: عدد الأيام (حذف الإشعارات الأقدم من هذا العدد)
+            days: عدد الأيام لكل الأنواع (None: مدة كل نوع من الإعدادات)
         
         Returns:
-            int: عدد الإشعارات المحذوفة
-        """
-        cutoff_date = timezone.now() - timedelta(days=days)
-        deleted_count, _ = NotificationLog.objects.filter(
-            created_at__lt=cutoff_date
-        ).delete()
-        logger.info(f"✓ تم حذف {deleted_count} إشعار قديم")
-        return deleted_count
+            int: عدد الإشعارات المحذوفة من NotificationLog (ومنها المؤرشفة)
+        """
+        from .notification_retention import apply_notification_retention
+        
+        report = apply_notification_retention(days=days)
+        logger.info(f"✓ تم حذف {report['deleted']} إشعار قديم (أُرشف منها {report['archived']})")
+        return report['deleted']
     
     @staticmethod
     def get_notification_stats(user):
@@ -270,16 +361,17 @@ class NotificationManager:
         Returns:
             dict: إحصائيات الإشعارات
         """
-        total = NotificationLog.objects.filter(recipient=user).count()
-        unread = NotificationLog.objects.filter(recipient=user, is_read=False).count()
-        by_type = NotificationLog.objects.filter(
-            recipient=user
-        ).values('notification_type').annotate(count=Count('notification_id'))
+        by_type = list(
+            NotificationLog.objects.filter(recipient=user)
+            .values('notification_type')
+            .annotate(count=Count('notification_id'))
+            .order_by()
+        )
         
         return {
-            'total': total,
-            'unread': unread,
-            'by_type': list(by_type)
+            'total': sum(row['count'] for row in by_type),
+            'unread': get_unread_counts(user.pk)['count'],
+            'by_type': by_type
         }
 
 
@@ -289,15 +381,21 @@ class InvitationNotificationManager:
     """
     
     @staticmethod
-    def notify_invitation_sent(group, invited_student, invited_by):
+    def notify_invitation_sent(group, invited_student, invited_by, expires_at=None):
         """
-        إشعار الطالب بدعوة جديدة
+        إشعار الطالب بدعوة جديدة (مع المهلة المتبقية حتى expires_at للدعوة)
         """
+        message = (
+            f'تم دعوتك من قبل {invited_by.name or invited_by.username} للانضمام إلى مجموعة '
+            f'"{group.project.title if group.project_id else group.pk}".'
+        )
+        if expires_at is not None:
+            message += f' لديك {_time_left(expires_at)} للرد على الدعوة.'
         return NotificationManager.create_notification(
             recipient=invited_student,
             notification_type='invitation',
             title='دعوة جديدة للانضمام إلى مجموعة',
-            message=f'تم دعوتك من قبل {invited_by.name} للانضمام إلى مجموعة "{group.group_name}"',
+            message=message,
             related_group=group,
             related_user=invited_by,
             priority='high'
@@ -448,7 +546,7 @@ class SystemNotificationManager:
         )
     
     @staticmethod
-    def notify_all_users(title, message, notification_type='system_info'):
+    def notify_all_users(title, message, notification_type='system_info', background=False, created_by=None):
         """
         إرسال إشعار لجميع المستخدمين النشطين
         
@@ -456,24 +554,25 @@ class SystemNotificationManager:
             title: عنوان الإشعار
             message: محتوى الإشعار
             notification_type: نوع الإشعار
+            background: تنفيذ الإرسال كمهمة في الخلفية (NotificationJob) تقدمها في /api/notification-jobs/<id>/
+            created_by: صاحب المهمة (مطلوب مع background)
         
         Returns:
-            int: عدد المستخدمين الذين تم إرسال الإشعار لهم
+            int: عدد المستخدمين الذين تم إرسال الإشعار لهم، أو NotificationJob مع background
         """
         from .models import User
         
-        users = User.objects.filter(is_active=True)
-        count = 0
+        if background:
+            from .notification_jobs import start_notification_job
+            return start_notification_job(created_by, notification_type, title, message)
         
-        for user in users:
-            NotificationManager.create_notification(
-                recipient=user,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                priority='medium'
-            )
-            count += 1
+        recipient_ids = (
+            User.objects.filter(is_active=True)
+            .order_by('id')
+            .values_list('id', flat=True)
+            .iterator(chunk_size=BULK_CHUNK_SIZE)
+        )
+        count = NotificationManager.notify_users(recipient_ids, notification_type, title, message)
         
         logger.info(f"✓ تم إرسال إشعار نظام إلى {count} مستخدم")
         return count
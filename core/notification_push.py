@@ -0,0 +1,122 @@
+# core/notification_push.py
+
+"""
+إرسال الإشعارات الجديدة وعدد غير المقروء إلى WebSocket (NotificationConsumer).
+
+  - notification_counters يجمع تغييرات NotificationLog داخل المعاملة، وبعد نجاحها
+    (on_commit) يسلمها هنا مع الإشعارات الجديدة لكل مستخدم عبر dispatch
+  - dispatch يضيفها إلى مخزن مؤقت على مستوى العملية لمدة NOTIFICATION_PUSH['WINDOW']
+    ثانية: كل الإشعارات لنفس المستخدم خلال النافذة تُدمج في رسالة واحدة مع العدد الأخير
+  - عند انتهاء النافذة تُرسل رسائل كل المستخدمين إلى طبقة القنوات على دفعات
+    (BATCH_SIZE رسالة متزامنة لكل دفعة) داخل حلقة async واحدة
+WINDOW = 0 يرسل مباشرة بعد المعاملة (الاختبارات، أو بدون خيوط في الخلفية).
+"""
+
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_PUSH_DEFAULTS = {
+    'WINDOW': 0.25,       # ثوانٍ لتجميع الإشعارات لكل مستخدم
+    'BATCH_SIZE': 200,    # رسائل group_send المتزامنة في كل دفعة
+}
+
+_buffer = {}   # user_id -> [notification payloads]
+_buffer_lock = threading.Lock()
+_timer = None
+
+
+def notification_push_config():
+    return {**NOTIFICATION_PUSH_DEFAULTS, **getattr(settings, 'NOTIFICATION_PUSH', {})}
+
+
+def serialize_notification(notification):
+    from .serializers.notifications import NotificationLogSerializer
+    return NotificationLogSerializer(notification).data
+
+
+# ---------------------------
+# التجميع
+# ---------------------------
+def dispatch(changes):
+    """
+    changes: {user_id: [payloads]} بعد نجاح المعاملة؛ قائمة فارغة تعني تغير العدد فقط
+    """
+    global _timer
+    if not changes:
+        return
+    window = notification_push_config()['WINDOW']
+    with _buffer_lock:
+        for user_id, notifications in changes.items():
+            _buffer.setdefault(user_id, []).extend(notifications)
+        start_timer = window > 0 and _timer is None
+        if start_timer:
+            _timer = threading.Timer(window, _flush_in_thread)
+            _timer.daemon = True
+            _timer.start()
+    if window <= 0:
+        flush_push_buffer()
+
+
+def _flush_in_thread():
+    try:
+        flush_push_buffer()
+    finally:
+        # اتصالات قاعدة البيانات خاصة بكل خيط (إعادة بناء العدادات)
+        connections.close_all()
+
+
+def flush_push_buffer():
+    """إرسال كل ما في المخزن الآن؛ يعيد عدد المستخدمين الذين أُرسل لهم"""
+    global _timer
+    from .notification_counters import get_unread_counts
+
+    with _buffer_lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+        _timer = None
+    if not pending:
+        return 0
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return 0
+    messages = []
+    for user_id, notifications in pending.items():
+        try:
+            counts = get_unread_counts(user_id)
+        except Exception:
+            logger.warning("Could not read unread count of user %s", user_id, exc_info=True)
+            continue
+        messages.append((f'notifications_{user_id}', {
+            'type': 'notification_batch',
+            'notifications': notifications,
+            'count': counts['count'],
+            # مفاتيح الرسائل في طبقة القنوات (msgpack) نصوص فقط
+            'by_type': {t or '': n for t, n in counts['by_type'].items()},
+        }))
+    try:
+        async_to_sync(_send_batches)(channel_layer, messages, notification_push_config()['BATCH_SIZE'])
+    except Exception:
+        # WebSocket اختياري: العميل يستطيع طلب الإشعارات والعدد
+        logger.warning("Could not push notifications to %s users", len(messages), exc_info=True)
+    return len(messages)
+
+
+async def _send_batches(channel_layer, messages, batch_size):
+    for start in range(0, len(messages), batch_size):
+        batch = messages[start:start + batch_size]
+        results = await asyncio.gather(
+            *(channel_layer.group_send(group, message) for group, message in batch),
+            return_exceptions=True,
+        )
+        for (group, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.warning("Could not push to %s: %s", group, result)
@@ -0,0 +1,152 @@
+# core/notification_retention.py
+
+"""
+سياسة الاحتفاظ بالإشعارات: حذف (أو أرشفة) NotificationLog الأقدم من مدة نوعها.
+
+  - المدة لكل notification_type من NOTIFICATION_RETENTION['TYPES']، وبقية الأنواع DEFAULT_DAYS
+  - الحذف على دفعات محدودة بالمفتاح الأساسي (BATCH_SIZE)، كل دفعة في معاملة قصيرة:
+    قراءة المعرفات بالفهرس على created_at ثم DELETE ... WHERE pk IN (...)
+  - بدون تحميل الكائنات ولا إشارات post_delete لكل صف؛ عدادات غير المقروء للمستلمين
+    المتأثرين تُبطل مرة واحدة لكل دفعة
+  - ARCHIVE_READ = True ينقل الإشعارات المقروءة إلى NotificationArchive قبل حذفها،
+    و ARCHIVE_DAYS (إن وُجد) يحذف الأرشيف الأقدم منه بنفس الطريقة
+  - أحداث OutboxEvent المنفذة (done) الأقدم من OUTBOX['DONE_DAYS'] تُحذف بنفس الدفعات؛
+    الفاشلة (failed) تبقى للمراجعة
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NotificationArchive, NotificationLog, OutboxEvent
+from .notification_counters import invalidate_unread_counts
+from .outbox import outbox_config
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_RETENTION_DEFAULTS = {
+    'DEFAULT_DAYS': 90,
+    'TYPES': {},             # {notification_type: days}
+    'ARCHIVE_READ': False,   # نقل المقروء إلى NotificationArchive بدل حذفه
+    'ARCHIVE_DAYS': None,    # مدة الاحتفاظ بالأرشيف (None: بدون حذف)
+    'BATCH_SIZE': 1000,
+}
+
+ARCHIVE_FIELDS = (
+    'notification_id', 'recipient_id', 'notification_type', 'title', 'message',
+    'related_group_id', 'related_project_id', 'created_at', 'read_at',
+)
+
+
+def notification_retention_config():
+    return {**NOTIFICATION_RETENTION_DEFAULTS, **getattr(settings, 'NOTIFICATION_RETENTION', {})}
+
+
+def retention_policies(config, days=None):
+    """
+    [(queryset, days)]: نوع لكل مدة محددة، ثم بقية الأنواع (ومنها NULL) بالمدة الافتراضية.
+    days يطبق مدة واحدة على كل الأنواع.
+    """
+    if days is not None:
+        return [(NotificationLog.objects.all(), days)]
+    types = config['TYPES']
+    policies = [
+        (NotificationLog.objects.filter(notification_type=notification_type), type_days)
+        for notification_type, type_days in types.items()
+    ]
+    # exclude في Django يشمل notification_type = NULL
+    policies.append((NotificationLog.objects.exclude(notification_type__in=list(types)), config['DEFAULT_DAYS']))
+    return policies
+
+
+# ---------------------------
+# الدفعات
+# ---------------------------
+def _purge_batch(ids, archive):
+    """حذف (وأرشفة المقروء من) دفعة واحدة؛ يعيد (المحذوف، المؤرشف)"""
+    with transaction.atomic():
+        rows = list(NotificationLog.objects.filter(pk__in=ids).values(*ARCHIVE_FIELDS, 'is_read'))
+        archived = 0
+        if archive:
+            archived = len(NotificationArchive.objects.bulk_create(
+                [
+                    NotificationArchive(**{field: row[field] for field in ARCHIVE_FIELDS})
+                    for row in rows if row['is_read']
+                ],
+                ignore_conflicts=True,  # دفعة أُعيدت بعد فشل جزئي
+            ))
+        # _raw_delete: DELETE مباشر بدون جمع الكائنات وإشارات post_delete لكل صف
+        # (لا يوجد جدول يشير إلى NotificationLog)
+        deleted = NotificationLog.objects.filter(pk__in=ids)._raw_delete(NotificationLog.objects.db)
+        invalidate_unread_counts(*{row['recipient_id'] for row in rows if not row['is_read']})
+    return deleted, archived
+
+
+def _batched_ids(queryset, batch_size):
+    """معرفات الصفوف المطابقة دفعة بعد دفعة (الصفوف المحذوفة تخرج من الاستعلام التالي)"""
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        if len(ids) < batch_size:
+            return
+
+
+def apply_notification_retention(now=None, days=None, batch_size=None, archive=None):
+    """
+    تطبيق سياسة الاحتفاظ؛ يعيد تقريراً:
+    {'job', 'rows', 'deleted', 'archived', 'archive_deleted', 'outbox_deleted', 'batches', 'duration_ms'}
+    """
+    started = time.monotonic()
+    now = now or timezone.now()
+    config = notification_retention_config()
+    batch_size = batch_size or config['BATCH_SIZE']
+    archive = config['ARCHIVE_READ'] if archive is None else archive
+
+    deleted = archived = batches = 0
+    for queryset, policy_days in retention_policies(config, days):
+        expired = queryset.filter(created_at__lt=now - timedelta(days=policy_days))
+        for ids in _batched_ids(expired, batch_size):
+            batch_deleted, batch_archived = _purge_batch(ids, archive)
+            deleted += batch_deleted
+            archived += batch_archived
+            batches += 1
+
+    archive_deleted = 0
+    if config['ARCHIVE_DAYS'] is not None:
+        old_archive = NotificationArchive.objects.filter(
+            archived_at__lt=now - timedelta(days=config['ARCHIVE_DAYS'])
+        )
+        for ids in _batched_ids(old_archive, batch_size):
+            archive_deleted += NotificationArchive.objects.filter(pk__in=ids)._raw_delete(NotificationArchive.objects.db)
+            batches += 1
+
+    outbox_deleted = 0
+    done_events = OutboxEvent.objects.filter(
+        status='done', processed_at__lt=now - timedelta(days=outbox_config()['DONE_DAYS'])
+    )
+    for ids in _batched_ids(done_events, batch_size):
+        outbox_deleted += OutboxEvent.objects.filter(pk__in=ids).delete()[0]
+        batches += 1
+
+    report = {
+        'job': 'notification_retention',
+        'rows': deleted,
+        'deleted': deleted,
+        'archived': archived,
+        'archive_deleted': archive_deleted,
+        'outbox_deleted': outbox_deleted,
+        'batches': batches,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info(
+        "notification_retention: %(deleted)s deleted, %(archived)s archived, "
+        "%(archive_deleted)s archive rows and %(outbox_deleted)s outbox events deleted in %(batches)s batches "
+        "(%(duration_ms)sms)", report,
+    )
+    return report
@@ -0,0 +1,147 @@
+# core/outbox.py
+
+"""
+صندوق الأحداث الصادرة (transactional outbox) للإشعارات المرتبطة بالإشارات.
+
+  - enqueue_event يكتب OutboxEvent في نفس معاملة التغيير (post_save في core/signals.py)،
+    فالحدث يُحفظ مع التغيير أو يُلغى معه، ولا يضيف عمل الإشعار إلى زمن الطلب
+  - بعد نجاح المعاملة يُطلب تفريغ الصندوق في الخلفية (IMPORT_JOBS['BACKEND'])، والمجدول
+    يفرغه دورياً أيضاً لاستكمال ما تركته عملية توقفت
+  - drain_outbox يقرأ الأحداث المستحقة على دفعات (select_for_update(skip_locked) فعدة عمال
+    لا يأخذون نفس الحدث)؛ كل حدث في savepoint مستقل: نتيجة المعالج وعلامة done تُحفظان معاً
+  - الحدث الفاشل يُعاد بعد RETRY_DELAY * attempts ثانية، وبعد MAX_ATTEMPTS يصبح failed مع آخر خطأ
+  - المعالجات (register_handler) يجب أن تكون idempotent: تشغيل الحدث مرتين لا يكرر الإشعار
+  - أحداث done الأقدم من DONE_DAYS تحذفها مهمة الاحتفاظ (core/notification_retention.py)؛
+    dedupe_key يحمل معرف الصف المسبب، فحذف الحدث المنفذ لا يسمح بتكراره
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .import_jobs import import_job_config, run_in_background
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 60,   # ثوانٍ، تتضاعف مع كل محاولة
+    'DONE_DAYS': 7,      # مدة الاحتفاظ بالأحداث المنفذة
+}
+
+OUTBOX_HANDLERS = {}
+
+
+def outbox_config():
+    return {**OUTBOX_DEFAULTS, **getattr(settings, 'OUTBOX', {})}
+
+
+def register_handler(event_type):
+    """مزخرف لتسجيل معالج نوع حدث: handler(payload, event)"""
+    def decorator(func):
+        OUTBOX_HANDLERS[event_type] = func
+        return func
+    return decorator
+
+
+# ---------------------------
+# الكتابة
+# ---------------------------
+def enqueue_event(event_type, payload, dedupe_key=None):
+    """
+    إضافة حدث داخل المعاملة الحالية؛ يعيد False إذا كان الحدث (dedupe_key) موجوداً
+    """
+    try:
+        with transaction.atomic():
+            OutboxEvent.objects.create(
+                event_type=event_type,
+                payload=payload,
+                dedupe_key=dedupe_key or f'{event_type}:{payload}',
+            )
+    except IntegrityError:
+        return False
+    transaction.on_commit(dispatch_outbox)
+    return True
+
+
+def dispatch_outbox():
+    backend = import_job_config()['BACKEND']
+    if backend == 'celery':
+        from .tasks import drain_outbox_task
+        drain_outbox_task.delay()
+    elif backend == 'sync':
+        drain_outbox()
+    else:
+        run_in_background(drain_outbox)
+
+
+# ---------------------------
+# التفريغ
+# ---------------------------
+def _process(event, config):
+    handler = OUTBOX_HANDLERS.get(event.event_type)
+    try:
+        if handler is None:
+            raise LookupError(f'No outbox handler for {event.event_type}')
+        with transaction.atomic():
+            handler(event.payload, event)
+    except Exception as e:
+        event.attempts += 1
+        event.last_error = str(e)
+        if event.attempts >= config['MAX_ATTEMPTS']:
+            event.status = 'failed'
+            logger.error("Outbox event %s (%s) failed: %s", event.pk, event.event_type, e)
+        else:
+            event.available_at = timezone.now() + timedelta(seconds=config['RETRY_DELAY'] * 2 ** (event.attempts - 1))
+            logger.warning("Outbox event %s (%s) will be retried: %s", event.pk, event.event_type, e)
+        event.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+        return False
+    event.status = 'done'
+    event.processed_at = timezone.now()
+    event.save(update_fields=['status', 'processed_at'])
+    return True
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    """
+    تنفيذ الأحداث المستحقة حتى يفرغ الصندوق (أو max_batches دفعة)؛ يعيد تقريراً:
+    {'job', 'rows', 'failed', 'batches', 'duration_ms'}
+    """
+    started = time.monotonic()
+    config = outbox_config()
+    batch_size = batch_size or config['BATCH_SIZE']
+    processed = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', available_at__lte=timezone.now())
+                .order_by('available_at', 'id')[:batch_size]
+            )
+            for event in events:
+                if _process(event, config):
+                    processed += 1
+                else:
+                    failed += 1
+        if not events:
+            break
+        batches += 1
+        if len(events) < batch_size:
+            break
+
+    report = {
+        'job': 'drain_outbox',
+        'rows': processed,
+        'failed': failed,
+        'batches': batches,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+    }
+    if processed or failed:
+        logger.info("drain_outbox: %(rows)s done, %(failed)s failed in %(batches)s batches (%(duration_ms)sms)", report)
+    return report
@@ -0,0 +1,333 @@
+# core/pagination.py
+
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .permissions import PermissionManager
+
+
+class ProjectKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for project lists.
+
+    Rows are ordered by (-start_date, project_id) with projects without a
+    start year last. The cursor stores the (start_date, project_id) of the
+    boundary row, so each page is a single indexed range scan no matter how
+    deep the client goes, and rows inserted or deleted between requests never
+    shift a page. Filters and search params stay in the query string and are
+    re-applied unchanged on every page.
+
+    Settings (``PROJECT_PAGINATION`` in settings.py):
+        PAGE_SIZE: default rows per page
+        MAX_PAGE_SIZE: upper bound for the ``page_size`` query param
+        ROLE_PAGE_SIZE_CAPS: optional {role type: cap}; a user gets the
+            largest cap among their roles, superusers are never capped
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        config = getattr(settings, 'PROJECT_PAGINATION', {})
+        self.default_page_size = config.get('PAGE_SIZE', 20)
+        self.max_page_size = config.get('MAX_PAGE_SIZE', 100)
+        self.role_page_size_caps = config.get('ROLE_PAGE_SIZE_CAPS', {})
+
+    # ---------------------------
+    # Ordering
+    # ---------------------------
+    @staticmethod
+    def _ordering(reverse=False):
+        if reverse:
+            return (F('start_date').asc(nulls_first=True), F('project_id').desc())
+        return (F('start_date').desc(nulls_last=True), F('project_id').asc())
+
+    @staticmethod
+    def _after(start_date, project_id, reverse=False):
+        """
+        Rows strictly after the (start_date, project_id) position in the
+        chosen direction. NULL start dates sort after every year.
+        """
+        if not reverse:
+            if start_date is None:
+                return Q(start_date__isnull=True, project_id__gt=project_id)
+            return (
+                Q(start_date__lt=start_date)
+                | Q(start_date=start_date, project_id__gt=project_id)
+                | Q(start_date__isnull=True)
+            )
+
+        if start_date is None:
+            return (
+                Q(start_date__isnull=True, project_id__lt=project_id)
+                | Q(start_date__isnull=False)
+            )
+        return (
+            Q(start_date__gt=start_date)
+            | Q(start_date=start_date, project_id__lt=project_id)
+        )
+
+    # ---------------------------
+    # Cursor encoding
+    # ---------------------------
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            data = json.loads(raw)
+            start_date = data['s']
+            if start_date is not None:
+                start_date = int(start_date)
+            return start_date, int(data['p']), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        data = {'s': row.start_date, 'p': row.project_id}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    # ---------------------------
+    # Page size
+    # ---------------------------
+    def get_role_cap(self, request):
+        """
+        Largest configured cap among the user's roles, or None when no cap
+        applies. Roles come from the cached role profile.
+        """
+        if not self.role_page_size_caps:
+            return None
+        user = getattr(request, 'user', None)
+        if not user or not user.is_authenticated:
+            return self.role_page_size_caps.get('Anonymous')
+        if user.is_superuser:
+            return None
+
+        role_types = PermissionManager.get_user_roles(user)
+        caps = [self.role_page_size_caps[r] for r in role_types if r in self.role_page_size_caps]
+        return max(caps) if caps else None
+
+    def get_page_size(self, request):
+        page_size = self.default_page_size
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw:
+            try:
+                requested = int(raw)
+                if requested > 0:
+                    page_size = requested
+            except ValueError:
+                pass
+
+        page_size = min(page_size, self.max_page_size)
+        cap = self.get_role_cap(request)
+        if cap:
+            page_size = min(page_size, cap)
+        return page_size
+
+    # ---------------------------
+    # Pagination
+    # ---------------------------
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        cursor = self.decode_cursor(request)
+        reverse = False
+        if cursor is not None:
+            start_date, project_id, reverse = cursor
+            queryset = queryset.filter(self._after(start_date, project_id, reverse))
+
+        # fetch one extra row to know whether another page exists
+        rows = list(queryset.order_by(*self._ordering(reverse))[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('page_size', self.page_size),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class NotificationKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for the notification inbox.
+
+    Rows are ordered newest first by (created_at, notification_id), which the
+    (recipient, -created_at) index on NotificationLog serves directly, so a
+    page costs one index range scan however long the user's history is.
+
+    Query params:
+        cursor: opaque position from a previous ``next`` link (older rows)
+        since: opaque position from a previous ``since`` value; only rows
+            newer than it are returned, so a client polls for what it lacks
+        page_size (or ``limit``): rows per page, capped by MAX_PAGE_SIZE
+
+    ``since`` in the response is the position of the newest row the client
+    now holds and can be sent back on the next poll.
+
+    Settings (``NOTIFICATION_PAGINATION`` in settings.py):
+        PAGE_SIZE: default rows per page
+        MAX_PAGE_SIZE: upper bound for the page size params
+    """
+
+    cursor_query_param = 'cursor'
+    since_query_param = 'since'
+    page_size_query_params = ('page_size', 'limit')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        config = getattr(settings, 'NOTIFICATION_PAGINATION', {})
+        self.default_page_size = config.get('PAGE_SIZE', 50)
+        self.max_page_size = config.get('MAX_PAGE_SIZE', 200)
+
+    # ---------------------------
+    # Cursor encoding
+    # ---------------------------
+    def decode_position(self, request, param):
+        encoded = request.query_params.get(param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            data = json.loads(raw)
+            return datetime.fromisoformat(data['t']), int(data['i'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_position(row):
+        data = {'t': row.created_at.isoformat(), 'i': row.notification_id}
+        return base64.urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+
+    @staticmethod
+    def _older(created_at, notification_id):
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, notification_id__lt=notification_id)
+
+    @staticmethod
+    def _newer(created_at, notification_id):
+        return Q(created_at__gt=created_at) | Q(created_at=created_at, notification_id__gt=notification_id)
+
+    # ---------------------------
+    # Pagination
+    # ---------------------------
+    def get_page_size(self, request):
+        page_size = self.default_page_size
+        for param in self.page_size_query_params:
+            raw = request.query_params.get(param)
+            if raw:
+                try:
+                    requested = int(raw)
+                    if requested > 0:
+                        page_size = requested
+                except ValueError:
+                    pass
+                break
+        return min(page_size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        cursor = self.decode_position(request, self.cursor_query_param)
+        since = self.decode_position(request, self.since_query_param)
+        if since is not None:
+            queryset = queryset.filter(self._newer(*since))
+        if cursor is not None:
+            queryset = queryset.filter(self._older(*cursor))
+
+        # fetch one extra row to know whether another page exists
+        rows = list(queryset.order_by('-created_at', '-notification_id')[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+
+        # the newest row the client holds after this request: the first row of
+        # the first page, or whatever it already had
+        if cursor is None and self.page:
+            self.since = self.encode_position(self.page[0])
+        else:
+            self.since = request.query_params.get(self.since_query_param)
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_position(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('since', self.since),
+            ('page_size', self.page_size),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'since': {'type': 'string', 'nullable': True},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -1,8 +1,17 @@
 # core/permissions.py
 
+import uuid
+
+from asgiref.local import Local
+from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
-from .models import Role, RolePermission, UserRoles
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import AcademicAffiliation, Role, RolePermission, UserRoles
 
 # ==============================================================================
 # 1. قائمة الصلاحيات المتاحة في النظام
@@ -152,14 +161,206 @@ ROLES_PERMISSIONS = {
 }
 
 # ==============================================================================
-# 3. دوال مساعدة للتحقق من الصلاحيات
+# 3. ملف الأدوار (Role profile) والتخزين المؤقت
+# ==============================================================================
+# كل الأسئلة عن أدوار المستخدم وصلاحياته ونطاقه الأكاديمي تُجاب من "ملف" واحد
+# يُبنى مرة واحدة (3 استعلامات) ثم:
+#   - يُحفظ طوال الطلب الحالي (request-scoped memo)
+#   - ويُحفظ في الكاش المشترك بمفتاح يحتوي رقم نسخة خاص بالمستخدم
+# رقم النسخة يتغير عند أي تعديل على UserRoles / RolePermission / Role /
+# AcademicAffiliation الخاصة بالمستخدم، فلا حاجة لحذف المفاتيح القديمة.
+
+ADMIN_ROLE_TYPES = ['Department Head', 'Dean', 'University President', 'System Manager', 'Ministry', 'Admin', 'super user']
+
+ROLE_PROFILE_CACHE_TIMEOUT = getattr(settings, 'ROLE_PROFILE_CACHE_TIMEOUT', 60 * 15)
+
+_profile_local = Local()
+
+
+class RoleProfile:
+    """
+    الأدوار والصلاحيات والانتماءات الأكاديمية لمستخدم واحد
+    """
+
+    def __init__(self, roles, permissions, affiliations):
+        self.roles = roles                # [(role_id, role_type), ...]
+        self.permissions = set(permissions)
+        self.affiliations = affiliations  # الأحدث أولاً (start_date تنازلياً)
+
+    @property
+    def role_ids(self):
+        return [role_id for role_id, _ in self.roles]
+
+    @property
+    def role_types(self):
+        return [role_type for _, role_type in self.roles]
+
+    def has_role(self, *role_types):
+        # مقارنة غير حساسة لحالة الأحرف مثل ترتيب MySQL الافتراضي
+        wanted = {t.lower() for t in role_types}
+        return any((r or '').lower() in wanted for r in self.role_types)
+
+    @property
+    def university_ids(self):
+        return [a['university_id'] for a in self.affiliations if a['university_id']]
+
+    @property
+    def college_ids(self):
+        return [a['college_id'] for a in self.affiliations if a['college_id']]
+
+    @property
+    def department_ids(self):
+        return [a['department_id'] for a in self.affiliations if a['department_id']]
+
+    @property
+    def latest_affiliation(self):
+        return self.affiliations[0] if self.affiliations else None
+
+    def to_dict(self):
+        return {
+            'roles': self.roles,
+            'permissions': sorted(self.permissions),
+            'affiliations': self.affiliations,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([tuple(r) for r in data['roles']], data['permissions'], data['affiliations'])
+
+    @classmethod
+    def build(cls, user_id):
+        roles = list(
+            UserRoles.objects.filter(user_id=user_id)
+            .order_by('id')
+            .values_list('role_id', 'role__type')
+        )
+        permissions = []
+        if roles:
+            permissions = list(
+                RolePermission.objects.filter(role_id__in=[r[0] for r in roles])
+                .values_list('permission__name', flat=True)
+                .distinct()
+            )
+        affiliations = list(
+            AcademicAffiliation.objects.filter(user_id=user_id)
+            .order_by('-start_date', '-affiliation_id')
+            .values('university_id', 'college_id', 'department_id', 'Program_id')
+        )
+        return cls(roles, permissions, affiliations)
+
+
+EMPTY_ROLE_PROFILE = RoleProfile([], [], [])
+
+
+def _version_key(user_id):
+    return f'role_profile:version:{user_id}'
+
+
+def _role_profile_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # لا توجد نسخة (أول مرة أو حُذفت من الكاش): نبدأ نسخة جديدة
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_role_profile_version(*user_ids):
+    """
+    إبطال ملف الأدوار لمستخدم أو أكثر (يُستدعى تلقائياً من الإشارات أدناه،
+    ويجب استدعاؤه يدوياً بعد أي bulk_create / update على هذه الجداول)
+    """
+    user_ids = {uid for uid in user_ids if uid}
+    if not user_ids:
+        return
+    _bump(user_ids)
+    # طلب آخر قد يبني الملف من البيانات القديمة قبل انتهاء المعاملة: نبطله مرة أخرى بعدها
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(user_ids))
+
+
+def _bump(user_ids):
+    cache.set_many({_version_key(uid): uuid.uuid4().hex for uid in user_ids}, None)
+    memo = getattr(_profile_local, 'profiles', None)
+    if memo:
+        for uid in user_ids:
+            memo.pop(uid, None)
+
+
+def get_role_profile(user):
+    """
+    ملف الأدوار للمستخدم: من ذاكرة الطلب، ثم الكاش المشترك، ثم قاعدة البيانات
+    """
+    if not user or not user.is_authenticated:
+        return EMPTY_ROLE_PROFILE
+
+    memo = getattr(_profile_local, 'profiles', None)
+    if memo is not None and user.pk in memo:
+        return memo[user.pk]
+
+    key = f'role_profile:{user.pk}:{_role_profile_version(user.pk)}'
+    data = cache.get(key)
+    if data is None:
+        profile = RoleProfile.build(user.pk)
+        cache.set(key, profile.to_dict(), ROLE_PROFILE_CACHE_TIMEOUT)
+    else:
+        profile = RoleProfile.from_dict(data)
+
+    if memo is not None:
+        memo[user.pk] = profile
+    return profile
+
+
+# ذاكرة الطلب: تعمل فقط داخل طلب HTTP، وخارجه (Celery / الأوامر) نعتمد على الكاش المشترك
+@receiver(request_started)
+def _start_role_profile_memo(**kwargs):
+    _profile_local.profiles = {}
+
+
+@receiver(request_finished)
+def _end_role_profile_memo(**kwargs):
+    _profile_local.profiles = None
+
+
+@receiver(post_save, sender=UserRoles)
+@receiver(post_delete, sender=UserRoles)
+@receiver(post_save, sender=AcademicAffiliation)
+@receiver(post_delete, sender=AcademicAffiliation)
+def _user_scope_changed(sender, instance, **kwargs):
+    bump_role_profile_version(instance.user_id)
+
+
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def _role_permissions_changed(sender, instance, **kwargs):
+    bump_role_profile_version(
+        *UserRoles.objects.filter(role_id=instance.role_id).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Role)
+def _role_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_role_profile_version(
+            *UserRoles.objects.filter(role_id=instance.pk).values_list('user_id', flat=True)
+        )
+
+
+# ==============================================================================
+# 4. دوال مساعدة للتحقق من الصلاحيات
 # ==============================================================================
 
 class PermissionManager:
     """
     مدير الصلاحيات - يوفر دوال للتحقق من الصلاحيات والأدوار
+    كل الدوال تقرأ من ملف الأدوار (get_role_profile) بدل الاستعلام في كل مرة
     """
-    
+
+    @staticmethod
+    def get_role_profile(user):
+        return get_role_profile(user)
+
     @staticmethod
     def has_permission(user, permission_code):
         """
@@ -169,17 +370,7 @@ class PermissionManager:
             return False
         if user.is_superuser:
             return True
-        
-        # الحصول على جميع الأدوار للمستخدم
-        user_roles = UserRoles.objects.filter(user=user).values_list('role_id', flat=True)
-        
-        # الحصول على جميع الصلاحيات المرتبطة بهذه الأدوار
-        permissions = RolePermission.objects.filter(
-            role_id__in=user_roles,
-            permission__name=permission_code
-        ).exists()
-        
-        return permissions
+        return permission_code in get_role_profile(user).permissions
     
     @staticmethod
     def has_any_permission(user, permission_codes):
@@ -218,7 +409,7 @@ class PermissionManager:
         """
         if not user or not user.is_authenticated:
            return []
-        return UserRoles.objects.filter(user=user).select_related('role').values_list('role__type', flat=True)
+        return get_role_profile(user).role_types
     
     @staticmethod
     def get_user_permissions(user):
@@ -229,56 +420,37 @@ class PermissionManager:
             return []
         if user.is_superuser:
             return list(PERMISSIONS_LIST.keys())
-        
-        user_roles = UserRoles.objects.filter(user=user).values_list('role_id', flat=True)
-        permissions = RolePermission.objects.filter(
-            role_id__in=user_roles
-        ).values_list('permission__name', flat=True).distinct()
-        
-        return list(permissions)
+        return sorted(get_role_profile(user).permissions)
     
     @staticmethod
     def is_supervisor(user):
-     """Check if user is Supervisor or Co-supervisor"""
-     if not user or not user.is_authenticated:
-        return False
-
-     return UserRoles.objects.filter(
-        user=user,
-        role__type__in=["Supervisor", "Co-supervisor"]
-      ).exists()
+        """Check if user is Supervisor or Co-supervisor"""
+        if not user or not user.is_authenticated:
+            return False
+        return get_role_profile(user).has_role("Supervisor", "Co-supervisor")
 
     @staticmethod
     def is_dean(user):
         """التحقق من أن المستخدم عميد"""
         if not user or not user.is_authenticated:
             return False
-        return UserRoles.objects.filter(
-            user=user,
-            role__type__iexact='Dean'
-        ).exists()
+        return get_role_profile(user).has_role('Dean')
     
     @staticmethod
     def is_admin(user):
         """التحقق من أن المستخدم إداري"""
         if not user or not user.is_authenticated:
           return False
-        return UserRoles.objects.filter(
-            user=user,
-            user__is_superuser=True
-        ).exists() or UserRoles.objects.filter(
-            role__type__in=['Department Head', 'Dean', 'University President', 'System Manager', 'Ministry','Admin','super user']
-        ).exists()
+        if user.is_superuser:
+            return True
+        return get_role_profile(user).has_role(*ADMIN_ROLE_TYPES)
     
     @staticmethod
     def is_student(user):
         """التحقق من أن المستخدم طالب"""
         if not user or not user.is_authenticated:
           return False
-        return UserRoles.objects.filter(
-            user=user,
-            role__type='Student'
-        ).exists()
+        return get_role_profile(user).has_role('Student')
     
     @staticmethod
     def get_approval_chain(project_type):
@@ -306,7 +478,7 @@ class PermissionManager:
 
 
 # ==============================================================================
-# 4. Decorators للتحقق من الصلاحيات في Views
+# 5. Decorators للتحقق من الصلاحيات في Views
 # ==============================================================================
 
 from functools import wraps
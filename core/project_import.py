@@ -0,0 +1,321 @@
+# core/project_import.py
+
+"""
+محرك استيراد المشاريع من Excel (يستخدمه core/views/import_projects.py ومهام الاستيراد).
+
+نفس نتيجة المعالجة صفاً صفاً، لكن:
+  - المواقع (جامعة/مدينة/فرع/كلية/قسم/برنامج) تُحل عبر LocationResolver بدون استعلامات لكل صف
+  - المشاريع تُقرأ بالعنوان دفعة واحدة ثم bulk_create / bulk_update
+  - المشرفون والطلاب (المستخدمون، Staff، Student، الانتماءات) تُكتب بعمليات bulk
+"""
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .arabic import clean_text
+from .bulk_fetch import bump_bulk_fetch_version
+from .change_log import record_changes
+from .college_stats import mark_colleges_dirty
+from .locations import LocationPath, LocationResolver
+from .models import AcademicAffiliation, Project, ProjectState, Role, Staff, Student, User
+from .permissions import bump_role_profile_version
+from .search import index_projects
+from .student_import import IMPORT_CHUNK_SIZE, _chunks, _str
+
+PROJECT_TYPE_MAP = {
+    "حكومي": "Governmental",
+    "شركات خارجية": "External",
+    "مقترح": "Proposed",
+}
+
+DEFAULT_CITY = "صنعاء"
+IMPORT_PASSWORD = "123456"
+
+PROJECT_FIELDS = [
+    "title_en", "project_type", "description", "start_date", "end_date", "field", "tools",
+    "state", "university", "branch", "college", "department", "program", "created_by",
+]
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+def _to_int(v):
+    try:
+        return int(float(_str(v)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _split_list(value):
+    return [clean_text(x) for x in _str(value).split(",") if clean_text(x)]
+
+
+def _split_name(full_name):
+    parts = full_name.split()
+    return (parts[0] if parts else ""), " ".join(parts[1:])
+
+
+def import_username(full_name, default_username):
+    """الاسم الأول_الاسم الأخير، أو default_username للاسم المفرد"""
+    parts = full_name.split()
+    if len(parts) > 1:
+        return f"{parts[0]}_{parts[-1]}"
+    return default_username
+
+
+# ---------------------------
+# Import engine
+# ---------------------------
+def location_paths(rows):
+    return [
+        LocationPath(
+            clean_text(row.get("university")),
+            clean_text(row.get("college")),
+            clean_text(row.get("department")),
+            clean_text(row.get("program")),
+            city=clean_text(row.get("city")) or DEFAULT_CITY,
+        )
+        for _, row in rows
+    ]
+
+
+def location_matches(rows):
+    """المطابقات التقريبية لأسماء المواقع مع الموجود لمرحلة التحقق (LocationResolver.suggest)"""
+    rows = [(excel_row, row) for excel_row, row in rows if clean_text(row.get("university"))]
+    return LocationResolver().suggest(zip((excel_row for excel_row, _ in rows), location_paths(rows)))
+
+
+class ProjectImporter:
+    """
+    locations: LocationResolver مشترك بين عدة استدعاءات run (مهام الاستيراد على دفعات)
+    """
+
+    def __init__(self, locations=None):
+        self.locations = locations
+        self.stats = {"created_projects": 0, "updated_projects": 0, "users_created": 0}
+        self.row_errors = []
+        self._wanted = {}
+
+    def run(self, rows):
+        """يجب استدعاؤها داخل transaction.atomic"""
+        supervisor_role, _ = Role.objects.get_or_create(type="Supervisor", defaults={"role_type": "Faculty"})
+        state_obj, _ = ProjectState.objects.get_or_create(name="Accepted")
+        if self.locations is None:
+            self.locations = LocationResolver()
+
+        rows = [(excel_row, row) for excel_row, row in rows if clean_text(row.get("university"))]
+        paths = location_paths(rows)
+        self.locations.ensure(paths)
+
+        records = []
+        for (excel_row, row), path in zip(rows, paths):
+            try:
+                location = self.locations.resolve(*path)
+            except ValueError as e:
+                self.row_errors.append({"row": excel_row, "field": "عام", "message": f"خطأ أثناء المعالجة: {e}"})
+                continue
+            records.append((excel_row, row, location))
+
+        self.password = make_password(IMPORT_PASSWORD)
+        today = timezone.now().date()
+
+        # 1) المشرفون قبل المشاريع (created_by)
+        supervisors = {}
+        for excel_row, row, location in records:
+            full_name = clean_text(row.get("supervisor_first_name"))
+            if full_name:
+                username = import_username(full_name, f"sup_{location.university_id}_{excel_row}")
+                supervisors[excel_row] = username
+                self._want_user(username, full_name)
+        user_ids = self._create_users()
+
+        # 2) المشاريع بالعنوان (الصف الأخير بنفس العنوان هو الذي يبقى)
+        projects = self._write_projects(records, supervisors, user_ids, state_obj)
+
+        # 3) الطلاب (الاسم المفرد بدون رقم قيد يحتاج رقم المشروع)
+        memberships = []
+        for excel_row, row, location in records:
+            project = projects[clean_text(row["title"])]
+            s_ids = _split_list(row.get("students_ids"))
+            s_phones = _split_list(row.get("students_phones"))
+            for i, full_name in enumerate(_split_list(row.get("students_names"))):
+                sid = s_ids[i] if i < len(s_ids) else None
+                phone = s_phones[i] if i < len(s_phones) else None
+                username = sid or import_username(full_name, f"std_{project.pk}_{i}")
+                self._want_user(username, full_name, phone)
+                memberships.append((username, sid, phone, location))
+        user_ids.update(self._create_users())
+
+        # 4) Staff للمشرفين، ملفات الطلاب، والانتماءات
+        supervisor_ids = {user_ids[u] for u in supervisors.values()}
+        has_staff = set(Staff.objects.filter(user_id__in=supervisor_ids).values_list("user_id", flat=True))
+        Staff.objects.bulk_create([
+            Staff(user_id=uid, role=supervisor_role) for uid in sorted(supervisor_ids - has_staff)
+        ])
+
+        affiliations = {}
+        for excel_row, row, location in records:
+            if excel_row in supervisors:
+                affiliations[(user_ids[supervisors[excel_row]],) + self._aff_key(location)] = location
+        students = {}
+        for username, sid, phone, location in memberships:
+            uid = user_ids[username]
+            students[uid] = (sid or username, phone, location)
+            affiliations[(uid,) + self._aff_key(location)] = location
+        self._write_students(students)
+        self._write_affiliations(affiliations, today)
+
+        touched = {key[0] for key in affiliations}
+        bump_role_profile_version(*touched)
+        mark_colleges_dirty(*{location.college_id for location in affiliations.values()})
+        bump_bulk_fetch_version('projects', 'users', 'staff', 'academic_affiliations')
+        return self.stats, self.row_errors
+
+    # ---------------------------
+    # Users
+    # ---------------------------
+    def _want_user(self, username, full_name, phone=None):
+        self._wanted.setdefault(username, (full_name, phone))
+
+    def _create_users(self):
+        """get_or_create بالاسم لكل المستخدمين المطلوبين -> {username: id}"""
+        wanted, self._wanted = self._wanted, {}
+        ids = self._user_ids(wanted)
+        new_users = []
+        for username, (full_name, phone) in wanted.items():
+            if username in ids:
+                continue
+            first_name, last_name = _split_name(full_name)
+            new_users.append(User(
+                username=username, first_name=first_name, last_name=last_name,
+                name="", phone=phone, password=self.password,
+            ))
+        User.objects.bulk_create(new_users)
+        self.stats["users_created"] += len(new_users)
+        if new_users:
+            ids.update(self._user_ids({u.username: None for u in new_users}))
+            record_changes("users", [ids[u.username] for u in new_users], "insert")
+        return ids
+
+    def _user_ids(self, usernames):
+        found = {}
+        for chunk in _chunks(usernames, IMPORT_CHUNK_SIZE):
+            found.update(User.objects.filter(username__in=chunk).values_list("username", "id"))
+        # مقارنة النصوص في MySQL لا تميز حالة الأحرف: نطابق كما يفعل get_or_create
+        lowered = {name.lower(): uid for name, uid in found.items()}
+        return {
+            name: found.get(name) or lowered[name.lower()]
+            for name in usernames
+            if name in found or name.lower() in lowered
+        }
+
+    # ---------------------------
+    # Projects
+    # ---------------------------
+    def _write_projects(self, records, supervisors, user_ids, state_obj):
+        titles = {clean_text(row["title"]) for _, row, _ in records}
+        projects = {}
+        for chunk in _chunks(titles, IMPORT_CHUNK_SIZE):
+            # update_or_create يأخذ أول مشروع بالعنوان
+            for project in Project.objects.filter(title__in=chunk).order_by("-pk"):
+                projects[project.title] = project
+        old_colleges = {p.college_id for p in projects.values()}
+
+        new_projects = []
+        for excel_row, row, location in records:
+            title = clean_text(row["title"])
+            project = projects.get(title)
+            if project is None:
+                project = projects[title] = Project(title=title)
+                new_projects.append(project)
+                self.stats["created_projects"] += 1
+            else:
+                self.stats["updated_projects"] += 1
+            project.title_en = clean_text(row.get("title_en"))
+            project.project_type = PROJECT_TYPE_MAP.get(clean_text(row.get("project_type")), "Proposed")
+            project.description = _str(row.get("description"))
+            project.start_date = _to_int(row.get("start_year"))
+            project.end_date = _to_int(row.get("end_year"))
+            project.field = _str(row.get("field"))
+            project.tools = _str(row.get("tools"))
+            project.state = state_obj
+            project.university_id = location.university_id
+            project.branch_id = location.branch_id
+            project.college_id = location.college_id
+            project.department_id = location.department_id
+            project.program_id = location.program_id
+            if excel_row in supervisors:
+                project.created_by_id = user_ids[supervisors[excel_row]]
+
+        updated = [p for p in projects.values() if p.pk]
+        Project.objects.bulk_update(updated, PROJECT_FIELDS)
+        Project.objects.bulk_create(new_projects)
+        if new_projects and not all(p.pk for p in new_projects):
+            # MySQL لا يعيد المفاتيح: المشروع الجديد هو الأحدث بعنوانه
+            new_by_title = {p.title: p for p in new_projects}
+            for chunk in _chunks(new_by_title, IMPORT_CHUNK_SIZE):
+                for pk, title in Project.objects.filter(title__in=chunk).order_by("pk").values_list("pk", "title"):
+                    new_by_title[title].pk = pk
+        # bulk لا يرسل إشارات سجل التغييرات وفهرس البحث
+        record_changes("projects", [p.pk for p in updated], "update")
+        record_changes("projects", [p.pk for p in new_projects], "insert")
+        index_projects(projects.values())
+
+        # bulk لا يرسل إشارات إحصائيات الكليات
+        mark_colleges_dirty(*(old_colleges | {p.college_id for p in projects.values()}))
+        return projects
+
+    # ---------------------------
+    # Students & affiliations
+    # ---------------------------
+    def _write_students(self, students):
+        existing = {}
+        for chunk in _chunks(students, IMPORT_CHUNK_SIZE):
+            existing.update((s.user_id, s) for s in Student.objects.filter(user_id__in=chunk))
+        fields = ["student_id", "phone", "university", "college", "department", "program", "status"]
+        to_update, to_create = [], []
+        for uid, (student_id, phone, location) in students.items():
+            student = existing.get(uid)
+            if student is None:
+                student = Student(user_id=uid)
+                to_create.append(student)
+            else:
+                to_update.append(student)
+            student.student_id = student_id
+            student.phone = phone
+            student.university_id = location.university_id
+            student.college_id = location.college_id
+            student.department_id = location.department_id
+            student.program_id = location.program_id
+            student.status = "active"
+        Student.objects.bulk_update(to_update, fields)
+        Student.objects.bulk_create(to_create)
+
+    @staticmethod
+    def _aff_key(location):
+        return (location.university_id, location.college_id, location.department_id)
+
+    def _write_affiliations(self, affiliations, today):
+        user_ids = {key[0] for key in affiliations}
+        existing = set()
+        existing_dates = set()
+        for chunk in _chunks(user_ids, IMPORT_CHUNK_SIZE):
+            rows = AcademicAffiliation.objects.filter(user_id__in=chunk).values_list(
+                "user_id", "university_id", "college_id", "department_id", "start_date"
+            )
+            for uid, uni_id, college_id, dept_id, start_date in rows:
+                existing.add((uid, uni_id, college_id, dept_id))
+                existing_dates.add((uid, uni_id, start_date))
+        new_affs = []
+        for key in affiliations:
+            uid, uni_id, college_id, dept_id = key
+            # unique (user, university, start_date): انتماء اليوم لنفس الجامعة موجود مسبقاً
+            if key in existing or (uid, uni_id, today) in existing_dates:
+                continue
+            existing_dates.add((uid, uni_id, today))
+            new_affs.append(AcademicAffiliation(
+                user_id=uid, university_id=uni_id, college_id=college_id,
+                department_id=dept_id, start_date=today,
+            ))
+        AcademicAffiliation.objects.bulk_create(new_affs)
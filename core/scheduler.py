@@ -3,8 +3,10 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from django.utils import timezone
 from datetime import timedelta
-from .models import GroupInvitation, NotificationLog
-from .notification_manager import InvitationNotificationManager
+from .invitation_expiry import expiry_scheduler
+from .invitation_jobs import expire_pending_invitations, remind_expiring_invitations
+from .notification_email import DIGEST_INTERVALS, notification_email_config
+from .scheduler_leadership import SchedulerLeadership, run_job
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,9 +16,16 @@ class NotificationScheduler:
     """
     جدولة الإشعارات والتذكيرات
     يدير المهام المتكررة مثل التذكيرات والتنظيف
+    
+    كل عملية (عامل daphne / gunicorn) تبدأ المجدول، لكن المهام تعمل فقط في العامل
+    الذي يملك القيادة (core/scheduler_leadership.py)، وكل تشغيل يُسجل في ScheduledJobRun
     """
     
     scheduler = None
+    leadership = None
+    
+    # سجل التشغيل يُحذف بعد هذه المدة مع الإشعارات القديمة
+    JOB_RUN_RETENTION_DAYS = 30
     
     @staticmethod
     def start():
@@ -26,35 +35,59 @@ class NotificationScheduler:
         """
         if NotificationScheduler.scheduler is None:
             NotificationScheduler.scheduler = BackgroundScheduler()
+            NotificationScheduler.leadership = SchedulerLeadership()
             
-            # جدولة فحص الدعوات المنتهية الصلاحية كل ساعة
+            # تجديد القيادة (أو أخذها من عامل متوقف)
             NotificationScheduler.scheduler.add_job(
-                NotificationScheduler.check_expiring_invitations,
+                NotificationScheduler.refresh_leadership,
                 'interval',
-                hours=1,
-                id='check_expiring_invitations',
-                name='فحص الدعوات المنتهية الصلاحية قريباً'
+                seconds=NotificationScheduler.leadership.renew_interval,
+                id='scheduler_leadership',
+                name='تجديد قيادة المجدول'
             )
             
-            # جدولة فحص الدعوات المنتهية الصلاحية كل 6 ساعات
+            # جدولة فحص الدعوات المنتهية الصلاحية كل ساعة
             NotificationScheduler.scheduler.add_job(
-                NotificationScheduler.check_expired_invitations,
+                NotificationScheduler.run_if_leader,
                 'interval',
-                hours=6,
-                id='check_expired_invitations',
-                name='فحص الدعوات المنتهية الصلاحية'
+                hours=1,
+                args=['check_expiring_invitations'],
+                id='check_expiring_invitations',
+                name='فحص الدعوات المنتهية الصلاحية قريباً'
             )
             
             # جدولة حذف الإشعارات القديمة يومياً
             NotificationScheduler.scheduler.add_job(
-                NotificationScheduler.cleanup_old_notifications,
+                NotificationScheduler.run_if_leader,
                 'interval',
                 days=1,
+                args=['cleanup_old_notifications'],
                 id='cleanup_old_notifications',
                 name='حذف الإشعارات القديمة'
             )
             
+            # تفريغ صندوق الأحداث الصادرة كل دقيقة (الأحداث التي تُعاد أو تركتها عملية توقفت)
+            NotificationScheduler.scheduler.add_job(
+                NotificationScheduler.run_if_leader,
+                'interval',
+                minutes=1,
+                args=['drain_outbox'],
+                id='drain_outbox',
+                name='تفريغ صندوق الأحداث الصادرة'
+            )
+            
+            # بريد الإشعارات على دفعات: كل دقيقة، أو كل ساعة / يوم في وضع الملخص
+            NotificationScheduler.scheduler.add_job(
+                NotificationScheduler.run_if_leader,
+                'interval',
+                seconds=DIGEST_INTERVALS[notification_email_config()['DIGEST']].total_seconds(),
+                args=['send_notification_emails'],
+                id='send_notification_emails',
+                name='إرسال بريد الإشعارات'
+            )
+            
             NotificationScheduler.scheduler.start()
+            NotificationScheduler.refresh_leadership()
             logger.info("✓ تم بدء جدولة الإشعارات")
     
     @staticmethod
@@ -66,40 +99,63 @@ class NotificationScheduler:
         if NotificationScheduler.scheduler is not None:
             NotificationScheduler.scheduler.shutdown()
             NotificationScheduler.scheduler = None
+            expiry_scheduler.stop()
+            NotificationScheduler.leadership.release()
+            NotificationScheduler.leadership = None
             logger.info("✓ تم إيقاف جدولة الإشعارات")
     
+    @staticmethod
+    def refresh_leadership():
+        """
+        أخذ القيادة أو تجديدها؛ العامل الذي يصبح قائداً ينهي ما فات موعده من الدعوات
+        ويبدأ انتهاء الصلاحية في موعدها، والعامل الذي يفقدها يوقفه
+        
+        Returns:
+            bool: هل هذا العامل هو القائد
+        """
+        leadership = NotificationScheduler.leadership
+        if leadership is None:
+            return False
+        try:
+            was_leader, is_leader = leadership.refresh()
+        except Exception as e:
+            logger.error(f"✗ خطأ في تجديد قيادة المجدول: {str(e)}")
+            was_leader, is_leader = leadership.is_leader, False
+            leadership.is_leader = False
+        if is_leader and not was_leader:
+            # انتهاء صلاحية الدعوات في موعد كل منها (بدل الفحص كل 6 ساعات)
+            # مع إنهاء ما فات موعده قبل أخذ القيادة
+            NotificationScheduler.check_expired_invitations()
+            expiry_scheduler.start()
+        elif was_leader and not is_leader:
+            expiry_scheduler.stop()
+        return is_leader
+    
+    @staticmethod
+    def run_if_leader(job_id):
+        """تشغيل المهمة الدورية job_id فقط إذا كان هذا العامل هو القائد"""
+        if NotificationScheduler.refresh_leadership():
+            return getattr(NotificationScheduler, job_id)()
+        return None
+    
+    @staticmethod
+    def _owner():
+        leadership = NotificationScheduler.leadership
+        return leadership.owner if leadership else ''
+    
     @staticmethod
     def check_expiring_invitations():
         """
         فحص الدعوات التي ستنتهي صلاحيتها قريباً (خلال ساعة)
         يتم استدعاء هذه الدالة تلقائياً كل ساعة
+        
+        Returns:
+            dict: تقرير المهمة (عدد الدعوات، عدد التذكيرات، المدة) أو None عند الخطأ
         """
         try:
-            now = timezone.now()
-            one_hour_later = now + timedelta(hours=1)
-            
-            # البحث عن الدعوات التي ستنتهي صلاحيتها قريباً
-            expiring_invitations = GroupInvitation.objects.filter(
-                status='pending',
-                expires_at__gte=now,
-                expires_at__lte=one_hour_later
-            )
-            
-            count = 0
-            for invitation in expiring_invitations:
-                # التحقق من أنه لم يتم إرسال تذكير مسبقاً
-                existing_reminder = NotificationLog.objects.filter(
-                    recipient=invitation.invited_student,
-                    notification_type='reminder',
-                    related_group=invitation.group,
-                    created_at__gte=now - timedelta(hours=2)
-                ).exists()
-                
-                if not existing_reminder:
-                    InvitationNotificationManager.notify_invitation_expiring_soon(invitation)
-                    count += 1
-            
-            logger.info(f"✓ تم إرسال {count} تذكير للدعوات المنتهية الصلاحية قريباً")
+            report = run_job('check_expiring_invitations', remind_expiring_invitations, NotificationScheduler._owner())
+            logger.info(f"✓ تم إرسال {report['notifications']} تذكير للدعوات المنتهية الصلاحية قريباً ({report['duration_ms']}ms)")
+            return report
         except Exception as e:
             logger.error(f"✗ خطأ في فحص الدعوات المنتهية الصلاحية: {str(e)}")
     
@@ -107,40 +163,77 @@ class NotificationScheduler:
     def check_expired_invitations():
         """
         فحص الدعوات المنتهية الصلاحية وتحديث حالتها
-        يتم استدعاء هذه الدالة تلقائياً كل 6 ساعات
+        يتم استدعاء هذه الدالة مرة عند البدء؛ بعدها ينهي expiry_scheduler كل دعوة في موعدها
+        
+        Returns:
+            dict: تقرير المهمة (عدد الدعوات، عدد الإشعارات، المدة) أو None عند الخطأ
         """
         try:
-            now = timezone.now()
-            
-            # البحث عن الدعوات المنتهية الصلاحية
-            expired_invitations = GroupInvitation.objects.filter(
-                status='pending',
-                expires_at__lt=now
+            report = run_job(
+                'check_expired_invitations',
+                lambda: expire_pending_invitations(notify='student'),
+                NotificationScheduler._owner(),
             )
+            logger.info(f"✓ تم تحديث حالة {report['rows']} دعوة منتهية الصلاحية ({report['duration_ms']}ms)")
+            return report
+        except Exception as e:
+            logger.error(f"✗ خطأ في فحص الدعوات المنتهية الصلاحية: {str(e)}")
+    
+    @staticmethod
+    def drain_outbox():
+        """
+        تنفيذ أحداث صندوق الأحداث الصادرة المستحقة (core/outbox.py)
+        يتم استدعاء هذه الدالة تلقائياً كل دقيقة
+        
+        Returns:
+            dict: تقرير المهمة (عدد الأحداث المنفذة والفاشلة، المدة) أو None عند الخطأ
+        """
+        try:
+            from .outbox import drain_outbox
             
-            count = 0
-            for invitation in expired_invitations:
-                invitation.status = 'expired'
-                invitation.save()
-                
-                # إرسال إشعار للطالب
-                InvitationNotificationManager.notify_invitation_expired(invitation)
-                count += 1
+            return run_job('drain_outbox', drain_outbox, NotificationScheduler._owner())
+        except Exception as e:
+            logger.error(f"✗ خطأ في تفريغ صندوق الأحداث: {str(e)}")
+    
+    @staticmethod
+    def send_notification_emails():
+        """
+        إرسال بريد الإشعارات المعلقة عبر اتصال واحد (core/notification_email.py)
+        
+        Returns:
+            dict: تقرير المهمة (عدد الإشعارات والرسائل، المدة) أو None عند الخطأ
+        """
+        try:
+            from .notification_email import send_pending_notification_emails
             
-            logger.info(f"✓ تم تحديث حالة {count} دعوة منتهية الصلاحية")
+            return run_job('send_notification_emails', send_pending_notification_emails, NotificationScheduler._owner())
         except Exception as e:
-            logger.error(f"✗ خطأ في فحص الدعوات المنتهية الصلاحية: {str(e)}")
+            logger.error(f"✗ خطأ في إرسال بريد الإشعارات: {str(e)}")
     
     @staticmethod
     def cleanup_old_notifications():
         """
-        حذف الإشعارات القديمة (أكثر من 90 يوم)
+        حذف الإشعارات القديمة (حسب NOTIFICATION_RETENTION) وسجل تشغيل المهام وسجل التغييرات القديمين
         يتم استدعاء هذه الدالة تلقائياً يومياً
+        
+        Returns:
+            int: عدد الإشعارات المحذوفة أو None عند الخطأ
         """
         try:
+            from .change_log import prune_change_log
+            from .models import ScheduledJobRun
             from .notification_manager import NotificationManager
             
-            deleted_count = NotificationManager.delete_old_notifications(days=90)
+            deleted_count = run_job(
+                'cleanup_old_notifications',
+                NotificationManager.delete_old_notifications,
+                NotificationScheduler._owner(),
+            )
+            ScheduledJobRun.objects.filter(
+                started_at__lt=timezone.now() - timedelta(days=NotificationScheduler.JOB_RUN_RETENTION_DAYS)
+            ).delete()
+            run_job('prune_change_log', prune_change_log, NotificationScheduler._owner())
             logger.info(f"✓ تم حذف {deleted_count} إشعار قديم")
+            return deleted_count
         except Exception as e:
             logger.error(f"✗ خطأ في حذف الإشعارات القديمة: {str(e)}")
@@ -0,0 +1,182 @@
+# core/scheduler_leadership.py
+
+"""
+تشغيل المهام الدورية على عامل واحد فقط عند وجود عدة عمليات (daphne / gunicorn).
+
+  - كل عملية تبدأ NotificationScheduler تحاول أخذ قفل بمدة (SchedulerLease) في قاعدة
+    البيانات؛ المالك يجدده كل LEASE_TTL / 3 ثانية، وإذا توقف يأخذه عامل آخر بعد انتهائه
+  - BACKEND = 'file' (أو تعذر الوصول إلى الجدول) يستخدم قفل ملف محلي (flock) يناسب
+    خادماً واحداً: أول عملية تحجز الملف هي القائد حتى تنتهي
+  - run_job يسجل كل تشغيل في ScheduledJobRun: المدة وعدد الصفوف والخطأ
+"""
+
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ScheduledJobRun, SchedulerLease
+
+try:
+    import fcntl
+except ImportError:  # Windows: لا يوجد flock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEADERSHIP_DEFAULTS = {
+    'BACKEND': 'database',   # 'database' | 'file'
+    'LEASE_NAME': 'notification-scheduler',
+    'LEASE_TTL': 60,         # ثوانٍ قبل أن يأخذ عامل آخر قيادة المالك المتوقف
+    'LOCK_FILE': os.path.join(str(settings.BASE_DIR), 'scheduler.lock'),
+}
+
+
+def scheduler_leadership_config():
+    return {**SCHEDULER_LEADERSHIP_DEFAULTS, **getattr(settings, 'SCHEDULER_LEADERSHIP', {})}
+
+
+def worker_identity():
+    """معرف فريد للعملية الحالية: host:pid:random"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+# ---------------------------
+# الأقفال
+# ---------------------------
+class DatabaseLease:
+    """صف SchedulerLease واحد؛ acquire يأخذه أو يجدده، ويعيد True إذا كان لنا"""
+
+    def __init__(self, name, owner, ttl):
+        self.name = name
+        self.owner = owner
+        self.ttl = timedelta(seconds=ttl)
+
+    def acquire(self):
+        now = timezone.now()
+        leases = SchedulerLease.objects.filter(name=self.name)
+        # التجديد والاستيلاء على قفل منتهٍ كل منهما UPDATE مشروط واحد (ذري)
+        if leases.filter(owner=self.owner).update(expires_at=now + self.ttl):
+            return True
+        if leases.filter(expires_at__lt=now).update(owner=self.owner, acquired_at=now, expires_at=now + self.ttl):
+            return True
+        try:
+            with transaction.atomic():
+                SchedulerLease.objects.create(
+                    name=self.name, owner=self.owner, acquired_at=now, expires_at=now + self.ttl,
+                )
+            return True
+        except IntegrityError:
+            return False  # يملكه عامل آخر
+
+    def release(self):
+        SchedulerLease.objects.filter(name=self.name, owner=self.owner).update(expires_at=timezone.now())
+
+
+class FileLease:
+    """flock على ملف محلي: يبقى محجوزاً حتى release أو انتهاء العملية"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            return True  # بدون flock: نفترض عملية واحدة
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class SchedulerLeadership:
+    """القيادة الحالية لهذه العملية؛ refresh يُستدعى دورياً من المجدول"""
+
+    def __init__(self, owner=None):
+        config = scheduler_leadership_config()
+        self.owner = owner or worker_identity()
+        self.ttl = config['LEASE_TTL']
+        self.file_lease = FileLease(config['LOCK_FILE'])
+        self.lease = (
+            self.file_lease if config['BACKEND'] == 'file'
+            else DatabaseLease(config['LEASE_NAME'], self.owner, self.ttl)
+        )
+        self.is_leader = False
+
+    @property
+    def renew_interval(self):
+        return max(self.ttl / 3, 1)
+
+    def refresh(self):
+        """أخذ القيادة أو تجديدها؛ يعيد (was_leader, is_leader)"""
+        was_leader = self.is_leader
+        try:
+            self.is_leader = self.lease.acquire()
+        except DatabaseError:
+            # الجدول غير موجود (ترحيل لم يُطبق) أو قاعدة البيانات غير متاحة
+            logger.warning("Scheduler lease unavailable, falling back to %s", self.file_lease.path, exc_info=True)
+            self.lease = self.file_lease
+            self.is_leader = self.lease.acquire()
+        if self.is_leader != was_leader:
+            logger.info("Scheduler worker %s %s leadership", self.owner, 'acquired' if self.is_leader else 'lost')
+        return was_leader, self.is_leader
+
+    def release(self):
+        if self.is_leader:
+            try:
+                self.lease.release()
+            except DatabaseError:
+                logger.warning("Could not release scheduler lease", exc_info=True)
+        self.is_leader = False
+
+
+# ---------------------------
+# سجل التشغيل
+# ---------------------------
+def _rows_affected(result):
+    if isinstance(result, dict):
+        return result.get('rows')
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    return None
+
+
+def run_job(job_id, func, owner=''):
+    """
+    تشغيل func وتسجيله في ScheduledJobRun. يعيد نتيجة func؛ الاستثناء يُسجل ويُعاد رفعه.
+    func قد تعيد تقريراً فيه 'rows' (core/invitation_jobs.py) أو عدداً.
+    """
+    run = ScheduledJobRun.objects.create(job_id=job_id, owner=owner, started_at=timezone.now())
+    started = time.monotonic()
+    try:
+        result = func()
+    except Exception as e:
+        run.status = 'failed'
+        run.error_message = str(e)
+        raise
+    else:
+        run.status = 'completed'
+        run.rows_affected = _rows_affected(result)
+        return result
+    finally:
+        run.duration_ms = int((time.monotonic() - started) * 1000)
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'rows_affected', 'duration_ms', 'error_message', 'finished_at'])
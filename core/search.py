@@ -0,0 +1,239 @@
+# core/search.py
+
+"""
+فهرس بحث مقلوب (inverted index) للمشاريع داخل قاعدة البيانات نفسها (MySQL / SQLite).
+
+  - الحقول title, title_en, description, field, tools تُقطّع إلى كلمات بعد normalize_arabic
+    (التشكيل، أشكال الألف والهمزة، ة/ه، ى/ي) مع حذف "ال" وحروف العطف والجر الملتصقة بها
+    وكلمات الوقف
+  - كل (كلمة، حقل، مشروع) صف في ProjectSearchPosting بعدد مراتها، و ProjectSearchDocument
+    يحفظ طول المشروع الموزون؛ البحث بالكلمة قراءة من الفهرس الفريد (term, field, project)
+    بدل LIKE '%...%' على كل الجدول
+  - الفهرس يُحدّث مع حفظ المشروع (post_save) وعمليات الاستيراد (index_projects)، والحذف
+    يتبع المشروع (CASCADE)؛ rebuild_search_index يعيد بناءه كاملاً
+  - filter_matching: كل كلمات البحث مطلوبة (مثل SearchFilter) مع الحفاظ على ترتيب القائمة
+  - rank_projects: ترتيب BM25F (أوزان الحقول من SEARCH_INDEX['WEIGHTS'])
+"""
+
+import heapq
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Exists, OuterRef
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .arabic import normalize_arabic
+from .models import Project, ProjectSearchDocument, ProjectSearchPosting
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_DEFAULTS = {
+    'WEIGHTS': {'title': 3.0, 'title_en': 3.0, 'field': 2.0, 'tools': 2.0, 'description': 1.0},
+    'K1': 1.2,
+    'B': 0.75,
+    'MAX_RESULTS': 100,
+    'BATCH_SIZE': 500,   # مشاريع في كل دفعة عند إعادة البناء
+}
+
+SEARCH_FIELDS = ('title', 'title_en', 'description', 'field', 'tools')
+
+# بعد التطبيع (أ -> ا، ى -> ي، ة -> ه)
+STOP_WORDS = frozenset((
+    'في', 'من', 'علي', 'الي', 'عن', 'مع', 'او', 'ثم', 'هذا', 'هذه', 'ذلك', 'تلك', 'التي', 'الذي',
+    'الذين', 'ما', 'لا', 'كل', 'بين', 'عند', 'قد', 'تم', 'هو', 'هي',
+    'the', 'and', 'or', 'of', 'for', 'to', 'in', 'on', 'with', 'by', 'is', 'an', 'at', 'as',
+))
+
+# أطول السوابق أولاً: "والنظام" -> "نظام"، "للطلاب" -> "طلاب"
+_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_WORD = re.compile(r'\w+')
+MAX_TERM_LENGTH = 100
+
+
+def search_index_config():
+    return {**SEARCH_INDEX_DEFAULTS, **getattr(settings, 'SEARCH_INDEX', {})}
+
+
+# ---------------------------
+# التقطيع
+# ---------------------------
+def strip_article(word):
+    for prefix in _PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            return word[len(prefix):]
+    return word
+
+
+def tokenize(text):
+    """كلمات النص المطبّعة بترتيبها (مع التكرار)"""
+    terms = []
+    for word in _WORD.findall(normalize_arabic(text)):
+        if len(word) < 2 or word in STOP_WORDS:
+            continue
+        term = strip_article(word)
+        if term not in STOP_WORDS:
+            terms.append(term[:MAX_TERM_LENGTH])
+    return terms
+
+
+def query_terms(query):
+    """كلمات البحث بدون تكرار وبترتيبها"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+# ---------------------------
+# الفهرسة
+# ---------------------------
+def _document(project):
+    """(صفوف ProjectSearchPosting، الطول الموزون) لمشروع واحد"""
+    weights = search_index_config()['WEIGHTS']
+    postings = []
+    length = 0.0
+    for field in SEARCH_FIELDS:
+        counts = Counter(tokenize(getattr(project, field)))
+        length += weights.get(field, 1.0) * sum(counts.values())
+        postings.extend(
+            ProjectSearchPosting(term=term, field=field, project_id=project.pk, tf=tf)
+            for term, tf in counts.items()
+        )
+    return postings, round(length)
+
+
+def index_projects(projects):
+    """
+    إعادة فهرسة مشاريع محددة (كائنات Project محفوظة) في معاملة واحدة؛ يعيد عدد صفوف الفهرس
+    """
+    projects = [p for p in projects if p.pk]
+    if not projects:
+        return 0
+    postings, documents = [], []
+    for project in projects:
+        project_postings, length = _document(project)
+        postings.extend(project_postings)
+        documents.append(ProjectSearchDocument(project_id=project.pk, length=length))
+
+    ids = [p.pk for p in projects]
+    with transaction.atomic():
+        # لا إشارات ولا جداول تشير إلى الفهرس: delete() ينفذ DELETE واحداً بدون تحميل الصفوف
+        ProjectSearchPosting.objects.filter(project_id__in=ids).delete()
+        ProjectSearchDocument.objects.filter(project_id__in=ids).delete()
+        ProjectSearchPosting.objects.bulk_create(postings, batch_size=1000)
+        ProjectSearchDocument.objects.bulk_create(documents, batch_size=1000)
+    return len(postings)
+
+
+def rebuild_search_index(batch_size=None):
+    """
+    إعادة بناء الفهرس لكل المشاريع على دفعات بترتيب المعرف؛ يعيد تقريراً:
+    {'job', 'rows', 'postings', 'batches', 'duration_ms'}
+    """
+    started = time.monotonic()
+    batch_size = batch_size or search_index_config()['BATCH_SIZE']
+    projects = Project.objects.only('project_id', *SEARCH_FIELDS).order_by('project_id')
+
+    indexed = postings = batches = 0
+    last_id = 0
+    while True:
+        batch = list(projects.filter(project_id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        postings += index_projects(batch)
+        indexed += len(batch)
+        batches += 1
+        last_id = batch[-1].pk
+
+    report = {
+        'job': 'rebuild_search_index',
+        'rows': indexed,
+        'postings': postings,
+        'batches': batches,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info("rebuild_search_index: %(rows)s projects, %(postings)s postings in %(batches)s batches "
+                "(%(duration_ms)sms)", report)
+    return report
+
+
+@receiver(post_save, sender=Project)
+def _project_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # حفظ ملخص التقييم وغيره لا يغير النص المفهرس
+    if update_fields and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_projects([instance])
+
+
+# ---------------------------
+# البحث
+# ---------------------------
+def filter_matching(queryset, terms, field=None):
+    """المشاريع التي تحتوي كل الكلمات (في field فقط إن حُدد)"""
+    for term in terms:
+        postings = ProjectSearchPosting.objects.filter(project_id=OuterRef('pk'), term=term)
+        if field:
+            postings = postings.filter(field=field)
+        queryset = queryset.filter(Exists(postings))
+    return queryset
+
+
+def rank_projects(query, queryset=None, limit=None):
+    """
+    [(project_id, score)] بترتيب BM25F تنازلياً للمشاريع التي تحتوي كلمة واحدة على الأقل،
+    ضمن queryset إن أُعطي
+    """
+    config = search_index_config()
+    terms = query_terms(query)
+    if not terms:
+        return []
+    limit = limit or config['MAX_RESULTS']
+    weights, k1, b = config['WEIGHTS'], config['K1'], config['B']
+
+    stats = ProjectSearchDocument.objects.aggregate(n=Count('pk'), avg=Avg('length'))
+    total, avg_length = stats['n'], stats['avg'] or 1
+    # تكرار الكلمة في المشاريع من الفهرس كله (لا من نطاق المستخدم)
+    document_frequency = dict(
+        ProjectSearchPosting.objects.filter(term__in=terms)
+        .values('term').annotate(n=Count('project', distinct=True))
+        .values_list('term', 'n')
+    )
+
+    postings = ProjectSearchPosting.objects.filter(term__in=terms)
+    if queryset is not None:
+        postings = postings.filter(project__in=queryset.order_by().values('pk'))
+    term_frequency = defaultdict(float)
+    lengths = {}
+    for project_id, term, field, tf, length in postings.values_list(
+        'project_id', 'term', 'field', 'tf', 'project__search_document__length'
+    ):
+        term_frequency[project_id, term] += weights.get(field, 1.0) * tf
+        lengths[project_id] = length or 0
+
+    scores = defaultdict(float)
+    for (project_id, term), tf in term_frequency.items():
+        df = document_frequency.get(term, 0)
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[project_id] / avg_length)
+        scores[project_id] += idf * tf * (k1 + 1) / (tf + norm)
+
+    # التعادل: المشروع الأحدث أولاً
+    return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+
+class ProjectSearchFilter(BaseFilterBackend):
+    """
+    ?search= من الفهرس (بديل SearchFilter): كل الكلمات مطلوبة، والترتيب للقائمة نفسها
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        terms = query_terms(request.query_params.get(self.search_param, ''))
+        return filter_matching(queryset, terms)
@@ -5,3 +5,4 @@ from .projects import *
 from .invitations import *
 from .approvals import *
 from .notifications import *
+from .imports import *
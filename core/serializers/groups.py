@@ -1,6 +1,5 @@
 from rest_framework import serializers
-from core.serializers.users import UserSerializer
-from rest_framework import serializers
+from core.serializers.users import UserSerializer, prefetched
 from core.models import programgroup
 from .location import ProgramSerializer
 from .projects import ProjectSerializer
@@ -8,6 +7,52 @@ from core.models import (
     Group, GroupMembers, GroupSupervisors, GroupMemberApproval,GroupCreationRequest
 )
 
+# ---------------------------
+# Group relation readers
+# ---------------------------
+# Each reader uses the rows prefetched by the view (see
+# GROUP_LIST_PREFETCH / ProjectViewSet.get_queryset) and only falls back to a
+# query when the group was loaded without them.
+
+def group_members(group):
+    rows = prefetched(group, 'groupmembers_set')
+    if rows is None:
+        rows = list(GroupMembers.objects.filter(group=group).select_related('user'))
+    return rows
+
+
+def group_supervisors(group):
+    rows = prefetched(group, 'groupsupervisors')
+    if rows is None:
+        rows = list(GroupSupervisors.objects.filter(group=group).select_related('user'))
+    return rows
+
+
+def group_members_count(group):
+    rows = prefetched(group, 'groupmembers_set')
+    if rows is None:
+        return group.groupmembers_set.count()
+    return len(rows)
+
+
+def group_first_program_link(group):
+    rows = prefetched(group, 'program_groups')
+    if rows is None:
+        return group.program_groups.select_related('program__department').first()
+    # same row .first() would pick (ordered by pk)
+    return min(rows, key=lambda pg: pg.pk) if rows else None
+
+
+# Prefetches that let GroupSerializer render a list without per-group queries.
+GROUP_LIST_PREFETCH = (
+    'groupmembers_set__user__userroles_set__role',
+    'groupmembers_set__user__staff_profiles__role',
+    'groupsupervisors__user__userroles_set__role',
+    'groupsupervisors__user__staff_profiles__role',
+    'program_groups__program__department',
+)
+
+
 class SupervisorGroupSerializer(serializers.ModelSerializer):
     project_title = serializers.CharField(source="project.title", read_only=True)
     members = serializers.SerializerMethodField()
@@ -29,15 +74,13 @@ class SupervisorGroupSerializer(serializers.ModelSerializer):
         ]
 
     def get_members(self, obj):
-        qs = GroupMembers.objects.filter(group=obj).select_related("user")
-        return [m.user.name or m.user.username for m in qs]
+        return [m.user.name or m.user.username for m in group_members(obj)]
 
     def get_supervisors(self, obj):
-        qs = GroupSupervisors.objects.filter(group=obj).select_related("user")
-        return [s.user.name or s.user.username for s in qs]
+        return [s.user.name or s.user.username for s in group_supervisors(obj)]
 
     def get_members_count(self, obj):
-        return obj.groupmembers_set.count()
+        return group_members_count(obj)
 
     def get_programs(self, obj):
         # program links are stored in the bridge model with related_name 'program_groups'
@@ -46,9 +89,11 @@ class SupervisorGroupSerializer(serializers.ModelSerializer):
         ).data
 
     def get_group_type(self, obj):
-        program_links = obj.program_groups.select_related(
-            'program__department__college__branch__university'
-        )
+        program_links = prefetched(obj, 'program_groups')
+        if program_links is None:
+            program_links = obj.program_groups.select_related(
+                'program__department__college__branch__university'
+            )
 
         universities, colleges, departments, programs = set(), set(), set(), set()
 
@@ -106,26 +151,24 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = ['group_id', 'project', 'project_detail', 'members', 'supervisors', 'members_count', 'department', 'program', 'academic_year']
 
     def get_members(self, obj):
-        qs = GroupMembers.objects.filter(group=obj).select_related('user')
-        return GroupMembersSerializer(qs, many=True).data
+        return GroupMembersSerializer(group_members(obj), many=True).data
 
     def get_supervisors(self, obj):
-        qs = GroupSupervisors.objects.filter(group=obj).select_related('user')
-        return GroupSupervisorsSerializer(qs, many=True).data
+        return GroupSupervisorsSerializer(group_supervisors(obj), many=True).data
 
     def get_members_count(self, obj):
-        return obj.groupmembers_set.count()
+        return group_members_count(obj)
 
 
     def get_department(self, obj):
         # Try to infer department from linked program_groups
-        pg = obj.program_groups.select_related('program__department').first()
+        pg = group_first_program_link(obj)
         if pg and getattr(pg.program, 'department', None):
             return getattr(pg.program.department, 'department_id', None)
         return None
 
     def get_program(self, obj):
-        pg = obj.program_groups.select_related('program').first()
+        pg = group_first_program_link(obj)
         if not pg or not getattr(pg, 'program', None):
             return None
         program = pg.program
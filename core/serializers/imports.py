@@ -0,0 +1,24 @@
+from rest_framework import serializers
+from core.models import ImportJob
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    eta_seconds = serializers.ReadOnlyField()
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id',
+            'kind',
+            'status',
+            'total_rows',
+            'processed_rows',
+            'eta_seconds',
+            'errors',
+            'result',
+            'error_message',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from core.models import (
-    NotificationLog, Notification,
+    NotificationLog, Notification, NotificationJob,
 )
 
 class NotificationLogSerializer(serializers.ModelSerializer):
@@ -30,4 +30,22 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class NotificationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationJob
+        fields = [
+            'id',
+            'notification_type',
+            'title',
+            'status',
+            'total_recipients',
+            'sent_count',
+            'error_message',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
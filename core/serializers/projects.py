@@ -2,8 +2,7 @@ from rest_framework import serializers
 from core.models import Project
 from core.serializers.users import UserSerializer
 from django.conf import settings
-from core.models import ProjectRating
-from django.db.models import Avg
+from core.models import ProjectRating, RATING_VALUES
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -42,6 +41,10 @@ class ProjectSerializer(serializers.ModelSerializer):
 
     created_by = UserSerializer(read_only=True)
 
+    # Ratings
+    average_rating = serializers.SerializerMethodField()
+    ratings_count = serializers.SerializerMethodField()
+
     class Meta:
         model = Project
         fields = [
@@ -87,14 +90,15 @@ class ProjectSerializer(serializers.ModelSerializer):
 
             "created_by",
             'average_rating',
+            "ratings_count",
             "title_en",
         ]
+    # ratings are read from the summary columns on Project (no extra queries)
     def get_average_rating(self, obj):
-        avg = obj.ratings.aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 2) if avg else 0
+        return obj.average_rating
 
     def get_ratings_count(self, obj):
-        return obj.ratings.count()
+        return obj.rating_count
     # ---------------------------
     # Groups
     # ---------------------------
@@ -174,6 +178,11 @@ class ProjectRatingSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProjectRating
         fields = '__all__'
+
+    def validate_rating(self, value):
+        if value not in RATING_VALUES:
+            raise serializers.ValidationError("التقييم يجب أن يكون بين 1 و 5")
+        return value
 average_rating = serializers.FloatField(read_only=True)
 ratings_count = serializers.IntegerField(read_only=True)
 
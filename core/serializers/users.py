@@ -59,6 +59,28 @@ ROLE_CONFLICTS = {
     'Dean'
   ]
 }
+# ----------------------------
+# Prefetch helpers
+# ----------------------------
+def prefetched(obj, accessor):
+    """
+    Rows of a related manager taken from the prefetch cache, or None when
+    the queryset did not prefetch it (the caller then falls back to a query).
+    """
+    cache = getattr(obj, '_prefetched_objects_cache', None)
+    if cache and accessor in cache:
+        return list(cache[accessor])
+    return None
+
+
+def user_role_rows(user):
+    """[{'role__role_ID', 'role__type'}] for a user, using prefetched userroles_set__role."""
+    user_roles = prefetched(user, 'userroles_set')
+    if user_roles is None:
+        return list(UserRoles.objects.filter(user=user).values('role__role_ID', 'role__type'))
+    return [{'role__role_ID': ur.role.role_ID, 'role__type': ur.role.type} for ur in user_roles]
+
+
 # ----------------------------
 # User Serializer
 # ----------------------------
@@ -83,7 +105,7 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
     def get_roles(self, obj):
-        return list(UserRoles.objects.filter(user=obj).values('role__role_ID', 'role__type'))
+        return user_role_rows(obj)
 
     def get_department_id(self, obj):
         affiliation = getattr(obj, 'academicaffiliation', None)
@@ -372,7 +394,7 @@ class SimpleUserSerializer(serializers.ModelSerializer):
                   'email', 'phone', 'gender', 'CID', 'roles', 'write_roles']
 
     def get_roles(self, obj):
-        return list(UserRoles.objects.filter(user=obj).values('role__role_ID', 'role__type'))
+        return user_role_rows(obj)
 
     def get_name(self, obj):
         return f"{obj.first_name or ''} {obj.last_name or ''}".strip()
@@ -1,12 +1,18 @@
 # core/signals.py
 
+"""
+إشعارات الدعوات وطلبات الموافقة عبر صندوق الأحداث الصادرة (core/outbox.py):
+post_save يكتب الحدث في نفس المعاملة فقط، والمعالجات أدناه تنشئ الإشعار في الخلفية.
+"""
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import GroupInvitation, ApprovalRequest
+from .models import GroupInvitation, ApprovalRequest, NotificationLog
 from .notification_manager import (
     InvitationNotificationManager,
     ApprovalNotificationManager
 )
+from .outbox import enqueue_event, register_handler
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,29 +22,79 @@ logger = logging.getLogger(__name__)
 def handle_group_invitation(sender, instance, created, **kwargs):
     """
     معالج تلقائي عند إنشاء دعوة مجموعة جديدة
-    يتم استدعاؤه تلقائياً عند حفظ دعوة جديدة
+    يضيف حدث group_invitation.created إلى صندوق الأحداث في نفس المعاملة
     """
     if created:
-        try:
-            InvitationNotificationManager.notify_invitation_sent(
-                group=instance.group,
-                invited_student=instance.invited_student,
-                invited_by=instance.invited_by
-            )
-            logger.info(f"✓ تم إرسال إشعار دعوة للطالب {instance.invited_student.username}")
-        except Exception as e:
-            logger.error(f"✗ خطأ في إرسال إشعار الدعوة: {str(e)}")
+        enqueue_event(
+            'group_invitation.created',
+            {'invitation_id': instance.pk},
+            dedupe_key=f'group_invitation.created:{instance.pk}',
+        )
 
 
 @receiver(post_save, sender=ApprovalRequest)
 def handle_approval_request(sender, instance, created, **kwargs):
     """
     معالج تلقائي عند إنشاء طلب موافقة جديد
-    يتم استدعاؤه تلقائياً عند حفظ طلب موافقة جديد
+    يضيف حدث approval_request.created إلى صندوق الأحداث في نفس المعاملة
     """
     if created:
-        try:
-            ApprovalNotificationManager.notify_approval_request(instance)
-            logger.info(f"✓ تم إرسال إشعار طلب موافقة للموافق {instance.current_approver.username}")
-        except Exception as e:
-            logger.error(f"✗ خطأ في إرسال إشعار الموافقة: {str(e)}")
+        enqueue_event(
+            'approval_request.created',
+            {'approval_id': instance.pk},
+            dedupe_key=f'approval_request.created:{instance.pk}',
+        )
+
+
+# ---------------------------
+# معالجات الأحداث (idempotent)
+# ---------------------------
+@register_handler('group_invitation.created')
+def notify_invitation_sent(payload, event):
+    invitation = (
+        GroupInvitation.objects.select_related('group__project', 'invited_student', 'invited_by')
+        .filter(pk=payload['invitation_id'])
+        .first()
+    )
+    if invitation is None or invitation.status != 'pending':
+        return  # حُذفت أو رُد عليها قبل التنفيذ
+    already_sent = NotificationLog.objects.filter(
+        recipient=invitation.invited_student,
+        notification_type='invitation',
+        related_group=invitation.group,
+        related_user=invitation.invited_by,
+        created_at__gte=invitation.created_at,
+    ).exists()
+    if already_sent:
+        return
+    notification = InvitationNotificationManager.notify_invitation_sent(
+        group=invitation.group,
+        invited_student=invitation.invited_student,
+        invited_by=invitation.invited_by,
+        expires_at=invitation.expires_at,
+    )
+    if notification is None:
+        raise RuntimeError(f'Could not notify invitation {invitation.pk}')
+    logger.info(f"✓ تم إرسال إشعار دعوة للطالب {invitation.invited_student.username}")
+
+
+@register_handler('approval_request.created')
+def notify_approval_request(payload, event):
+    approval = (
+        ApprovalRequest.objects.select_related('requested_by', 'current_approver', 'group', 'project')
+        .filter(pk=payload['approval_id'])
+        .first()
+    )
+    if approval is None or approval.current_approver_id is None or approval.status != 'pending':
+        return  # لا يوجد موافق بعد، أو عولج الطلب قبل التنفيذ
+    already_sent = NotificationLog.objects.filter(
+        recipient_id=approval.current_approver_id,
+        related_approval=approval,
+        notification_type='approval_request',
+    ).exists()
+    if already_sent:
+        return
+    notification = ApprovalNotificationManager.notify_approval_request(approval)
+    if notification is None:
+        raise RuntimeError(f'Could not notify approval request {approval.pk}')
+    logger.info(f"✓ تم إرسال إشعار طلب موافقة للموافق {approval.current_approver.username}")
@@ -0,0 +1,635 @@
+# core/student_import.py
+
+"""
+محرك استيراد الطلاب من Excel (يستخدمه core/views/ImportStudents.py).
+
+بدلاً من معالجة كل صف على حدة:
+  - يُقرأ الملف بوضع read_only (تدفق بدون تحميل الورقة كاملة)
+  - التحقق بمرور واحد مع استعلامات IN على دفعات، ونتيجته تُخزن حسب بصمة الملف
+    فلا يعيد الاستيراد (commit) التحقق من نفس الملف
+  - تُحل الجامعة/الكلية/القسم/البرنامج عبر LocationResolver (core/locations.py) بدون استعلامات لكل صف
+  - تُحجز أسماء المستخدمين دفعة واحدة
+  - تُكتب المستخدمون والطلاب والانتماءات والأدوار بعمليات bulk على دفعات ثابتة الحجم
+"""
+
+import datetime
+import hashlib
+import logging
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import openpyxl
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .arabic import clean_text
+from .bulk_fetch import bump_bulk_fetch_version
+from .change_log import record_changes
+from .college_stats import mark_colleges_dirty
+from .locations import LocationPath, LocationResolver
+from .models import AcademicAffiliation, Role, Student, User, UserRoles
+from .permissions import bump_role_profile_version
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+
+# ---------------------------
+# Arabic header mapping
+# ---------------------------
+AR_STUDENT_HEADER_MAP = {
+    "الرقم الوطني": "CID",
+    "الاسم الأول": "first_name",
+    "الاسم الأخير": "last_name",
+    "البريد الإلكتروني": "email",
+    "الهاتف": "phone",
+    "الجنس": "gender",
+    "رقم الطالب": "student_id",
+    "الحالة": "status",
+    "الجامعة": "university",
+    "الكلية": "college",
+    "القسم": "department",
+    "البرنامج": "program",
+    "سنة التسجيل": "enrollment_year",
+    "سنة التخرج": "graduation_year",   # NEW
+}
+
+# Required Arabic header labels (must appear in row 2)
+REQUIRED_HEADERS_AR = ["الرقم الوطني", "الاسم الأول", "الاسم الأخير", "رقم الطالب"]
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+def _str(v):
+    return "" if v is None else str(v).strip()
+
+def _parse_enrollment_year(year_str):
+    if not year_str:
+        return None
+    s = _str(year_str)
+    m = re.match(r"(\d{4})\D*(\d{4})?", s)
+    if not m:
+        return None
+    try:
+        start_year = int(m.group(1))
+        return datetime.date(start_year, 9, 1)
+    except ValueError:
+        return None
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ---------------------------
+# Excel reader (streaming)
+# ---------------------------
+def read_excel_students(file_obj):
+    """
+    Reads the Excel file in read_only mode, identifies headers from row 2,
+    and returns a list of (row_number, row_dict) tuples.
+    """
+    rows = []
+    file_errors = []
+    try:
+        wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+
+            # Row 2 contains the Arabic headers
+            header_row_idx = 2
+            header_cells = next(ws.iter_rows(min_row=header_row_idx, max_row=header_row_idx, values_only=True), ())
+            headers_ar = [_str(h) for h in header_cells]
+
+            # Validate that required headers exist
+            for req in REQUIRED_HEADERS_AR:
+                if req not in headers_ar:
+                    file_errors.append({
+                        "row": header_row_idx,
+                        "field": "headers",
+                        "message": f"العمود المطلوب '{req}' غير موجود"
+                    })
+
+            if file_errors:
+                return [], file_errors
+
+            columns = [
+                (col_idx, AR_STUDENT_HEADER_MAP[h])
+                for col_idx, h in enumerate(headers_ar)
+                if h in AR_STUDENT_HEADER_MAP
+            ]
+
+            # Process data starting from row 3
+            for row_idx, row_cells in enumerate(ws.iter_rows(min_row=3, values_only=True), start=3):
+                # Skip completely empty rows
+                if not any(row_cells):
+                    continue
+                rows.append((row_idx, {
+                    key: row_cells[col_idx]
+                    for col_idx, key in columns
+                    if col_idx < len(row_cells)
+                }))
+        finally:
+            wb.close()
+
+    except Exception as e:
+        file_errors.append({"row": 0, "field": "file", "message": f"تعذر قراءة ملف Excel: {str(e)}"})
+
+    return rows, file_errors
+
+
+# ---------------------------
+# Validation
+# ---------------------------
+VALID_GENDERS = {"ذكر", "انثى"}
+VALID_STATUS = {"نشط", "موقوف", "متخرج", "منسحب"}
+
+
+def _is_cid_valid(cid):
+    s = _str(cid)
+    return s.isdigit() and len(s) == 12
+
+
+def _validation_config():
+    return {
+        "POOL_MIN_ROWS": 20000,
+        "POOL_WORKERS": None,
+        "CACHE_TIMEOUT": 60 * 30,
+        **getattr(settings, "STUDENT_IMPORT_VALIDATION", {}),
+    }
+
+
+def _check_row(item):
+    """
+    أخطاء صف واحد [(field, message)] بدون أي وصول لقاعدة البيانات،
+    فيمكن تشغيلها في عملية منفصلة. التكرار داخل الملف يُحسب مسبقاً (cid_dup, sid_dup).
+    """
+    cid, first_name, last_name, student_id, gender, status, graduation_year, cid_dup, sid_dup = item
+    row_errors = []
+    if not cid:
+        row_errors.append(("الرقم الوطني", "الرقم الوطني مطلوب"))
+    else:
+        if not _is_cid_valid(cid):
+            row_errors.append(("الرقم الوطني", "الرقم الوطني يجب أن يكون 12 رقماً"))
+        if cid_dup:
+            row_errors.append(("الرقم الوطني", "تم تكرار الرقم الوطني في الملف"))
+
+    if not first_name:
+        row_errors.append(("الاسم الأول", "الاسم الأول مطلوب"))
+
+    if not last_name:
+        row_errors.append(("الاسم الأخير", "الاسم الأخير مطلوب"))
+
+    if not student_id:
+        row_errors.append(("رقم الطالب", "رقم الطالب مطلوب"))
+    elif sid_dup:
+        row_errors.append(("رقم الطالب", "تم تكرار رقم الطالب في الملف"))
+
+    # Gender validation
+    if gender and gender not in VALID_GENDERS:
+        row_errors.append(("الجنس", "القيمة يجب أن تكون ذكر أو انثى"))
+
+    # Status validation
+    if status and status not in VALID_STATUS:
+        row_errors.append(("الحالة", "الحالة غير معروفة"))
+
+    # Graduation year validation
+    if graduation_year and not graduation_year.isdigit():
+        row_errors.append(("سنة التخرج", "سنة التخرج يجب أن تكون رقماً"))
+    return row_errors
+
+
+def _check_rows(items):
+    config = _validation_config()
+    if config["POOL_MIN_ROWS"] and len(items) >= config["POOL_MIN_ROWS"]:
+        try:
+            with ProcessPoolExecutor(max_workers=config["POOL_WORKERS"]) as pool:
+                return list(pool.map(_check_row, items, chunksize=2000))
+        except (OSError, BrokenProcessPool):
+            logger.warning("Process pool unavailable, validating %s rows serially", len(items), exc_info=True)
+    return [_check_row(item) for item in items]
+
+
+def validate_student_rows(rows, preselected=None):
+    """
+    تحقق محتوى الملف فقط (الحقول المطلوبة، الصيغ، التكرار داخل الملف).
+    يعيد (errors, valid_rows). الملفات الكبيرة تُفحص في مجمع عمليات.
+    """
+    seen_cids = set()
+    seen_student_ids = set()
+    items = []
+    for _, row in rows:
+        cid = _str(row.get("CID"))
+        student_id = _str(row.get("student_id"))
+        items.append((
+            cid,
+            _str(row.get("first_name")),
+            _str(row.get("last_name")),
+            student_id,
+            _str(row.get("gender")),
+            _str(row.get("status")),
+            _str(row.get("graduation_year")),
+            bool(cid) and cid in seen_cids,
+            bool(student_id) and student_id in seen_student_ids,
+        ))
+        seen_cids.add(cid)
+        seen_student_ids.add(student_id)
+
+    errors = []
+    valid_rows = 0
+    for (excel_row, _), row_errors in zip(rows, _check_rows(items)):
+        if row_errors:
+            for field, message in row_errors:
+                errors.append({"row": excel_row, "field": field, "message": message})
+        else:
+            valid_rows += 1
+    return errors, valid_rows
+
+
+def validate_students(rows, preselected=None):
+    """
+    تحقق كامل بمرور واحد: أخطاء الملف + مقارنة بقاعدة البيانات باستعلامات IN على دفعات
+    (الأرقام الوطنية الموجودة، وأرقام الطلاب المستخدمة لطلاب آخرين كما في _write_chunk).
+    """
+    file_errors, file_valid_rows = validate_student_rows(rows, preselected)
+
+    cids = {_str(row.get("CID")) for _, row in rows} - {""}
+    student_ids = {_str(row.get("student_id")) for _, row in rows} - {""}
+    existing_cids = set()
+    has_profile = set()
+    for cid_chunk in _chunks(cids, IMPORT_CHUNK_SIZE):
+        existing_cids.update(User.objects.filter(CID__in=cid_chunk).values_list("CID", flat=True))
+        has_profile.update(Student.objects.filter(user__CID__in=cid_chunk).values_list("user__CID", flat=True))
+    owners = {}
+    for sid_chunk in _chunks(student_ids, IMPORT_CHUNK_SIZE):
+        owners.update(Student.objects.filter(student_id__in=sid_chunk).values_list("student_id", "user__CID"))
+
+    conflicts = []
+    updated_count = 0
+    for excel_row, row in rows:
+        cid = _str(row.get("CID"))
+        if cid in existing_cids:
+            updated_count += 1
+        owner = owners.get(_str(row.get("student_id")))
+        if owner is not None and owner != cid and cid not in has_profile:
+            conflicts.append({"row": excel_row, "field": "رقم الطالب", "message": "رقم الطالب مستخدم لطالب آخر"})
+
+    invalid = {e["row"] for e in file_errors} | {c["row"] for c in conflicts}
+    return {
+        "file_errors": file_errors,
+        "file_valid_rows": file_valid_rows,
+        "conflicts": conflicts,
+        "valid_rows": len(rows) - len(invalid),
+        "created_count": len(rows) - updated_count,
+        "updated_count": updated_count,
+    }
+
+
+def location_matches(rows, preselected=None):
+    """
+    المطابقات التقريبية لأسماء الكلية/القسم/البرنامج مع الموجود (LocationResolver.suggest):
+    ما سيُربط تلقائياً عند الاستيراد وما يُقترح تصحيحه
+    """
+    paths = StudentImporter(preselected=preselected).location_paths(rows)
+    return LocationResolver().suggest((excel_row, path) for (excel_row, _), path in zip(rows, paths))
+
+
+def file_digest(file_obj):
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for block in iter(lambda: file_obj.read(1024 * 1024), b""):
+        digest.update(block)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def _validation_cache_key(digest):
+    return f"student_import:validation:{digest}"
+
+
+def cached_validation(file_obj, rows, preselected=None):
+    """validate_students مع تخزين النتيجة حسب بصمة الملف"""
+    key = _validation_cache_key(file_digest(file_obj))
+    result = cache.get(key)
+    if result is None:
+        result = validate_students(rows, preselected)
+        cache.set(key, result, _validation_config()["CACHE_TIMEOUT"])
+    return result
+
+
+def commit_validation(file_obj, rows, preselected=None):
+    """
+    (errors, valid_rows) للاستيراد: من نتيجة validate المخزنة لنفس الملف إن وجدت،
+    وإلا تحقق الملف فقط. تعارض رقم الطالب لا يمنع الاستيراد (يظهر في row_errors).
+    """
+    result = cache.get(_validation_cache_key(file_digest(file_obj)))
+    if result is not None:
+        return result["file_errors"], result["file_valid_rows"]
+    return validate_student_rows(rows, preselected)
+
+
+# ---------------------------
+# Usernames
+# ---------------------------
+def username_base(first_name, last_name, student_id="", cid=""):
+    clean_first = first_name.lower().replace(" ", "")
+    clean_last = last_name.lower().replace(" ", "")
+
+    if clean_first and clean_last:
+        base = f"{clean_first}_{clean_last}"
+    elif clean_first or clean_last:
+        # If only one name exists, don't leave a hanging underscore
+        base = clean_first or clean_last
+    else:
+        # Fallback to IDs if names are completely missing in this row
+        fallback = student_id or cid
+        base = f"user_{fallback}" if fallback else "student_user"
+
+    base = re.sub(r"\s+", "_", base.lower().strip())
+    # a-z (English), 0-9 (Numbers), _ (Underscore) and the Arabic Unicode block
+    base = re.sub(r"[^a-z0-9_\u0600-\u06FF]", "", base)
+    return base or "student_user"
+
+
+class UsernameAllocator:
+    """
+    يحجز أسماء مستخدمين فريدة لعدة صفوف بعدد ثابت من الاستعلامات:
+    استعلام IN للأسماء الأساسية، ثم startswith فقط للأسماء المتكررة.
+    """
+
+    def __init__(self, bases):
+        counts = Counter(bases)
+        self.taken = set()
+        for chunk in _chunks(counts, IMPORT_CHUNK_SIZE):
+            self.taken.update(
+                u.lower() for u in User.objects.filter(username__in=chunk).values_list("username", flat=True)
+            )
+
+        # نحتاج اللواحق (base1, base2...) فقط للأسماء الموجودة أو المكررة في الملف
+        clashing = [b for b, n in counts.items() if n > 1 or b in self.taken]
+        for chunk in _chunks(clashing, 100):
+            q = Q()
+            for base in chunk:
+                q |= Q(username__startswith=base)
+            self.taken.update(
+                u.lower() for u in User.objects.filter(q).values_list("username", flat=True)
+            )
+
+    def allocate(self, base):
+        candidate = base
+        counter = 0
+        while candidate in self.taken:
+            counter += 1
+            candidate = f"{base}{counter}"
+        self.taken.add(candidate)
+        return candidate
+
+
+def _username_matches_base(username, base):
+    return bool(username) and re.fullmatch(re.escape(base) + r"\d*", username.lower()) is not None
+
+
+# ---------------------------
+# Location map
+# ---------------------------
+# Import engine
+# ---------------------------
+class StudentImporter:
+    """
+    preselected: {"university"|"college"|"department"|"program": كائن أو اسم,
+                  "enrollment_year": date}
+    locations: LocationResolver مشترك بين عدة استدعاءات run (مهام الاستيراد على دفعات)
+    """
+
+    def __init__(self, preselected=None, chunk_size=IMPORT_CHUNK_SIZE, locations=None):
+        self.preselected = preselected or {}
+        self.chunk_size = chunk_size
+        self.locations = locations
+        self.stats = {
+            "created_users": 0,
+            "updated_users": 0,
+            "created_students": 0,
+            "updated_students": 0,
+            "created_affiliations": 0,
+            "assigned_roles": 0,
+        }
+        self.row_errors = []
+        self.touched_users = set()
+
+    def _location_value(self, row, field):
+        value = self.preselected.get(field)
+        if value:
+            return value if hasattr(value, "pk") else clean_text(value)
+        return clean_text(row.get(field))
+
+    def location_paths(self, rows):
+        fields = ("university", "college", "department", "program")
+        return [LocationPath(*(self._location_value(row, f) for f in fields)) for _, row in rows]
+
+    def prepare(self, rows):
+        """صفوف Excel -> سجلات جاهزة للكتابة (مع حل المواقع)"""
+        if self.locations is None:
+            self.locations = LocationResolver()
+        paths = self.location_paths(rows)
+        # كل المواقع الناقصة تُنشأ هنا دفعة واحدة لكل مستوى، والحل بعدها في الذاكرة فقط
+        self.locations.ensure(paths)
+        today = timezone.now().date()
+        records = []
+        for (excel_row, row), path in zip(rows, paths):
+            try:
+                uni_id, _, college_id, dept_id, program_id = self.locations.resolve(*path)
+            except ValueError as e:
+                self.row_errors.append({"row": excel_row, "field": "عام", "message": f"خطأ أثناء المعالجة: {e}"})
+                continue
+
+            graduation_year = _str(row.get("graduation_year"))
+            first_name = _str(row.get("first_name"))
+            last_name = _str(row.get("last_name"))
+            cid = _str(row.get("CID"))
+            student_id = _str(row.get("student_id"))
+            records.append({
+                "row": excel_row,
+                "cid": cid,
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": _str(row.get("email")) or None,
+                "phone": _str(row.get("phone")) or None,
+                "gender": clean_text(row.get("gender")) or None,
+                "student_id": student_id,
+                "status": _str(row.get("status")) or "نشط",
+                "start_date": (
+                    self.preselected.get("enrollment_year")
+                    or _parse_enrollment_year(_str(row.get("enrollment_year")))
+                    or today
+                ),
+                "graduation_year": int(graduation_year) if graduation_year.isdigit() else None,
+                "university_id": uni_id,
+                "college_id": college_id,
+                "department_id": dept_id,
+                "program_id": program_id,
+                "username_base": username_base(first_name, last_name, student_id, cid),
+            })
+        return records
+
+    def run(self, rows):
+        student_role, _ = Role.objects.get_or_create(type="Student", defaults={"role_type": "Student"})
+
+        with transaction.atomic():
+            records = self.prepare(rows)
+            usernames = UsernameAllocator(r["username_base"] for r in records)
+            for chunk in _chunks(records, self.chunk_size):
+                self._write_chunk(chunk, usernames, student_role)
+
+            # bulk_create / bulk_update لا ترسل إشارات: نبطل الكاش ونحدث الإحصائيات يدوياً
+            touched_users = list(self.touched_users)
+            bump_role_profile_version(*touched_users)
+            for user_chunk in _chunks(touched_users, self.chunk_size):
+                mark_colleges_dirty(*(
+                    AcademicAffiliation.objects.filter(user_id__in=user_chunk, college_id__isnull=False)
+                    .values_list("college_id", flat=True).distinct()
+                ))
+            bump_bulk_fetch_version("users", "academic_affiliations")
+
+        return self.stats, self.row_errors
+
+    # ---------------------------
+    # Chunk writer
+    # ---------------------------
+    def _write_chunk(self, chunk, usernames, student_role):
+        # 1) رقم الطالب المستخدم لطالب آخر => خطأ في الصف بدل فشل الدفعة
+        cids = [r["cid"] for r in chunk]
+        existing_users = {u.CID: u for u in User.objects.filter(CID__in=cids)}
+        has_profile = set(Student.objects.filter(user__CID__in=cids).values_list("user__CID", flat=True))
+        owners = dict(
+            Student.objects.filter(student_id__in=[r["student_id"] for r in chunk])
+            .values_list("student_id", "user__CID")
+        )
+        records = []
+        for r in chunk:
+            owner = owners.get(r["student_id"])
+            if owner is not None and owner != r["cid"] and r["cid"] not in has_profile:
+                self.row_errors.append({
+                    "row": r["row"], "field": "رقم الطالب",
+                    "message": "رقم الطالب مستخدم لطالب آخر",
+                })
+                continue
+            records.append(r)
+
+        # 2) Users: تحديث الموجود وإنشاء الجديد
+        to_update, to_create = [], []
+        updated_users = 0
+        # كلمة مرور غير قابلة للاستخدام (مثل set_unusable_password) مرة واحدة للدفعة
+        unusable_password = make_password(None)
+        for r in records:
+            user = existing_users.get(r["cid"])
+            if user:
+                updated_users += 1
+                before = (user.first_name, user.last_name, user.name, user.username)
+                user.first_name = r["first_name"]
+                user.last_name = r["last_name"]
+                user.name = ""  # Keep empty as requested
+                # Only update username if it's currently empty or a placeholder
+                if (not user.username or "_" in user.username) and not _username_matches_base(user.username, r["username_base"]):
+                    user.username = usernames.allocate(r["username_base"])
+                # bulk_update مكلف: نكتب فقط الصفوف التي تغيرت فعلاً
+                if before != (user.first_name, user.last_name, user.name, user.username):
+                    to_update.append(user)
+            else:
+                to_create.append(User(
+                    username=usernames.allocate(r["username_base"]),
+                    CID=r["cid"],
+                    first_name=r["first_name"],
+                    last_name=r["last_name"],
+                    name="",
+                    email=r["email"],
+                    phone=r["phone"],
+                    gender=r["gender"],
+                    password=unusable_password,
+                ))
+        User.objects.bulk_update(to_update, ["first_name", "last_name", "name", "username"])
+        User.objects.bulk_create(to_create)
+        self.stats["updated_users"] += updated_users
+        self.stats["created_users"] += len(to_create)
+
+        # MySQL لا يعيد المفاتيح من bulk_create: نعيد قراءتها بالرقم الوطني
+        user_ids = dict(
+            User.objects.filter(CID__in=[r["cid"] for r in records]).values_list("CID", "id")
+        )
+        for r in records:
+            r["user_id"] = user_ids[r["cid"]]
+        self.touched_users.update(user_ids.values())
+        # bulk لا يرسل إشارات سجل التغييرات
+        record_changes("users", [u.pk for u in to_update], "update")
+        record_changes("users", [user_ids[u.CID] for u in to_create], "insert")
+
+        # 3) Student profiles
+        students = {s.user_id: s for s in Student.objects.filter(user_id__in=user_ids.values())}
+        update_students, new_students = [], []
+        updated_students = 0
+        for r in records:
+            student = students.get(r["user_id"])
+            if student:
+                updated_students += 1
+                if r["graduation_year"] and r["graduation_year"] != student.graduation_year:
+                    student.graduation_year = r["graduation_year"]
+                    update_students.append(student)
+            else:
+                new_students.append(Student(
+                    user_id=r["user_id"],
+                    student_id=r["student_id"],
+                    phone=r["phone"],
+                    status=r["status"],
+                    university_id=r["university_id"],
+                    college_id=r["college_id"],
+                    department_id=r["department_id"],
+                    program_id=r["program_id"],
+                    graduation_year=r["graduation_year"],
+                ))
+        Student.objects.bulk_update(update_students, ["graduation_year"])
+        Student.objects.bulk_create(new_students)
+        self.stats["updated_students"] += updated_students
+        self.stats["created_students"] += len(new_students)
+
+        # 4) AcademicAffiliation (unique: user, university, start_date)
+        existing_affs = set(
+            AcademicAffiliation.objects.filter(user_id__in=user_ids.values())
+            .values_list("user_id", "university_id", "start_date")
+        )
+        new_affs = []
+        for r in records:
+            if not r["university_id"]:
+                continue
+            key = (r["user_id"], r["university_id"], r["start_date"])
+            if key in existing_affs:
+                continue
+            existing_affs.add(key)
+            new_affs.append(AcademicAffiliation(
+                user_id=r["user_id"],
+                university_id=r["university_id"],
+                start_date=r["start_date"],
+                college_id=r["college_id"],
+                department_id=r["department_id"],
+                end_date=None,
+            ))
+        AcademicAffiliation.objects.bulk_create(new_affs)
+        self.stats["created_affiliations"] += len(new_affs)
+
+        # 5) Student role
+        has_role = set(
+            UserRoles.objects.filter(user_id__in=user_ids.values(), role=student_role)
+            .values_list("user_id", flat=True)
+        )
+        new_roles = [
+            UserRoles(user_id=uid, role=student_role)
+            for uid in set(user_ids.values()) - has_role
+        ]
+        UserRoles.objects.bulk_create(new_roles)
+        self.stats["assigned_roles"] += len(new_roles)
@@ -35,28 +35,29 @@ def send_notification_email(notification_id):
     مهمة لإرسال إشعار عبر البريد الإلكتروني
     """
     try:
-        from .models import NotificationLog
-        notification = NotificationLog.objects.get(notification_id=notification_id)
+        from .notification_email import send_notification_emails
         
-        subject = f"[{notification.get_notification_type_display()}] {notification.title}"
-        message = f"{notification.message}\n\nتم الإرسال في: {notification.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [notification.recipient.email],
-            fail_silently=False,
-        )
-        
-        notification.is_sent_email = True
-        notification.save()
-        
-        return f"تم إرسال الإشعار إلى {notification.recipient.email}"
+        sent = send_notification_emails([notification_id])
+        return f"تم إرسال {sent} رسالة للإشعار {notification_id}"
     except Exception as e:
         return f"خطأ: {str(e)}"
 
 
+@shared_task
+def send_pending_notification_emails_task(digest=None):
+    """
+    مهمة دورية لإرسال بريد كل الإشعارات المعلقة عبر اتصال واحد
+    (أو ملخص لكل مستخدم حسب NOTIFICATION_EMAIL['DIGEST'])
+    """
+    from .notification_email import send_pending_notification_emails
+    
+    report = send_pending_notification_emails(digest=digest)
+    return (
+        f"تم إرسال {report['rows']} إشعار في {report['emails']} رسالة، "
+        f"وفشل {report['failed']} ({report['duration_ms']}ms)"
+    )
+
+
 # ==============================================================================
 # 2. مهام انتهاء صلاحية الدعوات
 # ==============================================================================
@@ -67,32 +68,11 @@ def expire_pending_invitations():
     مهمة دورية لتحديد الدعوات المنتهية الصلاحية
     تُشغل كل ساعة
     """
-    now = timezone.now()
-    expired_count = 0
-    
-    # الحصول على الدعوات المعلقة التي انتهت صلاحيتها
-    expired_invitations = GroupInvitation.objects.filter(
-        status='pending',
-        expires_at__lt=now
-    )
-    
-    for invitation in expired_invitations:
-        invitation.status = 'expired'
-        invitation.save()
-        expired_count += 1
-        
-        # إشعار منشئ المجموعة
-        from .utils import NotificationService
-        NotificationService.create_notification(
-            recipient=invitation.invited_by,
-            notification_type='reminder',
-            title='انتهت صلاحية الدعوة',
-            message=f'انتهت صلاحية دعوة {invitation.invited_student.name} للانضمام إلى مجموعة {invitation.group.group_name}',
-            related_group=invitation.group,
-            related_user=invitation.invited_student,
-        )
-    
-    return f"تم تحديد {expired_count} دعوة منتهية الصلاحية"
+    from .invitation_jobs import expire_pending_invitations as expire
+
+    # UPDATE واحد ثم إشعار منشئي المجموعات دفعة واحدة
+    report = expire(notify='inviter')
+    return f"تم تحديد {report['rows']} دعوة منتهية الصلاحية في {report['duration_ms']}ms"
 
 
 # ==============================================================================
@@ -133,25 +113,11 @@ def send_pending_invitations_reminder():
     مهمة دورية لإرسال تذكيرات للطلاب بالدعوات المعلقة
     تُشغل كل 12 ساعة
     """
-    from .models import GroupInvitation
-    
-    # الحصول على الدعوات المعلقة
-    pending_invitations = GroupInvitation.objects.filter(status='pending')
-    
-    for invitation in pending_invitations:
-        # إرسال تذكير إذا مرت أكثر من 24 ساعة
-        if (timezone.now() - invitation.created_at).hours >= 24:
-            from .utils import NotificationService
-            NotificationService.create_notification(
-                recipient=invitation.invited_student,
-                notification_type='reminder',
-                title='تذكير: دعوة مجموعة معلقة',
-                message=f'لديك دعوة معلقة للانضمام إلى مجموعة {invitation.group.group_name}. الدعوة تنتهي صلاحيتها في {(invitation.expires_at - timezone.now()).hours} ساعات',
-                related_group=invitation.group,
-                related_user=invitation.invited_by,
-            )
-    
-    return f"تم إرسال تذكيرات للطلاب"
+    from .invitation_jobs import remind_pending_invitations
+
+    # الدعوات المعلقة منذ أكثر من 24 ساعة وبدون تذكير خلال آخر 12 ساعة
+    report = remind_pending_invitations()
+    return f"تم إرسال {report['notifications']} تذكير للطلاب في {report['duration_ms']}ms"
 
 
 # ==============================================================================
@@ -161,17 +127,16 @@ def send_pending_invitations_reminder():
 @shared_task
 def cleanup_old_notifications():
     """
-    مهمة دورية لحذف الإشعارات القديمة (أكثر من 90 يوم)
+    مهمة دورية لحذف الإشعارات القديمة حسب سياسة الاحتفاظ (NOTIFICATION_RETENTION)
     تُشغل أسبوعياً
     """
-    from .models import NotificationLog
-    
-    cutoff_date = timezone.now() - timedelta(days=90)
-    deleted_count, _ = NotificationLog.objects.filter(
-        created_at__lt=cutoff_date
-    ).delete()
+    from .notification_retention import apply_notification_retention
     
-    return f"تم حذف {deleted_count} إشعار قديم"
+    report = apply_notification_retention()
+    return (
+        f"تم حذف {report['deleted']} إشعار قديم (أُرشف منها {report['archived']}) "
+        f"في {report['batches']} دفعة ({report['duration_ms']}ms)"
+    )
 
 
 @shared_task
@@ -189,3 +154,52 @@ def cleanup_old_expired_invitations():
     ).delete()
     
     return f"تم حذف {deleted_count} دعوة قديمة"
+
+
+# ==============================================================================
+# 5. مهام الاستيراد في الخلفية
+# ==============================================================================
+
+@shared_task
+def run_import_job_task(job_id):
+    """
+    تنفيذ مهمة استيراد (ImportJob) على دفعات، تستأنف من آخر دفعة محفوظة
+    """
+    from .import_jobs import run_import_job
+
+    job = run_import_job(job_id)
+    if job is None:
+        return f"المهمة {job_id} غير موجودة أو قيد التنفيذ"
+    return f"المهمة {job_id}: {job.status} ({job.processed_rows}/{job.total_rows})"
+
+
+# ==============================================================================
+# 6. الإشعارات الجماعية في الخلفية
+# ==============================================================================
+
+@shared_task
+def run_notification_job_task(job_id):
+    """
+    إرسال إشعار جماعي (NotificationJob) على دفعات، يستأنف من آخر مستلم محفوظ
+    """
+    from .notification_jobs import run_notification_job
+
+    job = run_notification_job(job_id)
+    if job is None:
+        return f"المهمة {job_id} غير موجودة أو قيد التنفيذ"
+    return f"المهمة {job_id}: {job.status} ({job.sent_count}/{job.total_recipients})"
+
+
+# ==============================================================================
+# 7. صندوق الأحداث الصادرة
+# ==============================================================================
+
+@shared_task
+def drain_outbox_task():
+    """
+    تنفيذ أحداث صندوق الأحداث الصادرة المستحقة (core/outbox.py)
+    """
+    from .outbox import drain_outbox
+
+    report = drain_outbox()
+    return f"تم تنفيذ {report['rows']} حدث، وفشل {report['failed']} ({report['duration_ms']}ms)"
@@ -73,3 +73,1632 @@ class LocationAPITests(TestCase):
         # should return our two departments ordered by name
         names = [d['name'] for d in data]
         self.assertEqual(names, ['DeptOne', 'DeptTwo'])
+
+
+class ProjectPaginationTests(TestCase):
+    """Keyset pagination on /api/projects/ and /api/projects/public/."""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from django.contrib.auth import get_user_model
+        state = ProjectState.objects.create(name='Accepted')
+        years = [2024, 2025, None, 2023, 2025, 2024, 2025]
+        self.projects = [
+            Project.objects.create(title=f'P{i}', description='d', state=state, start_date=y)
+            for i, y in enumerate(years)
+        ]
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='pager', password='pass')
+        self.client.force_authenticate(user=self.user)
+
+    def expected_ids(self, projects):
+        dated = sorted((p for p in projects if p.start_date is not None),
+                       key=lambda p: (-p.start_date, p.project_id))
+        undated = sorted((p for p in projects if p.start_date is None), key=lambda p: p.project_id)
+        return [p.project_id for p in dated + undated]
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(p['project_id'] for p in data['results'])
+            url = data['next']
+            pages += 1
+        return ids, pages
+
+    def test_forward_walk_is_complete_and_ordered(self):
+        ids, pages = self.walk('/api/projects/?page_size=3')
+        self.assertEqual(ids, self.expected_ids(self.projects))
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get('/api/projects/?page_size=3').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(
+            [p['project_id'] for p in back['results']],
+            [p['project_id'] for p in first['results']],
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_filters_are_kept_across_pages(self):
+        ids, _ = self.walk('/api/projects/?page_size=1&year=2025')
+        expected = self.expected_ids([p for p in self.projects if p.start_date == 2025])
+        self.assertEqual(ids, expected)
+
+    def test_public_endpoint_is_paginated(self):
+        from rest_framework.test import APIClient
+        data = APIClient().get('/api/projects/public/?page_size=2').json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next'])
+
+    def test_invalid_cursor_returns_404(self):
+        resp = self.client.get('/api/projects/?cursor=not-a-cursor')
+        self.assertEqual(resp.status_code, 404)
+
+    def test_role_page_size_cap(self):
+        from django.test import override_settings
+        from core.models import Role, UserRoles
+        role = Role.objects.create(type='Supervisor')
+        UserRoles.objects.create(user=self.user, role=role)
+        config = {'PAGE_SIZE': 20, 'MAX_PAGE_SIZE': 100, 'ROLE_PAGE_SIZE_CAPS': {'Supervisor': 2}}
+        with override_settings(PROJECT_PAGINATION=config):
+            data = self.client.get('/api/projects/?page_size=50').json()
+        self.assertEqual(data['page_size'], 2)
+
+
+class ProjectRatingSummaryTests(TestCase):
+    """Ratings are kept on Project and read without touching ProjectRating."""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        state = ProjectState.objects.create(name='Accepted')
+        self.project = Project.objects.create(title='Rated', description='d', state=state)
+        self.client = APIClient()
+
+    def rate(self, value, ip):
+        return self.client.post('/api/ratings/', {'project': self.project.pk, 'rating': value},
+                                REMOTE_ADDR=ip)
+
+    def test_create_updates_summary(self):
+        self.assertEqual(self.rate(4, '10.0.0.1').status_code, 201)
+        self.assertEqual(self.rate(5, '10.0.0.2').status_code, 201)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.rating_count, 2)
+        self.assertEqual(self.project.rating_sum, 9)
+        self.assertEqual(self.project.rating_histogram['4'], 1)
+        self.assertEqual(self.project.average_rating, 4.5)
+
+    def test_duplicate_ip_and_out_of_range_are_rejected(self):
+        self.rate(3, '10.0.0.1')
+        self.assertEqual(self.rate(2, '10.0.0.1').status_code, 400)
+        self.assertEqual(self.rate(9, '10.0.0.3').status_code, 400)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.rating_count, 1)
+
+    def test_serializer_reads_summary_without_queries(self):
+        self.rate(2, '10.0.0.1')
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        project = Project.objects.get(pk=self.project.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            data = ProjectSerializer(project).data
+        self.assertFalse(any('core_projectrating' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(data['average_rating'], 2)
+        self.assertEqual(data['ratings_count'], 1)
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+        from core.models import ProjectRating
+        ProjectRating.objects.create(project=self.project, rating=1, ip_address='10.0.0.9')
+        ProjectRating.objects.create(project=self.project, rating=5, ip_address='10.0.0.8')
+        call_command('rebuild_rating_summaries', stdout=open('/dev/null', 'w'))
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.rating_sum, self.project.rating_count), (6, 2))
+        self.assertEqual(self.project.rating_histogram['1'], 1)
+
+
+class ProjectListQueryCountTests(TestCase):
+    """/api/projects/ renders nested groups from prefetched rows."""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from django.contrib.auth import get_user_model
+        from core.models import Role, UserRoles, Staff
+        User = get_user_model()
+        city = City.objects.create(bname_ar='QCity')
+        uni = University.objects.create(uname_ar='QUni')
+        branch = Branch.objects.create(university=uni, city=city)
+        college = College.objects.create(branch=branch, name_ar='QCollege')
+        dept = Department.objects.create(college=college, name='QDept')
+        self.program = Program.objects.create(p_name='QProg', department=dept)
+        self.state = ProjectState.objects.create(name='Accepted')
+        self.student_role = Role.objects.create(type='Student')
+        self.supervisor_role = Role.objects.create(type='Supervisor')
+        self.User, self.UserRoles, self.Staff = User, UserRoles, Staff
+        self.counter = 0
+
+        self.client = APIClient()
+        admin = User.objects.create_superuser(username='qadmin', password='pass')
+        self.client.force_authenticate(user=admin)
+
+    def add_projects(self, n):
+        from core.models import GroupMembers, GroupSupervisors
+        for _ in range(n):
+            self.counter += 1
+            i = self.counter
+            creator = self.User.objects.create_user(username=f'creator{i}', password='x')
+            self.UserRoles.objects.create(user=creator, role=self.supervisor_role)
+            self.Staff.objects.create(user=creator, role=self.supervisor_role)
+            project = Project.objects.create(title=f'Q{i}', description='d', state=self.state,
+                                             start_date=2025, created_by=creator)
+            group = Group.objects.create(academic_year='2025', project=project)
+            programgroup.objects.create(program=self.program, group=group)
+            GroupSupervisors.objects.create(user=creator, group=group, type='supervisor')
+            for k in range(2):
+                student = self.User.objects.create_user(username=f'student{i}_{k}', password='x')
+                self.UserRoles.objects.create(user=student, role=self.student_role)
+                GroupMembers.objects.create(user=student, group=group)
+
+    def count_queries(self):
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        cache.clear()  # compare cold requests: the role profile is cached across requests
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/projects/', {'page_size': 50})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()['results']
+
+    def test_query_count_is_constant(self):
+        self.add_projects(2)
+        small, _ = self.count_queries()
+        self.add_projects(5)
+        large, results = self.count_queries()
+        self.assertEqual(len(results), 7)
+        self.assertEqual(small, large)
+
+    def test_nested_groups_are_rendered(self):
+        self.add_projects(1)
+        _, results = self.count_queries()
+        group = results[0]['groups'][0]
+        self.assertEqual(group['members_count'], 2)
+        self.assertEqual(len(group['members']), 2)
+        self.assertEqual(group['members'][0]['user_detail']['roles'][0]['role__type'], 'Student')
+        self.assertEqual(group['program']['p_name'], 'QProg')
+        self.assertEqual(group['department'], self.program.department.department_id)
+        self.assertEqual(results[0]['supervisor_name'], 'creator1')
+        self.assertEqual(results[0]['created_by']['staff_profiles'][0]['role'], 'Supervisor')
+
+
+class RoleProfileCacheTests(TestCase):
+    """PermissionManager answers role/permission checks from a cached profile."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from core.models import Role, UserRoles
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='profiled', password='x')
+        self.dean = Role.objects.create(type='Dean')
+        self.student = Role.objects.create(type='Student')
+        UserRoles.objects.create(user=self.user, role=self.dean)
+
+    def test_profile_is_shared_between_calls(self):
+        from core.permissions import PermissionManager
+        self.assertTrue(PermissionManager.is_dean(self.user))
+        with self.assertNumQueries(0):
+            self.assertFalse(PermissionManager.is_student(self.user))
+            self.assertTrue(PermissionManager.is_admin(self.user))
+            self.assertFalse(PermissionManager.has_permission(self.user, 'view_reports'))
+
+    def test_role_and_permission_changes_bump_version(self):
+        from core.models import Permission, RolePermission, UserRoles
+        from core.permissions import PermissionManager
+        self.assertFalse(PermissionManager.is_student(self.user))
+        UserRoles.objects.create(user=self.user, role=self.student)
+        self.assertTrue(PermissionManager.is_student(self.user))
+
+        perm = Permission.objects.create(name='view_reports')
+        link = RolePermission.objects.create(role=self.dean, permission=perm)
+        self.assertTrue(PermissionManager.has_permission(self.user, 'view_reports'))
+        link.delete()
+        self.assertFalse(PermissionManager.has_permission(self.user, 'view_reports'))
+
+    def test_affiliation_scope(self):
+        import datetime
+        from core.models import AcademicAffiliation
+        from core.permissions import PermissionManager
+        city = City.objects.create(bname_ar='RCity')
+        uni = University.objects.create(uname_ar='RUni')
+        branch = Branch.objects.create(university=uni, city=city)
+        college = College.objects.create(branch=branch, name_ar='RCollege')
+        self.assertEqual(PermissionManager.get_role_profile(self.user).college_ids, [])
+        AcademicAffiliation.objects.create(user=self.user, university=uni, college=college,
+                                           start_date=datetime.date(2025, 1, 1))
+        profile = PermissionManager.get_role_profile(self.user)
+        self.assertEqual(profile.college_ids, [college.cid])
+        self.assertEqual(profile.latest_affiliation['university_id'], uni.pk)
+
+    def test_admin_check_is_scoped_to_the_user(self):
+        from django.contrib.auth import get_user_model
+        from core.permissions import PermissionManager
+        other = get_user_model().objects.create_user(username='plain', password='x')
+        self.assertFalse(PermissionManager.is_admin(other))
+
+
+class DeployCheckTests(TestCase):
+    """`manage.py check --deploy` checks (core/checks.py)."""
+
+    def test_default_cache_must_be_shared(self):
+        from django.test import override_settings
+        from core.checks import check_shared_cache
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                             'LOCATION': 'redis://localhost:6379/1'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([e.id for e in check_shared_cache()], ['core.E001'])
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(), [])
+
+
+class DeanStatsTests(TestCase):
+    """dean-stats reads the CollegeStats row kept current by signals."""
+
+    def setUp(self):
+        import datetime
+        from rest_framework.test import APIClient
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from core.models import Role, UserRoles, AcademicAffiliation
+        cache.clear()
+        self.User, self.UserRoles, self.Affiliation = get_user_model(), UserRoles, AcademicAffiliation
+        self.today = datetime.date(2025, 9, 1)
+        city = City.objects.create(bname_ar='DCity')
+        self.uni = University.objects.create(uname_ar='DUni')
+        branch = Branch.objects.create(university=self.uni, city=city)
+        self.college = College.objects.create(branch=branch, name_ar='DCollege')
+        dept = Department.objects.create(college=self.college, name='DDept')
+        self.program = Program.objects.create(p_name='DProg', department=dept)
+        self.state = ProjectState.objects.create(name='Pending')
+        self.roles = {t: Role.objects.create(type=t) for t in ('Dean', 'Student', 'Supervisor')}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dean = self.add_user('dean', 'Dean')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.dean)
+
+    def add_user(self, username, role_type):
+        user = self.User.objects.create_user(username=username, password='x')
+        self.Affiliation.objects.create(user=user, university=self.uni, college=self.college,
+                                        start_date=self.today)
+        self.UserRoles.objects.create(user=user, role=self.roles[role_type])
+        return user
+
+    def test_stats_follow_changes(self):
+        from core.models import ApprovalRequest
+        with self.captureOnCommitCallbacks(execute=True):
+            student = self.add_user('s1', 'Student')
+            self.add_user('s2', 'Student')
+            self.add_user('sup', 'Supervisor')
+            project = Project.objects.create(title='DP', description='d', state=self.state,
+                                             college=self.college)
+            group = Group.objects.create(academic_year='2025', project=project)
+            programgroup.objects.create(program=self.program, group=group)
+            ApprovalRequest.objects.create(project=project, requested_by=student,
+                                           approval_type='project_proposal')
+
+        with self.assertNumQueries(4):  # role profile (3) + one stats row read
+            response = self.client.get('/api/dean-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'projects': 1, 'supervisors': 1, 'coSupervisors': 0,
+            'groups': 1, 'pendingApprovals': 1, 'users': 2,
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ApprovalRequest.objects.update(status='approved')
+            ApprovalRequest.objects.first().save()
+            self.UserRoles.objects.filter(user=student).delete()
+        data = self.client.get('/api/dean-stats/').json()
+        self.assertEqual((data['pendingApprovals'], data['users']), (0, 1))
+
+    def test_rebuild_command_and_missing_affiliation(self):
+        from django.core.management import call_command
+        from core.models import CollegeStats
+        call_command('rebuild_college_stats', stdout=open('/dev/null', 'w'))
+        self.assertTrue(CollegeStats.objects.filter(college=self.college).exists())
+
+        other = self.User.objects.create_user(username='nobody', password='x')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get('/api/dean-stats/').status_code, 400)
+
+
+class StudentWorkbookMixin:
+    """Builds student import workbooks and posts them to the commit endpoint."""
+
+    HEADERS = ['الرقم الوطني', 'الاسم الأول', 'الاسم الأخير', 'رقم الطالب',
+               'الجامعة', 'الكلية', 'القسم', 'البرنامج', 'سنة التسجيل']
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        cache.clear()
+        self.User = get_user_model()
+        city = City.objects.create(bname_ar='ICity')
+        self.uni = University.objects.create(uname_ar='جامعة صنعاء')
+        Branch.objects.create(university=self.uni, city=city)
+        self.client = APIClient()
+        self.client.force_authenticate(self.User.objects.create_superuser(username='importer', password='x'))
+
+    def workbook(self, rows):
+        from io import BytesIO
+        import openpyxl
+        # the same rows give the same bytes: the saved timestamp would change the file hash
+        # (and miss the validation cache) when a second passes between two requests
+        cache = self.__dict__.setdefault('_workbooks', {})
+        key = repr(rows)
+        if key not in cache:
+            wb = openpyxl.Workbook()
+            ws = wb.active
+            ws.append(['قالب استيراد بيانات الطلاب'])
+            ws.append(self.HEADERS)
+            for row in rows:
+                ws.append(row)
+            out = BytesIO()
+            wb.save(out)
+            cache[key] = out.getvalue()
+        out = BytesIO(cache[key])
+        out.name = 'students.xlsx'
+        return out
+
+    def student_row(self, i, first='ali', last='ahmed'):
+        return [f'{i:012d}', first, last, f'S{i}', 'جامعة صنعاء', 'كلية الهندسة',
+                'قسم الحاسوب', 'بكالوريوس حاسوب', '2024-2025']
+
+    def commit(self, rows):
+        return self.client.post('/api/import-students/commit/', {'file': self.workbook(rows)},
+                                format='multipart')
+
+
+class StudentImportTests(StudentWorkbookMixin, TestCase):
+    """Bulk student import (core/student_import.py) through the commit endpoint."""
+
+    def test_creates_users_students_affiliations_and_roles(self):
+        from core.models import Student, AcademicAffiliation, UserRoles
+        response = self.commit([self.student_row(i) for i in range(1, 6)])
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual((data['created_users'], data['created_students']), (5, 5))
+        self.assertEqual((data['created_affiliations'], data['assigned_roles']), (5, 5))
+        self.assertEqual(data['row_errors'], [])
+
+        usernames = sorted(self.User.objects.filter(CID__isnull=False).values_list('username', flat=True))
+        self.assertEqual(usernames, ['ali_ahmed', 'ali_ahmed1', 'ali_ahmed2', 'ali_ahmed3', 'ali_ahmed4'])
+        self.assertEqual(College.objects.filter(name_ar='كلية الهندسة').count(), 1)
+        self.assertEqual(Program.objects.filter(p_name='بكالوريوس حاسوب').count(), 1)
+        student = Student.objects.get(student_id='S3')
+        self.assertEqual(student.program.department.college.branch.university, self.uni)
+        aff = AcademicAffiliation.objects.get(user=student.user)
+        self.assertEqual(aff.start_date.year, 2024)
+        self.assertTrue(UserRoles.objects.filter(user=student.user, role__type='Student').exists())
+
+    def test_reimport_updates_and_reports_student_id_conflicts(self):
+        self.commit([self.student_row(1), self.student_row(3)])
+        conflicting = self.student_row(2)
+        conflicting[3] = 'S3'  # student_id already owned by another student
+        data = self.commit([self.student_row(1, first='omar'), conflicting]).json()
+        self.assertEqual((data['updated_users'], data['created_users']), (1, 0))
+        self.assertEqual(data['row_errors'][0]['field'], 'رقم الطالب')
+        self.assertEqual(self.User.objects.get(CID=f'{1:012d}').first_name, 'omar')
+
+    def test_query_count_does_not_grow_with_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def run(start, n):
+            with CaptureQueriesContext(connection) as ctx:
+                self.commit([self.student_row(i, first=f'n{i}') for i in range(start, start + n)])
+            return len(ctx.captured_queries)
+
+        run(1, 1)  # creates the location hierarchy
+        self.assertEqual(run(100, 3), run(200, 30))
+
+
+class ImportJobTests(StudentWorkbookMixin, TestCase):
+    """Background student import jobs (core/import_jobs.py): chunked commits, progress, resume."""
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(
+            MEDIA_ROOT=media.name,
+            IMPORT_JOBS={'BACKEND': 'sync', 'CHUNK_SIZE': 2},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def commit_in_background(self, rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/import-students/commit/',
+                                        {'file': self.workbook(rows), 'background': '1'},
+                                        format='multipart')
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()['id']
+
+    def test_job_imports_in_chunks_and_pushes_progress(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from core.models import ImportJob, Student
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        importer = self.User.objects.get(username='importer')
+        async_to_sync(layer.group_add)(f'notifications_{importer.id}', channel)
+
+        job_id = self.commit_in_background([self.student_row(i) for i in range(1, 6)])
+
+        job = ImportJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.total_rows, job.processed_rows), (5, 5))
+        self.assertEqual(job.result['created_students'], 5)
+        self.assertEqual(Student.objects.count(), 5)
+        self.assertFalse(job.file)
+
+        data = self.client.get(f'/api/import-jobs/{job_id}/').json()
+        self.assertEqual((data['status'], data['processed_rows']), ('completed', 5))
+
+        # total + 3 chunks + finish
+        events = [async_to_sync(layer.receive)(channel) for _ in range(5)]
+        self.assertEqual([e['job']['processed_rows'] for e in events], [0, 2, 4, 5, 5])
+        self.assertEqual(events[-1]['job']['status'], 'completed')
+
+    def test_failed_job_resumes_from_last_committed_chunk(self):
+        from unittest import mock
+        from core.import_jobs import StudentsImportHandler
+        from core.models import ImportJob, Student
+
+        original_write = StudentsImportHandler.write
+        calls = []
+
+        def flaky_write(handler, job, chunk):
+            calls.append(len(chunk))
+            if len(calls) == 2:
+                raise RuntimeError('worker died')
+            return original_write(handler, job, chunk)
+
+        with mock.patch.object(StudentsImportHandler, 'write', flaky_write):
+            job_id = self.commit_in_background([self.student_row(i) for i in range(1, 6)])
+
+        job = ImportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.next_row), ('failed', 2))
+        self.assertEqual(job.error_message, 'worker died')
+        self.assertEqual(Student.objects.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/import-jobs/{job_id}/resume/')
+        self.assertEqual(response.status_code, 202, response.content)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.resumed_from), ('completed', 5, 2))
+        self.assertEqual(job.result['created_students'], 5)
+        self.assertEqual(Student.objects.count(), 5)
+        self.assertEqual(self.client.post(f'/api/import-jobs/{job_id}/resume/').status_code, 400)
+
+
+class StudentValidationTests(StudentWorkbookMixin, TestCase):
+    """Single-pass student validation: batched DB checks, pool, file-hash cache."""
+
+    def validate(self, rows):
+        return self.client.post('/api/import-students/validate/', {'file': self.workbook(rows)},
+                                format='multipart')
+
+    def test_reports_existing_rows_and_student_id_conflicts(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.commit([self.student_row(1), self.student_row(3)])
+        conflicting = self.student_row(2)
+        conflicting[3] = 'S3'
+
+        with CaptureQueriesContext(connection) as small:
+            data = self.validate([self.student_row(1), conflicting]).json()
+        self.assertEqual((data['created_count'], data['updated_count']), (1, 1))
+        self.assertEqual(data['valid_rows'], 1)
+        self.assertEqual(data['errors'], [
+            {'row': 4, 'field': 'رقم الطالب', 'message': 'رقم الطالب مستخدم لطالب آخر'},
+        ])
+
+        with CaptureQueriesContext(connection) as large:
+            self.validate([self.student_row(i) for i in range(10, 60)])
+        self.assertEqual(len(small), len(large))
+
+    def test_commit_reuses_cached_validation(self):
+        from unittest import mock
+        from core import student_import
+        rows = [self.student_row(i) for i in range(1, 4)]
+        self.validate(rows)
+        with mock.patch.object(student_import, 'validate_student_rows') as revalidate:
+            response = self.commit(rows)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['created_students'], 3)
+        revalidate.assert_not_called()
+
+    def test_process_pool_matches_serial_validation(self):
+        from django.test import override_settings
+        from core.student_import import validate_student_rows
+        rows = [(i + 3, dict(zip(['CID', 'first_name', 'last_name', 'student_id', 'gender'], values)))
+                for i, values in enumerate([
+                    ('000000000001', 'a', 'b', 'S1', 'ذكر'),
+                    ('123', '', 'b', 'S1', 'x'),
+                    ('000000000001', 'a', 'b', 'S2', None),
+                    ('000000000004', 'a', 'b', 'S4', 'انثى'),
+                ])]
+        serial = validate_student_rows(rows)
+        with override_settings(STUDENT_IMPORT_VALIDATION={'POOL_MIN_ROWS': 2, 'POOL_WORKERS': 2}):
+            pooled = validate_student_rows(rows)
+        self.assertEqual(pooled, serial)
+        self.assertEqual(serial[1], 2)
+
+
+class ProjectImportTests(TestCase):
+    """Project import through LocationResolver (core/locations.py) and ProjectImporter."""
+
+    HEADERS = ['(عربي)عنوان المشروع', 'الملخص', 'اسم المشرف', 'سنة بداية المشروع', 'الجامعة',
+               'الكلية', 'القسم', 'البرنامج', 'المحافظة', 'أسماء الطلاب', 'أرقام قيد الطلاب']
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        cache.clear()
+        self.User = get_user_model()
+        self.city = City.objects.create(bname_ar='صنعاء')
+        self.uni = University.objects.create(uname_ar='جامعة صنعاء')
+        self.branch = Branch.objects.create(university=self.uni, city=self.city)
+        self.client = APIClient()
+        self.client.force_authenticate(self.User.objects.create_superuser(username='importer', password='x'))
+
+    def commit(self, rows):
+        from io import BytesIO
+        import openpyxl
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(['قالب استيراد بيانات المشاريع والطلاب'])
+        ws.append(self.HEADERS)
+        for row in rows:
+            ws.append(row)
+        out = BytesIO()
+        wb.save(out)
+        out.seek(0)
+        out.name = 'projects.xlsx'
+        return self.client.post('/api/import_projects_commit/', {'file': out}, format='multipart')
+
+    def project_row(self, i, university='جامعة صنعاء', college='كلية الحاسوب'):
+        return [f'مشروع {i}', 'وصف', f'مشرف {i % 2}', 2025, university, college,
+                'علوم الحاسوب', 'تقنية المعلومات', 'صنعاء', f'طالب {i}, طالبة {i}', f'P{i}A, P{i}B']
+
+    def test_imports_projects_supervisors_and_students(self):
+        from core.models import AcademicAffiliation, Staff, Student
+        # "جامعه" / "كليه" match the existing nodes after Arabic normalization
+        College.objects.create(branch=self.branch, name_ar='كلية الحاسوب')
+        response = self.commit([self.project_row(1, university='جامعه  صنعاء', college='كليه الحاسوب'),
+                                self.project_row(2)])
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual((data['created_projects'], data['users_created']), (2, 6))
+        self.assertEqual(data['row_errors'], [])
+
+        self.assertEqual((University.objects.count(), College.objects.count(), Branch.objects.count()), (1, 1, 1))
+        self.assertEqual(Program.objects.get().department.college.branch, self.branch)
+        project = Project.objects.get(title='مشروع 1')
+        self.assertEqual((project.university, project.branch), (self.uni, self.branch))
+        self.assertEqual(project.created_by.username, 'مشرف_1')
+        self.assertEqual(Staff.objects.filter(user=project.created_by).count(), 1)
+        self.assertEqual(Student.objects.get(student_id='P1B').user.first_name, 'طالبة')
+        self.assertEqual(AcademicAffiliation.objects.count(), 6)
+
+        data = self.commit([self.project_row(1)]).json()
+        self.assertEqual((data['created_projects'], data['updated_projects'], data['users_created']), (0, 1, 0))
+        self.assertEqual(AcademicAffiliation.objects.count(), 6)
+
+    def test_new_hierarchy_is_created_once_and_query_count_is_constant(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def run(start, n):
+            with CaptureQueriesContext(connection) as ctx:
+                self.commit([self.project_row(i, university='جامعة عدن') for i in range(start, start + n)])
+            return len(ctx.captured_queries)
+
+        run(1, 2)  # creates the hierarchy and both supervisors
+        self.assertEqual(run(100, 3), run(200, 30))
+        aden = University.objects.get(uname_ar='جامعة عدن')
+        self.assertEqual(Branch.objects.filter(university=aden, city=self.city).count(), 1)
+        self.assertEqual(College.objects.filter(branch__university=aden).count(), 1)
+        self.assertEqual(Project.objects.filter(university=aden).count(), 35)
+
+
+class LocationTreeTests(TestCase):
+    """GET /api/locations/tree/: cached, versioned tree with ETag revalidation."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        cache.clear()
+        city = City.objects.create(bname_ar='TreeCity')
+        self.uni = University.objects.create(uname_ar='TreeUni')
+        branch = Branch.objects.create(university=self.uni, city=city)
+        self.college = College.objects.create(branch=branch, name_ar='TreeCollege')
+        self.dept = Department.objects.create(college=self.college, name='TreeDept')
+        Program.objects.create(department=self.dept, p_name='TreeProg')
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='tree', password='x'))
+
+    def test_tree_is_built_once_and_revalidated_by_etag(self):
+        resp = self.client.get('/api/locations/tree/')
+        self.assertEqual(resp.status_code, 200)
+        [uni] = resp.json()
+        self.assertEqual(uni['branches'][0]['colleges'][0]['departments'][0]['programs'][0]['p_name'], 'TreeProg')
+
+        etag = resp['ETag']
+        with self.assertNumQueries(0):
+            self.client.get('/api/locations/tree/')
+        self.assertEqual(self.client.get('/api/locations/tree/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Program.objects.create(department=self.dept, p_name='NewProg')
+        resp = self.client.get('/api/locations/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_subtree_and_flat_queries(self):
+        from core.location_tree import build_location_tree
+        for i in range(3):
+            dept = Department.objects.create(college=self.college, name=f'D{i}')
+            Program.objects.create(department=dept, p_name=f'P{i}')
+        with self.assertNumQueries(5):
+            build_location_tree()
+
+        resp = self.client.get(f'/api/locations/tree/?college={self.college.cid}')
+        self.assertEqual(resp.json()['name_ar'], 'TreeCollege')
+        self.assertEqual(len(resp.json()['departments']), 4)
+        self.assertEqual(self.client.get('/api/locations/tree/?department=999').status_code, 404)
+        self.assertEqual(self.client.get('/api/locations/tree/?college=x').status_code, 400)
+
+
+class NotificationCounterTests(TestCase):
+    """Unread counters (core/notification_counters.py) kept in the cache and pushed over WebSocket."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from django.test import override_settings
+        cache.clear()
+        overrides = override_settings(NOTIFICATION_PUSH={'WINDOW': 0, 'BATCH_SIZE': 2})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = get_user_model().objects.create_user(username='reader', password='x')
+
+    def notify(self, notification_type='system', **kwargs):
+        from core.models import NotificationLog
+        with self.captureOnCommitCallbacks(execute=True):
+            return NotificationLog.objects.create(
+                recipient=self.user, notification_type=notification_type, title='t', message='m', **kwargs
+            )
+
+    def test_counters_follow_create_read_and_delete(self):
+        from core.notification_counters import get_unread_counts
+        from core.notification_manager import NotificationManager
+        first = self.notify('invitation')
+        self.notify('invitation')
+        self.notify('system')
+        self.notify('system', is_read=True)
+
+        self.assertEqual(get_unread_counts(self.user.pk), {'count': 3, 'by_type': {'invitation': 2, 'system': 1}})
+        with self.assertNumQueries(0):
+            self.assertEqual(NotificationManager.get_unread_count(self.user), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationManager.mark_as_read(first.pk, self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationManager.delete_notification(first.pk, self.user)
+        self.notify('invitation')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_counts(self.user.pk)['by_type'], {'invitation': 2, 'system': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationManager.mark_all_as_read(self.user)
+        self.assertEqual(get_unread_counts(self.user.pk), {'count': 0, 'by_type': {}})
+
+    def test_changes_are_pushed_to_the_users_group(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from rest_framework.test import APIClient
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'notifications_{self.user.pk}', channel)
+
+        self.notify('invitation')
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual((event['type'], event['count'], event['by_type']),
+                         ('notification_batch', 1, {'invitation': 1}))
+        self.assertEqual(event['notifications'][0]['notification_type'], 'invitation')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post('/api/notifications/mark-all-read/')
+        self.assertEqual(async_to_sync(layer.receive)(channel)['count'], 0)
+        self.assertEqual(client.get('/api/notifications/unread-count/').json(), {'count': 0, 'by_type': {}})
+
+
+class NotificationPushTests(TestCase):
+    """New notifications reach notifications_{user_id} after commit, one message per recipient."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from django.test import override_settings
+        cache.clear()
+        overrides = override_settings(NOTIFICATION_PUSH={'WINDOW': 0, 'BATCH_SIZE': 2})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        User = get_user_model()
+        self.users = [User.objects.create_user(username=f'push{i}', password='x') for i in range(3)]
+
+    def listen(self, user):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'notifications_{user.pk}', channel)
+        return lambda: async_to_sync(layer.receive)(channel)
+
+    def test_transaction_is_coalesced_per_recipient(self):
+        from django.db import transaction
+        from core.notification_manager import NotificationManager
+        from core.utils import NotificationService
+        receivers = [self.listen(user) for user in self.users]
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                for user in self.users:
+                    NotificationManager.create_notification(user, 'system_info', 'a', 'first')
+                    NotificationService.create_notification(user, 'system', 'b', 'second')
+        self.assertEqual(len(callbacks), 1)
+
+        for receive in receivers:
+            event = receive()
+            self.assertEqual([n['message'] for n in event['notifications']], ['first', 'second'])
+            self.assertEqual(event['count'], 2)
+
+    def test_window_buffers_until_flush(self):
+        from django.test import override_settings
+        from unittest import mock
+        from core.models import NotificationLog
+        from core.notification_push import flush_push_buffer
+        receive = self.listen(self.users[0])
+        with override_settings(NOTIFICATION_PUSH={'WINDOW': 60}), \
+                mock.patch('core.notification_push.threading.Timer') as timer:
+            for message in ('one', 'two'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    NotificationLog.objects.create(recipient=self.users[0], notification_type='message',
+                                                   title='t', message=message)
+        self.assertEqual(timer.call_count, 1)
+        self.assertEqual(flush_push_buffer(), 1)
+        event = receive()
+        self.assertEqual([n['message'] for n in event['notifications']], ['one', 'two'])
+
+
+class BulkNotificationTests(TestCase):
+    """NotificationManager bulk API: chunked bulk_create, background jobs and group invitations."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        cache.clear()
+        overrides = override_settings(NOTIFICATION_PUSH={'WINDOW': 0}, IMPORT_JOBS={'BACKEND': 'sync'})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        User = get_user_model()
+        self.admin = User.objects.create_user(username='announcer', password='x', is_superuser=True)
+        self.users = [User.objects.create_user(username=f'bulk{i}', password='x') for i in range(5)]
+        User.objects.create_user(username='gone', password='x', is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_notify_all_users_writes_in_chunks(self):
+        from unittest import mock
+        from core.models import NotificationLog
+        from core.notification_counters import get_unread_count
+        from core.notification_manager import SystemNotificationManager
+        with mock.patch('core.notification_manager.BULK_CHUNK_SIZE', 2), \
+                self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(NotificationLog.objects, 'bulk_create',
+                                  wraps=NotificationLog.objects.bulk_create) as bulk_create:
+            self.assertEqual(SystemNotificationManager.notify_all_users('t', 'hello'), 6)
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [2, 2, 2])
+        self.assertEqual(NotificationLog.objects.filter(message='hello').count(), 6)
+        self.assertEqual(get_unread_count(self.users[0].pk), 1)
+
+        response = self.client.post('/api/notifications/broadcast/', {'title': 't', 'message': 'again'})
+        self.assertEqual(response.json(), {'count': 6})
+
+    def test_background_broadcast_resumes_after_failure(self):
+        from unittest import mock
+        from core.models import NotificationJob, NotificationLog
+        from core.notification_manager import NotificationManager
+
+        original = NotificationManager.notify_users
+        calls = []
+
+        def flaky(recipient_ids, *args, **kwargs):
+            calls.append(list(recipient_ids))
+            if len(calls) == 2:
+                raise RuntimeError('worker died')
+            return original(calls[-1], *args, **kwargs)
+
+        recipients = [u.pk for u in self.users]
+        with mock.patch('core.notification_jobs.BULK_CHUNK_SIZE', 2), \
+                mock.patch.object(NotificationManager, 'notify_users', staticmethod(flaky)):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/notifications/broadcast/', {
+                    'title': 't', 'message': 'news', 'recipient_ids': recipients, 'background': '1',
+                }, format='json')
+            self.assertEqual(response.status_code, 202, response.content)
+            job = NotificationJob.objects.get(pk=response.json()['id'])
+            self.assertEqual((job.status, job.sent_count, job.total_recipients), ('failed', 2, 5))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.post(f'/api/notification-jobs/{job.pk}/resume/').status_code, 202)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent_count), ('completed', 5))
+        self.assertEqual(sorted(NotificationLog.objects.filter(message='news').values_list('recipient_id', flat=True)),
+                         recipients)
+
+    def test_group_request_invites_in_bulk(self):
+        from core.models import GroupMemberApproval, NotificationLog
+        city = City.objects.create(bname_ar='BCity')
+        branch = Branch.objects.create(university=University.objects.create(uname_ar='BUni'), city=city)
+        college = College.objects.create(branch=branch, name_ar='BCollege')
+        dept = Department.objects.create(college=college, name='BDept')
+        creator, *students = self.users[:3]
+        self.client.force_authenticate(creator)
+        response = self.client.post('/api/groups/', {
+            'department_id': dept.pk, 'college_id': college.pk,
+            'student_ids': [creator.pk] + [s.pk for s in students], 'supervisor_ids': [self.users[3].pk],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        approvals = {a.user_id: a for a in GroupMemberApproval.objects.all()}
+        self.assertEqual(approvals[creator.pk].status, 'accepted')
+        invites = NotificationLog.objects.filter(notification_type='invitation')
+        self.assertEqual(
+            sorted(invites.values_list('recipient_id', 'related_id')),
+            sorted((uid, approvals[uid].id) for uid in [s.pk for s in students] + [self.users[3].pk]),
+        )
+
+
+class InvitationFixtures:
+    """A group with pending invitations for the invitation job tests."""
+
+    def setUp(self):
+        from django.test import override_settings
+        overrides = override_settings(IMPORT_JOBS={'BACKEND': 'sync'}, NOTIFICATION_PUSH={'WINDOW': 0})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        self.inviter = User.objects.create_user(username='inviter', password='x')
+        self.students = [User.objects.create_user(username=f'invitee{i}', password='x') for i in range(8)]
+        state = ProjectState.objects.create(name='Pending')
+        self.group = Group.objects.create(project=Project.objects.create(title='Inv Project', state=state))
+
+    def invite(self, student, expires_in, age=None):
+        import datetime
+        from django.utils import timezone
+        from core.models import GroupInvitation
+        invitation = GroupInvitation.objects.create(
+            group=self.group, invited_student=student, invited_by=self.inviter,
+            expires_at=timezone.now() + expires_in,
+        )
+        if age is not None:
+            GroupInvitation.objects.filter(pk=invitation.pk).update(created_at=timezone.now() - age)
+        return invitation
+
+
+class InvitationJobTests(InvitationFixtures, TestCase):
+    """Set-based invitation expiry and reminders (core/invitation_jobs.py)."""
+
+    def test_expiry_is_one_update_with_bulk_notifications(self):
+        import datetime
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.invitation_jobs import expire_pending_invitations
+        from core.models import GroupInvitation, NotificationLog
+        past = -datetime.timedelta(hours=1)
+
+        def run(students):
+            for student in students:
+                self.invite(student, past)
+            with CaptureQueriesContext(connection) as ctx:
+                report = expire_pending_invitations(notify='student')
+            return report, len(ctx.captured_queries)
+
+        small, small_queries = run(self.students[:1])
+        large, large_queries = run(self.students[1:6])
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual((large['rows'], large['notifications']), (5, 5))
+        self.assertIn('duration_ms', large)
+        self.assertFalse(GroupInvitation.objects.filter(status='pending').exists())
+        self.assertEqual(NotificationLog.objects.filter(notification_type='invitation_expired').count(), 6)
+        self.assertIn('Inv Project', NotificationLog.objects.first().message)
+
+    def test_reminders_skip_recently_reminded_invitations(self):
+        import datetime
+        from core.invitation_jobs import remind_expiring_invitations
+        from core.models import NotificationLog
+        from core.tasks import send_pending_invitations_reminder
+        soon = datetime.timedelta(minutes=30)
+        for student in self.students[:3]:
+            self.invite(student, soon)
+        NotificationLog.objects.create(recipient=self.students[0], notification_type='reminder',
+                                       related_group=self.group, title='t', message='m')
+
+        self.assertEqual(remind_expiring_invitations()['notifications'], 2)
+        self.assertEqual(remind_expiring_invitations()['notifications'], 0)
+
+        for student in self.students[3:5]:
+            self.invite(student, datetime.timedelta(days=3), age=datetime.timedelta(days=2))
+        self.invite(self.students[5], datetime.timedelta(days=3))  # too recent
+        self.assertIn('2', send_pending_invitations_reminder())
+        reminder = NotificationLog.objects.filter(recipient=self.students[3]).get()
+        self.assertIn('71 ساعات', reminder.message)
+        self.assertIn('0', send_pending_invitations_reminder())
+
+
+class InvitationExpirySchedulerTests(InvitationFixtures, TestCase):
+    """Heap of pending deadlines (core/invitation_expiry.py)."""
+
+    def setUp(self):
+        from core.invitation_expiry import expiry_scheduler
+        super().setUp()
+        self.scheduler = expiry_scheduler
+        self.addCleanup(self.scheduler.reset)
+
+    def test_expires_each_invitation_at_its_deadline(self):
+        import datetime
+        from core.models import GroupInvitation
+        first = self.invite(self.students[0], datetime.timedelta(minutes=5))
+        second = self.invite(self.students[1], datetime.timedelta(minutes=30))
+        self.assertEqual(self.scheduler.load(), 2)
+        self.assertEqual(self.scheduler.next_deadline(), first.expires_at)
+
+        self.assertIsNone(self.scheduler.run_due(first.expires_at))
+        report = self.scheduler.run_due(first.expires_at + datetime.timedelta(seconds=1))
+        self.assertEqual(report['rows'], 1)
+        self.assertEqual(GroupInvitation.objects.get(pk=first.pk).status, 'expired')
+        self.assertEqual(GroupInvitation.objects.get(pk=second.pk).status, 'pending')
+        self.assertEqual(self.scheduler.next_deadline(), second.expires_at)
+
+    def test_rearms_when_invitations_are_created_or_answered(self):
+        import datetime
+        later = self.invite(self.students[0], datetime.timedelta(hours=2))
+        self.scheduler.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            sooner = self.invite(self.students[1], datetime.timedelta(minutes=10))
+        self.assertEqual(self.scheduler.next_deadline(), sooner.expires_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sooner.status = 'accepted'
+            sooner.save()
+        self.assertEqual(self.scheduler.next_deadline(), later.expires_at)
+        self.assertIsNone(self.scheduler.run_due(sooner.expires_at + datetime.timedelta(seconds=1)))
+
+
+class SchedulerLeadershipTests(TestCase):
+    """Scheduler lease and job run history (core/scheduler_leadership.py)."""
+
+    def test_lease_has_one_owner_until_it_expires(self):
+        import datetime
+        from django.utils import timezone
+        from core.models import SchedulerLease
+        from core.scheduler_leadership import DatabaseLease
+        first = DatabaseLease('jobs', 'worker-1', ttl=60)
+        second = DatabaseLease('jobs', 'worker-2', ttl=60)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.acquire())  # renewal
+
+        SchedulerLease.objects.filter(name='jobs').update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertTrue(second.acquire())
+        self.assertFalse(first.acquire())
+        second.release()
+        self.assertTrue(first.acquire())
+
+    def test_jobs_run_on_the_leader_only_and_are_recorded(self):
+        from unittest import mock
+        from core.models import ScheduledJobRun
+        from core.scheduler import NotificationScheduler
+        from core.scheduler_leadership import DatabaseLease, SchedulerLeadership, run_job
+        DatabaseLease('notification-scheduler', 'other-worker', ttl=60).acquire()
+        with mock.patch.object(NotificationScheduler, 'leadership', SchedulerLeadership(owner='this-worker')):
+            self.assertIsNone(NotificationScheduler.run_if_leader('cleanup_old_notifications'))
+        self.assertFalse(ScheduledJobRun.objects.exists())
+
+        self.assertEqual(run_job('expire', lambda: {'rows': 3}, 'this-worker'), {'rows': 3})
+        with self.assertRaises(ValueError):
+            run_job('broken', mock.Mock(side_effect=ValueError('boom')))
+        runs = {run.job_id: run for run in ScheduledJobRun.objects.all()}
+        self.assertEqual((runs['expire'].status, runs['expire'].rows_affected), ('completed', 3))
+        self.assertEqual((runs['broken'].status, runs['broken'].error_message), ('failed', 'boom'))
+        self.assertIsNotNone(runs['broken'].duration_ms)
+
+
+class NotificationRetentionTests(TestCase):
+    """Batched retention and archival (core/notification_retention.py)."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        overrides = override_settings(
+            NOTIFICATION_PUSH={'WINDOW': 0},
+            NOTIFICATION_RETENTION={'DEFAULT_DAYS': 60, 'TYPES': {'system': 30}, 'ARCHIVE_READ': True, 'BATCH_SIZE': 2},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = get_user_model().objects.create_user(username='retention', password='x')
+
+    def notify(self, notification_type, age_days, is_read=False):
+        import datetime
+        from django.utils import timezone
+        from core.models import NotificationLog
+        notification = NotificationLog.objects.create(
+            recipient=self.user, notification_type=notification_type, title='t', message='m', is_read=is_read,
+        )
+        NotificationLog.objects.filter(pk=notification.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=age_days)
+        )
+        return notification.pk
+
+    def test_per_type_retention_in_batches_with_archive(self):
+        from core.models import NotificationArchive, NotificationLog
+        from core.notification_counters import get_unread_count
+        from core.notification_retention import apply_notification_retention
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = {self.notify('system', 10), self.notify('message', 40)}
+            archived = self.notify('message', 70, is_read=True)
+            self.notify('system', 40)
+            self.notify('message', 70)
+            self.notify(None, 70)
+        self.assertEqual(get_unread_count(self.user.pk), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = apply_notification_retention()
+        self.assertEqual((report['deleted'], report['archived']), (4, 1))
+        self.assertGreaterEqual(report['batches'], 2)
+        self.assertEqual(set(NotificationLog.objects.values_list('pk', flat=True)), kept)
+        self.assertEqual(list(NotificationArchive.objects.values_list('pk', flat=True)), [archived])
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+
+    def test_delete_old_notifications_days_applies_to_all_types(self):
+        from core.models import NotificationArchive, NotificationLog
+        from core.notification_manager import NotificationManager
+        self.notify('system', 10)
+        self.notify('message', 20, is_read=True)
+        self.assertEqual(NotificationManager.delete_old_notifications(days=15), 1)
+        self.assertEqual(NotificationLog.objects.count(), 1)
+        self.assertEqual(NotificationArchive.objects.count(), 1)
+
+    def test_old_done_outbox_events_are_deleted(self):
+        import datetime
+        from django.utils import timezone
+        from core.models import OutboxEvent
+        from core.notification_retention import apply_notification_retention
+        now = timezone.now()
+        for key, status, age_days in [('old', 'done', 10), ('recent', 'done', 1), ('failed', 'failed', 10),
+                                      ('old2', 'done', 8), ('old3', 'done', 30)]:
+            OutboxEvent.objects.create(event_type='test', dedupe_key=key, status=status,
+                                       processed_at=now - datetime.timedelta(days=age_days))
+        OutboxEvent.objects.create(event_type='test', dedupe_key='pending')
+
+        report = apply_notification_retention(now=now)
+        self.assertEqual(report['outbox_deleted'], 3)
+        self.assertEqual(sorted(OutboxEvent.objects.values_list('dedupe_key', flat=True)),
+                         ['failed', 'pending', 'recent'])
+
+
+class NotificationInboxTests(TestCase):
+    """Keyset-paginated /api/notifications/ with is_read, type and since filters."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+        from core.models import NotificationLog
+        self.user = get_user_model().objects.create_user(username='inbox', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        NotificationLog.objects.bulk_create([
+            NotificationLog(recipient=self.user, notification_type='message' if i % 2 else 'system',
+                            title=f'n{i}', message='m', is_read=i < 2)
+            for i in range(5)
+        ])
+        self.ids = list(NotificationLog.objects.order_by('-created_at', '-notification_id')
+                        .values_list('notification_id', flat=True))
+
+    def test_pages_follow_the_cursor_and_filters(self):
+        first = self.client.get('/api/notifications/', {'page_size': 2}).json()
+        self.assertEqual([n['notification_id'] for n in first['results']], self.ids[:2])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([n['notification_id'] for n in second['results']], self.ids[2:4])
+
+        unread = self.client.get('/api/notifications/', {'is_read': 'false', 'notification_type': 'system'}).json()
+        self.assertEqual([n['title'] for n in unread['results']], ['n4', 'n2'])
+        self.assertEqual(self.client.get('/api/notifications/', {'is_read': 'maybe'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/notifications/', {'cursor': 'bad'}).status_code, 404)
+
+    def test_since_returns_only_newer_rows(self):
+        from core.models import NotificationLog
+        since = self.client.get('/api/notifications/', {'limit': 1}).json()['since']
+        self.assertEqual(self.client.get('/api/notifications/', {'since': since}).json()['results'], [])
+
+        newer = NotificationLog.objects.create(recipient=self.user, notification_type='message', title='new', message='m')
+        resp = self.client.get('/api/notifications/', {'since': since}).json()
+        self.assertEqual([n['notification_id'] for n in resp['results']], [newer.pk])
+        self.assertNotEqual(resp['since'], since)
+
+
+class OutboxTests(InvitationFixtures, TestCase):
+    """Invitation and approval notifications through the outbox (core/outbox.py)."""
+
+    def test_invitation_notification_is_sent_once_after_commit(self):
+        import datetime
+        from core.models import NotificationLog, OutboxEvent
+        from core.outbox import drain_outbox
+        from core.utils import InvitationService
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            InvitationService.send_invitation(self.group, self.students[0], self.inviter)
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.event_type, event.status), ('group_invitation.created', 'pending'))
+        self.assertFalse(NotificationLog.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'done')
+        notification = NotificationLog.objects.get()
+        self.assertEqual((notification.recipient, notification.notification_type), (self.students[0], 'invitation'))
+        self.assertIn('Inv Project', notification.message)
+        self.assertIn('لديك 48 ساعة', notification.message)
+
+        # replaying the event (e.g. after a crash before it was marked done) is a no-op
+        OutboxEvent.objects.update(status='pending')
+        self.assertEqual(drain_outbox()['rows'], 1)
+        self.assertEqual(NotificationLog.objects.count(), 1)
+
+    def test_invitation_message_uses_the_invitation_expiry(self):
+        import datetime
+        from core.models import NotificationLog
+        from core.outbox import drain_outbox
+        with self.captureOnCommitCallbacks(execute=False):
+            self.invite(self.students[0], datetime.timedelta(hours=72))
+            self.invite(self.students[1], datetime.timedelta(hours=5, minutes=30))
+        drain_outbox()
+        self.assertIn('لديك 72 ساعة', NotificationLog.objects.get(recipient=self.students[0]).message)
+        self.assertIn('لديك 6 ساعات', NotificationLog.objects.get(recipient=self.students[1]).message)
+
+    def test_failing_handler_is_retried_then_marked_failed(self):
+        from unittest import mock
+        from django.test import override_settings
+        from django.utils import timezone
+        from core.models import OutboxEvent
+        from core.outbox import OUTBOX_HANDLERS, drain_outbox, enqueue_event
+        enqueue_event('test.event', {'n': 1})
+        broken = mock.Mock(side_effect=RuntimeError('smtp down'))
+        with mock.patch.dict(OUTBOX_HANDLERS, {'test.event': broken}), \
+                override_settings(OUTBOX={'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 0}):
+            self.assertEqual(drain_outbox()['failed'], 1)
+            event = OutboxEvent.objects.get()
+            self.assertEqual((event.status, event.attempts, event.last_error), ('pending', 1, 'smtp down'))
+            OutboxEvent.objects.update(available_at=timezone.now())
+            drain_outbox()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', 2))
+        self.assertFalse(enqueue_event('test.event', {'n': 1}))  # same dedupe key
+
+
+
+class NotificationEmailTests(TestCase):
+    """Batched notification emails over one connection (core/notification_email.py)."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from core.models import NotificationLog
+        User = get_user_model()
+        self.alice = User.objects.create_user(username='alice', password='x', email='alice@example.com')
+        self.bob = User.objects.create_user(username='bob', password='x', email='')
+        for i in range(2):
+            NotificationLog.objects.create(recipient=self.alice, notification_type='system', title=f'a{i}', message='m')
+        NotificationLog.objects.create(recipient=self.bob, notification_type='system', title='b', message='m')
+
+    def test_pending_notifications_are_sent_once_over_one_connection(self):
+        from unittest import mock
+        from django.core import mail
+        from core.models import NotificationLog
+        from core.notification_email import send_pending_notification_emails
+        with mock.patch('core.notification_email.get_connection', wraps=mail.get_connection) as connections:
+            report = send_pending_notification_emails(digest=False)
+        self.assertEqual(connections.call_count, 1)
+        self.assertEqual((report['rows'], report['emails']), (2, 2))
+        self.assertEqual(sorted(m.subject for m in mail.outbox), ['[إشعار نظام] a0', '[إشعار نظام] a1'])
+        self.assertEqual(list(NotificationLog.objects.filter(is_sent_email=False).values_list('title', flat=True)), ['b'])
+        self.assertEqual(send_pending_notification_emails(digest=False)['emails'], 0)
+
+    def test_digest_groups_notifications_per_user(self):
+        from django.core import mail
+        from core.notification_email import send_pending_notification_emails
+        report = send_pending_notification_emails(digest='daily')
+        self.assertEqual((report['rows'], report['emails']), (2, 1))
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+        self.assertIn('a0', mail.outbox[0].body)
+        self.assertIn('a1', mail.outbox[0].body)
+
+    def test_failing_recipient_does_not_hold_back_the_batch(self):
+        from smtplib import SMTPRecipientsRefused
+        from unittest import mock
+        from django.contrib.auth import get_user_model
+        from django.core import mail
+        from django.core.mail.backends.locmem import EmailBackend
+        from core.models import NotificationLog
+        from core.notification_email import send_pending_notification_emails
+        carol = get_user_model().objects.create_user(username='carol', password='x', email='carol@example.com')
+        NotificationLog.objects.create(recipient=carol, notification_type='system', title='c', message='m')
+
+        deliver = EmailBackend.send_messages
+
+        def send_messages(backend, messages):
+            if messages[0].to == ['alice@example.com']:
+                raise SMTPRecipientsRefused({'alice@example.com': (550, b'mailbox unavailable')})
+            return deliver(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', send_messages):
+            report = send_pending_notification_emails(digest=False)
+        self.assertEqual((report['rows'], report['emails'], report['failed']), (1, 1, 2))
+        self.assertEqual([m.to for m in mail.outbox], [['carol@example.com']])
+        self.assertEqual(sorted(NotificationLog.objects.filter(is_sent_email=True).values_list('title', flat=True)), ['c'])
+
+
+class BulkFetchTests(TestCase):
+    """Streamed /api/bulk-fetch/ with cursors, whitelisted filters and watermarks (core/bulk_fetch.py)."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+        from core.models import College
+        User = get_user_model()
+        self.user = User.objects.create_user(username='fetcher', password='x')
+        self.colleges = [College.objects.create(name_ar=f'كلية {i}') for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def fetch(self, *requests):
+        import json
+        response = self.client.post('/api/bulk-fetch/', {'requests': list(requests)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_tables_are_paged_by_primary_key(self):
+        ids = sorted(c.cid for c in self.colleges)
+        data = self.fetch({'table': 'colleges', 'fields': ['name_ar'], 'limit': 2, 'after_pk': ids[0]})
+        self.assertEqual([row['name_ar'] for row in data['colleges']], ['كلية 1', 'كلية 2'])
+        self.assertEqual(data['_meta']['colleges']['next_after_pk'], ids[2])
+        data = self.fetch({'table': 'colleges', 'fields': ['cid'], 'limit': 5, 'after_pk': ids[2]})
+        self.assertEqual([row['cid'] for row in data['colleges']], ids[3:])
+        self.assertNotIn('next_after_pk', data['_meta']['colleges'])
+
+    def test_filters_are_whitelisted(self):
+        data = self.fetch(
+            {'table': 'users', 'fields': ['username'], 'filters': {'is_active': True}},
+            {'table': 'users', 'filters': {'password': 'x'}},
+            {'table': 'nope'},
+        )
+        self.assertEqual(data['users'], {'error': 'filter not allowed: password'})
+        self.assertEqual(data['nope'], {'error': 'unsupported table'})
+
+        data = self.fetch({'table': 'users', 'fields': ['username'], 'filters': {'is_active': [True]}})
+        self.assertEqual(data['users'], [{'username': 'fetcher'}])
+
+    def test_fields_are_whitelisted(self):
+        data = self.fetch(
+            {'table': 'users', 'fields': ['id', 'password']},
+            {'table': 'projects', 'fields': ['project_id', 'created_by__password']},
+            {'table': 'group_members', 'fields': ['id', 'user_id', 'group']},
+        )
+        self.assertEqual(data['users'], {'error': 'field not allowed: password'})
+        self.assertEqual(data['projects'], {'error': 'field not allowed: created_by__password'})
+        self.assertEqual(data['group_members'], [])
+        self.assertIn('group_members', data['_meta'])
+
+        data = self.fetch({'table': 'users'})
+        self.assertEqual(data['users'][0]['username'], 'fetcher')
+        self.assertNotIn('password', data['users'][0])
+
+    def test_since_skips_unchanged_tables(self):
+        from core.models import College
+        watermark = self.fetch({'table': 'colleges', 'fields': ['cid']})['_meta']['colleges']['watermark']
+        data = self.fetch({'table': 'colleges', 'fields': ['cid'], 'since': watermark})
+        self.assertEqual(data['colleges'], [])
+        self.assertTrue(data['_meta']['colleges']['unchanged'])
+
+        College.objects.create(name_ar='كلية جديدة')
+        data = self.fetch({'table': 'colleges', 'fields': ['cid'], 'since': watermark})
+        self.assertEqual(len(data['colleges']), 6)
+        self.assertNotEqual(data['_meta']['colleges']['watermark'], watermark)
+
+
+class ChangeLogSyncTests(TestCase):
+    """Change log and /api/sync/ deltas (core/change_log.py)."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        override = override_settings(CHANGE_LOG={'SETTLE_SECONDS': 0})
+        override.enable()
+        self.addCleanup(override.disable)
+        User = get_user_model()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='syncer', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_are_collapsed_per_row(self):
+        from core.models import College, Department
+        start = self.sync()['next']
+        with self.captureOnCommitCallbacks(execute=True):
+            college = College.objects.create(name_ar='كلية')
+            department = Department.objects.create(college=college, name='قسم')
+            college.name_ar = 'كلية العلوم'
+            college.save()
+            department_id = department.pk
+            department.delete()
+
+        data = self.sync(start)
+        self.assertFalse(data['reset'])
+        self.assertEqual(data['changes']['colleges']['upsert'],
+                         [{'cid': college.cid, 'name_ar': 'كلية العلوم', 'name_en': None, 'branch': None}])
+        self.assertEqual(data['changes']['departments'], {'upsert': [], 'delete': [department_id]})
+        self.assertEqual(self.sync(data['next'])['changes'], {})
+
+    def test_saves_of_unsynced_fields_are_not_logged(self):
+        from core.models import ChangeLogEntry
+        before = ChangeLogEntry.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(ChangeLogEntry.objects.count(), before)
+
+    def test_bulk_location_creation_is_logged(self):
+        from core.locations import LocationPath, LocationResolver
+        start = self.sync()['next']
+        with self.captureOnCommitCallbacks(execute=True):
+            LocationResolver().ensure([LocationPath('جامعة', 'كلية الحاسوب', 'قسم', 'برنامج', 'صنعاء')])
+        data = self.sync(start, tables='colleges,programs')
+        self.assertEqual([row['name_ar'] for row in data['changes']['colleges']['upsert']], ['كلية الحاسوب'])
+        self.assertEqual([row['p_name'] for row in data['changes']['programs']['upsert']], ['برنامج'])
+        self.assertNotIn('departments', data['changes'])
+
+    def test_pruned_cursor_is_reset(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from core.change_log import prune_change_log
+        from core.models import College
+        with self.captureOnCommitCallbacks(execute=True):
+            College.objects.create(name_ar='أ')
+            College.objects.create(name_ar='ب')
+        report = prune_change_log(now=timezone.now() + timedelta(days=31))
+        self.assertGreater(report['rows'], 0)
+        data = self.sync(0)
+        self.assertTrue(data['reset'])
+        self.assertFalse(self.sync(data['next'])['reset'])
+
+    def test_entries_are_written_when_the_transaction_commits(self):
+        from core.models import ChangeLogEntry, College
+        start = self.sync()['next']
+        with self.captureOnCommitCallbacks(execute=True):
+            College.objects.create(name_ar='أ')
+            College.objects.create(name_ar='ب')
+            # a long transaction holds no sequence numbers the cursor could pass
+            self.assertEqual(ChangeLogEntry.objects.filter(seq__gt=start).count(), 0)
+        self.assertEqual(list(ChangeLogEntry.objects.filter(seq__gt=start).values_list('op', flat=True)),
+                         ['insert', 'insert'])
+
+    def test_unsettled_page_does_not_ask_for_more(self):
+        from django.test import override_settings
+        from core.models import College
+        start = self.sync()['next']
+        with self.captureOnCommitCallbacks(execute=True):
+            College.objects.create(name_ar='أ')
+            College.objects.create(name_ar='ب')
+        with override_settings(CHANGE_LOG={'SETTLE_SECONDS': 60}):
+            data = self.sync(start, limit=1)
+        self.assertEqual(data['next'], start)
+        self.assertFalse(data['has_more'])
+        self.assertTrue(self.sync(start, limit=1)['has_more'])
+
+
+class ProjectSearchTests(TestCase):
+    """Arabic-aware project search index and BM25 ranking (core/search.py)."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+        from django.core.cache import cache
+        from core.models import Project, ProjectState
+        cache.clear()  # role profiles cached by earlier tests for the same user id
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(username='admin', password='x')
+        state = ProjectState.objects.create(name='Pending')
+        self.library = Project.objects.create(
+            title='نظام إدارة المكتبة', description='تطبيق ويب للمكتبة الجامعية', tools='Django, React',
+            state=state, start_date=2024,
+        )
+        self.clinic = Project.objects.create(
+            title='تطبيق حجز مواعيد العيادة', description='نظام حجز يعتمد على الهاتف', tools='Flutter',
+            field='الصحة', state=state, start_date=2024,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_tokens_ignore_arabic_spelling_variants(self):
+        from core.search import tokenize
+        self.assertEqual(tokenize('المَكتبة'), tokenize('مكتبه'))
+        self.assertEqual(tokenize('إدارة الأنظمة'), tokenize('اداره انظمه'))
+        self.assertEqual(tokenize('في والنظام'), ['نظام'])
+
+    def test_index_follows_saves(self):
+        from core.search import rank_projects
+        self.assertEqual([pid for pid, _ in rank_projects('مكتبه')], [self.library.pk])
+        self.library.title = 'منصة التعلم'
+        self.library.description = 'دروس'
+        self.library.save()
+        self.assertEqual(rank_projects('مكتبه'), [])
+        self.library.delete()
+        self.assertEqual(rank_projects('منصه'), [])
+
+    def test_search_ranks_title_matches_first(self):
+        data = self.client.get('/api/projects/search/', {'q': 'نظام حجز'}).json()
+        self.assertEqual([p['project_id'] for p in data], [self.clinic.pk, self.library.pk])
+        self.assertGreater(data[0]['score'], data[1]['score'])
+
+    def test_list_search_and_tool_filter_use_the_index(self):
+        data = self.client.get('/api/projects/', {'search': 'اداره المكتبه'}).json()
+        self.assertEqual([p['project_id'] for p in data['results']], [self.library.pk])
+        data = self.client.get('/api/projects/', {'tools': 'flutter'}).json()
+        self.assertEqual([p['project_id'] for p in data['results']], [self.clinic.pk])
+
+    def test_tool_filter_falls_back_for_values_without_terms(self):
+        from core.models import Project
+        Project.objects.filter(pk=self.clinic.pk).update(tools='C++, Qt')
+        data = self.client.get('/api/projects/', {'tools': 'C++'}).json()
+        self.assertEqual([p['project_id'] for p in data['results']], [self.clinic.pk])
+
+    def test_rebuild_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from core.models import ProjectSearchPosting
+        ProjectSearchPosting.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertTrue(ProjectSearchPosting.objects.filter(project=self.clinic, term='عياده', field='title').exists())
+
+    def test_migration_backfills_existing_projects(self):
+        from importlib import import_module
+        from django.apps import apps
+        from core.models import ProjectSearchDocument, ProjectSearchPosting
+        # the migration's frozen tokenizer indexes like core.search did when it was written
+        indexed = set(ProjectSearchPosting.objects.values_list('project_id', 'field', 'term', 'tf'))
+        lengths = dict(ProjectSearchDocument.objects.values_list('project_id', 'length'))
+        ProjectSearchPosting.objects.all().delete()
+        ProjectSearchDocument.objects.all().delete()
+        import_module('core.migrations.0024_project_search_index').backfill_search_index(apps, None)
+        self.assertTrue(ProjectSearchPosting.objects.filter(project=self.library, term='مكتبه').exists())
+        self.assertEqual(set(ProjectSearchPosting.objects.values_list('project_id', 'field', 'term', 'tf')), indexed)
+        self.assertEqual(dict(ProjectSearchDocument.objects.values_list('project_id', 'length')), lengths)
+
+
+class NormalizedNameTests(TestCase):
+    """normalized_name shadow columns (NormalizedNameMixin, core/arabic.py)."""
+
+    def test_save_keeps_normalized_name_current(self):
+        from core.models import University
+        uni = University.objects.create(uname_ar='جَامعة  إب')
+        self.assertEqual(uni.normalized_name, 'جامعه اب')
+        uni.uname_ar = 'جامعة الحديدة'
+        uni.save(update_fields=['uname_ar'])
+        self.assertTrue(University.objects.filter(normalized_name='جامعه الحديده').exists())
+
+    def test_resolver_matches_spelling_variants(self):
+        from core.locations import LocationPath, LocationResolver
+        from core.models import College, University
+        LocationResolver().ensure([LocationPath('جامعة تعز', 'كلية الهندسة', None, None, 'تعز')])
+        resolver = LocationResolver()
+        path = LocationPath('جامعه تعز', 'كليه الهندسه', None, None, 'تَعز')
+        resolver.ensure([path])
+        self.assertEqual(University.objects.count(), 1)
+        self.assertEqual(College.objects.get().normalized_name, 'كليه الهندسه')
+        self.assertEqual(resolver.resolve(*path).college_id, College.objects.get().pk)
+
+
+class FuzzyLocationMatchTests(TestCase):
+    """Trigram matching of location names on import (core/fuzzy_names.py, LocationResolver)."""
+
+    def setUp(self):
+        from core.locations import LocationPath, LocationResolver
+        LocationResolver().ensure([LocationPath('جامعة تعز', 'كلية الهندسة', 'قسم الحاسوب', None, 'تعز')])
+
+    def test_close_names_are_mapped_instead_of_duplicated(self):
+        from core.locations import LocationPath, LocationResolver
+        from core.models import College, Department
+        resolver = LocationResolver()
+        paths = [
+            LocationPath('جامعة تعز', 'كليه هندسه', 'قسم الحاسوب', None, 'تعز'),
+            LocationPath('جامعة تعز', 'كلية الطب', 'قسم الجراحة', None, 'تعز'),
+            LocationPath('جامعة تعز', 'كلية طب', 'قسم الجراحة', None, 'تعز'),
+        ]
+        resolver.ensure(paths)
+        self.assertEqual(
+            sorted(College.objects.values_list('name_ar', flat=True)), ['كلية الطب', 'كلية الهندسة']
+        )
+        self.assertEqual(Department.objects.filter(name='قسم الجراحة').count(), 1)
+        engineering = College.objects.get(name_ar='كلية الهندسة')
+        self.assertEqual(resolver.resolve(*paths[0]).college_id, engineering.pk)
+        self.assertEqual(resolver.resolve(*paths[1]), resolver.resolve(*paths[2]))
+
+    def test_suggest_reports_matches_without_creating(self):
+        from core.locations import LocationPath, LocationResolver
+        from core.models import College
+        paths = [
+            (2, LocationPath('جامعة تعز', 'كلية الهندسه', 'قسم الحاسب', None, 'تعز')),
+            (3, LocationPath('جامعة تعز', 'كلية الهندسه', 'قسم الحاسب', None, 'تعز')),
+            (4, LocationPath('جامعة تعز', 'كلية الهندسة والعلوم', None, None, 'تعز')),
+        ]
+        matches = {m['value']: m for m in LocationResolver().suggest(paths)}
+        self.assertEqual(College.objects.count(), 1)
+        self.assertEqual(set(matches), {'قسم الحاسب', 'كلية الهندسة والعلوم'})
+        self.assertEqual(matches['قسم الحاسب']['match'], 'قسم الحاسوب')
+        self.assertEqual((matches['قسم الحاسب']['row'], matches['قسم الحاسب']['rows']), (2, 2))
+        self.assertFalse(matches['قسم الحاسب']['auto_mapped'])
+        self.assertFalse(matches['كلية الهندسة والعلوم']['auto_mapped'])
+        self.assertEqual(matches['كلية الهندسة والعلوم']['match'], 'كلية الهندسة')
+
+    def test_names_differing_by_number_stay_distinct(self):
+        from core.fuzzy_names import NameIndex, can_auto_map
+        from core.locations import LocationPath, LocationResolver
+        from core.models import Department, Program
+        index = NameIndex(['physics 1'])
+        self.assertFalse(can_auto_map('physics 2', index.best('physics 2'), 0.5))
+        self.assertTrue(can_auto_map('physics ١', index.best('physics ١'), 0.5))
+
+        resolver = LocationResolver()
+        paths = [
+            LocationPath('جامعة تعز', 'كلية الهندسة', 'قسم الحاسوب', 'Physics 1', 'تعز'),
+            LocationPath('جامعة تعز', 'كلية الهندسة', 'قسم الحاسوب', 'Physics 2', 'تعز'),
+            LocationPath('جامعة تعز', 'كلية الهندسة', 'قسم 1', None, 'تعز'),
+            LocationPath('جامعة تعز', 'كلية الهندسة', 'قسم 2', None, 'تعز'),
+        ]
+        resolver.ensure(paths)
+        self.assertEqual(sorted(Program.objects.values_list('p_name', flat=True)), ['Physics 1', 'Physics 2'])
+        self.assertEqual(Department.objects.count(), 3)
+        self.assertNotEqual(resolver.resolve(*paths[0]).program_id, resolver.resolve(*paths[1]).program_id)
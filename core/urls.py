@@ -29,6 +29,7 @@ from core.views.location_views import (
     CollegeProgramsView,
     DepartmentViewSet,
     FetchRelatedToUniversity,
+    LocationTreeView,
     UniversityViewSet,
     universitycollegeviewset,
     ProgramViewSet
@@ -45,6 +46,7 @@ from core.views import (
     NotificationViewSet,
     UserRolesViewSet,
     bulk_fetch,
+    sync,
     respond_to_group_request,
     dean_stats,
     SupervisorGroupViewSet,
@@ -52,7 +54,9 @@ from core.views import (
     CollegeViewSet,
     BranchViewSet,
     StudentViewSet,
-    CityViewSet
+    CityViewSet,
+    ImportJobViewSet,
+    NotificationJobViewSet,
 )
 
 # =========================
@@ -82,6 +86,8 @@ router.register(r'university-colleges', universitycollegeviewset, basename='univ
 router.register(r'students', StudentViewSet, basename='students')
 router.register(r'cities', CityViewSet, basename='cities')
 router.register(r'ratings', ProjectRatingViewSet)
+router.register(r'import-jobs', ImportJobViewSet, basename='import-job')
+router.register(r'notification-jobs', NotificationJobViewSet, basename='notification-job')
 
 router.register(
     r'fetch-related-to-university',
@@ -114,6 +120,13 @@ urlpatterns = [
         name='college-programs'
     ),
 
+    # One cached University -> Branch -> College -> Department -> Program tree
+    path(
+        'locations/tree/',
+        LocationTreeView.as_view(),
+        name='location-tree'
+    ),
+
     # (Useful for DepartmentDetails page)
     path(
         'departments/<int:dept_id>/programs/',
@@ -181,6 +194,7 @@ urlpatterns = [
 
     path('dropdown-data/', dropdown_data, name='dropdown-data'),
     path('bulk-fetch/', bulk_fetch, name='bulk-fetch'),
+    path('sync/', sync, name='sync'),
     path('dean-stats/', dean_stats, name='dean-stats'),
     path('csrf/', get_csrf_token, name='get-csrf'),
 
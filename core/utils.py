@@ -1,10 +1,9 @@
 # core/utils.py
 
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from .models import NotificationLog, GroupInvitation, ApprovalRequest, SystemSettings
-from django.core.mail import send_mail
-from django.conf import settings
 
 # ==============================================================================
 # 1. دوال الإشعارات
@@ -33,30 +32,20 @@ class NotificationService:
             related_approval=related_approval,
         )
         
-        # إرسال البريد الإلكتروني (يمكن جعله async مع Celery)
-        NotificationService.send_email_notification(notification)
+        # البريد الإلكتروني يُرسل على دفعات من المجدول (core/notification_email.py)
+        # بدل اتصال SMTP داخل الطلب
         
         return notification
     
     @staticmethod
     def send_email_notification(notification):
         """
-        إرسال إشعار عبر البريد الإلكتروني
+        إرسال إشعار عبر البريد الإلكتروني الآن (بدون انتظار الدفعة التالية)
         """
+        from .notification_email import send_notification_emails
         try:
-            subject = f"[{notification.get_notification_type_display()}] {notification.title}"
-            message = f"{notification.message}\n\nتم الإرسال في: {notification.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [notification.recipient.email],
-                fail_silently=True,
-            )
-            
-            notification.is_sent_email = True
-            notification.save()
+            if send_notification_emails([notification.pk]):
+                notification.is_sent_email = True
         except Exception as e:
             print(f"خطأ في إرسال البريد: {str(e)}")
     
@@ -82,10 +71,8 @@ class NotificationService:
         """
         الحصول على عدد الإشعارات غير المقروءة
         """
-        return NotificationLog.objects.filter(
-            recipient=user,
-            is_read=False
-        ).count()
+        from .notification_counters import get_unread_count
+        return get_unread_count(user.pk)
     
     @staticmethod
     def get_user_notifications(user, limit=20):
@@ -120,22 +107,14 @@ class InvitationService:
         if existing:
             return existing, False
         
-        # إنشاء دعوة جديدة
-        invitation = GroupInvitation.objects.create(
-            group=group,
-            invited_student=invited_student,
-            invited_by=invited_by,
-        )
-        
-        # إرسال إشعار للطالب المدعو
-        NotificationService.create_notification(
-            recipient=invited_student,
-            notification_type='invitation',
-            title=f'دعوة للانضمام إلى مجموعة {group.group_name}',
-            message=f'تم دعوتك من قبل {invited_by.name} للانضمام إلى مجموعة {group.group_name}. لديك 48 ساعة للرد على الدعوة.',
-            related_group=group,
-            related_user=invited_by,
-        )
+        # إنشاء دعوة جديدة؛ إشعار الطالب المدعو يُضاف لصندوق الأحداث في نفس المعاملة
+        # (core/signals.py) ويُرسل في الخلفية
+        with transaction.atomic():
+            invitation = GroupInvitation.objects.create(
+                group=group,
+                invited_student=invited_student,
+                invited_by=invited_by,
+            )
         
         return invitation, True
     
@@ -267,25 +246,16 @@ class ApprovalService:
         if not current_approver:
             return None, 'لم يتم العثور على موافق'
         
-        approval_request = ApprovalRequest.objects.create(
-            approval_type=approval_type,
-            group=group,
-            project=project,
-            requested_by=requested_by,
-            current_approver=current_approver,
-            approval_level=approval_level,
-        )
-        
-        # إشعار الموافق
-        NotificationService.create_notification(
-            recipient=current_approver,
-            notification_type='approval',
-            title=f'طلب موافقة جديد',
-            message=f'لديك طلب موافقة جديد من نوع {approval_request.get_approval_type_display()}',
-            related_group=group,
-            related_project=project,
-            related_approval=approval_request,
-        )
+        # إشعار الموافق يُضاف لصندوق الأحداث في نفس المعاملة (core/signals.py)
+        with transaction.atomic():
+            approval_request = ApprovalRequest.objects.create(
+                approval_type=approval_type,
+                group=group,
+                project=project,
+                requested_by=requested_by,
+                current_approver=current_approver,
+                approval_level=approval_level,
+            )
         
         return approval_request, None
     
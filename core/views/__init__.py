@@ -8,3 +8,4 @@ from .stats import *
 from .invitations import *
 from .staffs import *
 from .location_views import *
+from .import_jobs import *
@@ -16,11 +16,13 @@ from core.models import (
 )
 
 from core.serializers.groups import (
-    GroupProgramSerializer, GroupSerializer, GroupDetailSerializer
+    GroupProgramSerializer, GroupSerializer, GroupDetailSerializer, GROUP_LIST_PREFETCH
 )
 from core.serializers.approvals import GroupCreateSerializer
 from core.permissions import PermissionManager
 from core.notification_manager import NotificationManager
+from core.bulk_fetch import bump_bulk_fetch_version
+from core.change_log import record_changes
 from core.serializers import SupervisorGroupSerializer
 
 
@@ -42,6 +44,12 @@ class SupervisorGroupViewSet(viewsets.ReadOnlyModelViewSet):
                 groupsupervisors__type__in=["supervisor", "co_supervisor"]
             )
             .select_related("project")
+            .prefetch_related(
+                "groupmembers_set__user",
+                "groupsupervisors__user",
+                "program_groups__program__department__college__branch__university",
+                "program_groups__program__department__college__branch__city",
+            )
             .distinct()
         )
 
@@ -57,14 +65,16 @@ class GroupViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
 
+        qs = Group.objects.select_related("project__state").prefetch_related(*GROUP_LIST_PREFETCH)
+
         if PermissionManager.is_admin(user):
-            return Group.objects.all()
+            return qs
 
         if PermissionManager.is_supervisor(user):
-            return Group.objects.filter(groupsupervisors_set__user=user).distinct()
+            return qs.filter(groupsupervisors_set__user=user).distinct()
 
         if PermissionManager.is_student(user):
-            return Group.objects.filter(groupmembers__user=user).distinct()
+            return qs.filter(groupmembers__user=user).distinct()
 
         return Group.objects.none()
 
@@ -117,15 +127,20 @@ class GroupViewSet(viewsets.ModelViewSet):
                 GroupMembers.objects.bulk_create([
                     GroupMembers(user=s, group=group) for s in students
                 ])
+                bump_bulk_fetch_version('group_members')
+                record_changes(
+                    'group_members',
+                    GroupMembers.objects.filter(group=group).values_list('id', flat=True),
+                    'insert',
+                )
 
-                for s in students:
-                    NotificationManager.create_notification(
-                        recipient=s,
-                        notification_type='invitation',
-                        title='تمت إضافتك إلى مجموعة',
-                        message=f'قام المشرف {user.name or user.username} بإضافتك إلى مجموعة. أعضاء المجموعة: {members_text}',
-                        related_group=group
-                    )
+                NotificationManager.notify_users(
+                    [s.id for s in students],
+                    notification_type='invitation',
+                    title='تمت إضافتك إلى مجموعة',
+                    message=f'قام المشرف {user.name or user.username} بإضافتك إلى مجموعة. أعضاء المجموعة: {members_text}',
+                    related_group=group
+                )
 
                 return Response({
                     "message": "تم إنشاء المجموعة وإضافة الطلاب بنجاح",
@@ -164,33 +179,40 @@ class GroupViewSet(viewsets.ModelViewSet):
                     is_fully_confirmed=False
                 )
 
-                def process_invitations(user_ids, role_name):
-                    for u_id in user_ids:
-                        if not u_id:
-                            continue
-
+                def process_invitations(invitations):
+                    approvals = []
+                    for u_id, role_name in invitations:
                         is_creator = int(u_id) == request.user.id
-
-                        approval = GroupMemberApproval.objects.create(
+                        approvals.append(GroupMemberApproval(
                             request=group_req,
-                            user_id=u_id,
+                            user_id=int(u_id),
                             role=role_name,
                             status='accepted' if is_creator else 'pending',
                             responded_at=timezone.now() if is_creator else None
+                        ))
+                    GroupMemberApproval.objects.bulk_create(approvals)
+
+                    # (request, user) فريد: نقرأ المعرفات بدل الاعتماد على bulk_create (MySQL)
+                    approval_ids = dict(
+                        GroupMemberApproval.objects.filter(request=group_req).values_list('user_id', 'id')
+                    )
+                    sender = request.user.name or request.user.username
+                    NotificationManager.bulk_create_notifications(
+                        NotificationLog(
+                            recipient_id=a.user_id,
+                            notification_type='invitation',
+                            title="دعوة انضمام لمجموعة",
+                            message=f"دعاك {sender} لطلب مجموعة رقم: {group_req.id}",
+                            related_id=approval_ids[a.user_id]
                         )
+                        for a in approvals if a.status == 'pending'
+                    )
 
-                        if not is_creator:
-                            NotificationLog.objects.create(
-                                recipient_id=u_id,
-                                notification_type='invitation',
-                                title="دعوة انضمام لمجموعة",
-                                message=f"دعاك {request.user.name or request.user.username} لطلب مجموعة رقم: {group_req.id}",
-                                related_id=approval.id
-                            )
-
-                process_invitations(student_ids, 'student')
-                process_invitations(supervisor_ids, 'supervisor')
-                process_invitations(co_supervisor_ids, 'co_supervisor')
+                process_invitations(
+                    [(u_id, 'student') for u_id in student_ids if u_id]
+                    + [(u_id, 'supervisor') for u_id in supervisor_ids if u_id]
+                    + [(u_id, 'co_supervisor') for u_id in co_supervisor_ids if u_id]
+                )
 
                 return Response({
                     "message": "تم إنشاء طلب المجموعة بنجاح وإرسال الإشعارات للأعضاء",
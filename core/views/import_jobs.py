@@ -0,0 +1,32 @@
+from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core.import_jobs import resume_import_job
+from core.models import ImportJob
+from core.serializers.imports import ImportJobSerializer
+
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    متابعة مهام الاستيراد في الخلفية: GET للتقدم (الصفوف المعالجة، الأخطاء، الوقت المتبقي)
+    و POST resume/ لاستئناف مهمة فاشلة من آخر دفعة محفوظة
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ImportJobSerializer
+
+    def get_queryset(self):
+        qs = ImportJob.objects.all()
+        if not self.request.user.is_superuser:
+            qs = qs.filter(created_by=self.request.user)
+        kind = self.request.query_params.get('kind')
+        if kind:
+            qs = qs.filter(kind=kind)
+        return qs
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        job = self.get_object()
+        if not resume_import_job(job):
+            return Response({"error": "Job is already running or completed"}, status=400)
+        return Response(self.get_serializer(job).data, status=202)
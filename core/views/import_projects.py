@@ -6,17 +6,16 @@ from openpyxl.utils import get_column_letter
 
 from django.db import transaction
 from django.http import HttpResponse
-from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.views.decorators.csrf import csrf_exempt
 
-from core.models import (
-    User, Project, ProjectState, University, 
-    College, Department, City, Branch, Role, Staff, Program, Student, AcademicAffiliation
-)
+from core.arabic import clean_text
+from core.import_jobs import start_import_job, wants_background
+from core.project_import import ProjectImporter, location_matches
+from core.serializers.imports import ImportJobSerializer
 
 # ==========================================================
 # Header Mapping (Maintained exactly as your current order)
@@ -42,19 +41,12 @@ AR_HEADER_MAP = {
     "ارقام هواتف الطلاب": "students_phones",
 }
 
-PROJECT_TYPE_MAP = {
-    "حكومي": "Governmental",
-    "شركات خارجية": "External",
-    "مقترح": "Proposed",
-}
-
 REQUIRED_KEYS = ["title", "description", "start_year", "university", "college", "department"]
 
 # ==========================================================
 # Helpers
 # ==========================================================
 def _str(v): return "" if v is None else str(v).strip()
-def _normalize(v): return " ".join(_str(v).split())
 def _to_int(v):
     try: return int(float(_str(v)))
     except: return None
@@ -88,6 +80,17 @@ def read_excel_projects(file_obj):
     except Exception as e:
         return [], [{"row": 0, "message": f"فشل قراءة الملف: {str(e)}"}]
 
+# ==========================================================
+# Row Writer
+# ==========================================================
+def commit_project_rows(rows, locations=None):
+    """
+    كتابة صفوف (excel_row, row) وإرجاع (stats, row_errors) عبر ProjectImporter.
+    يستدعيها import_projects_commit ومهام الاستيراد في الخلفية (core/import_jobs.py) دفعةً دفعة.
+    """
+    return ProjectImporter(locations=locations).run(rows)
+
+
 # ==========================================================
 # Commit Import Logic
 # ==========================================================
@@ -101,152 +104,18 @@ def import_projects_commit(request):
     rows, file_errors = read_excel_projects(f)
     if file_errors: return Response({"errors": file_errors}, status=400)
 
-    created_projects = 0
-    updated_projects = 0
-    created_users = 0
-
-    # Ensure base objects exist
-    supervisor_role, _ = Role.objects.get_or_create(type="Supervisor", defaults={"role_type": "Faculty"})
-    state_obj, _ = ProjectState.objects.get_or_create(name="Accepted")
+    if wants_background(request):
+        job = start_import_job("projects", f, request.user)
+        return Response(ImportJobSerializer(job).data, status=202)
 
-    # 1. Helper Function Defined inside the view
-    def create_import_user(full_name, default_username, phone=None):
-        name_parts = full_name.split()
-        first_name = name_parts[0] if len(name_parts) > 0 else ""
-        last_name = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
-        
-        if len(name_parts) > 1:
-            generated_username = f"{name_parts[0]}_{name_parts[-1]}"
-        else:
-            generated_username = default_username
-
-        user_obj, created = User.objects.get_or_create(
-            username=generated_username,
-            defaults={
-                "first_name": first_name,
-                "last_name": last_name,
-                "name": "", 
-                "phone": phone
-            }
-        )
-        if created:
-            user_obj.set_password("123456")
-            user_obj.save()
-        return user_obj, created
-
-    # 2. The Main Loop (All logic must be inside here)
+    # Resolve the location hierarchy once, then write projects/users/students in bulk
     with transaction.atomic():
-        for excel_row, row in rows:
-            # --- A. Hierarchy Setup ---
-            uni_name = _normalize(row.get("university"))
-            if not uni_name: continue
-            
-            uni, _ = University.objects.get_or_create(uname_ar=uni_name)
-            city_name = _normalize(row.get("city")) or "صنعاء"
-            city_obj, _ = City.objects.get_or_create(bname_ar=city_name)
-            branch_obj, _ = Branch.objects.get_or_create(university=uni, city=city_obj)
-            col, _ = College.objects.get_or_create(branch=branch_obj, name_ar=_normalize(row.get("college")))
-            dep, _ = Department.objects.get_or_create(college=col, name=_normalize(row.get("department")))
-            
-            prog_name = _normalize(row.get("program"))
-            prog_obj = None
-            if prog_name:
-                prog_obj, _ = Program.objects.get_or_create(department=dep, p_name=prog_name)
-
-            # --- B. Project Creation ---
-            raw_type = _normalize(row.get("project_type"))
-            db_project_type = PROJECT_TYPE_MAP.get(raw_type, 'Proposed')
-
-            p, project_created = Project.objects.update_or_create(
-                title=_normalize(row["title"]),
-                defaults={
-                    "title_en": _normalize(row.get("title_en")),
-                    "project_type": db_project_type,
-                    "description": _str(row.get("description")),
-                    "start_date": _to_int(row.get("start_year")),
-                    "end_date": _to_int(row.get("end_year")),
-                    "field": _str(row.get("field")),
-                    "tools": _str(row.get("tools")),
-                    "state": state_obj,
-                    "university": uni,
-                    "branch": branch_obj,
-                    "college": col,
-                    "department": dep,
-                    "program": prog_obj,
-                }
-            )
-
-            # --- C. Staff/Supervisor Processing (INSIDE LOOP) ---
-            sup_full_name = _normalize(row.get("supervisor_first_name"))
-            if sup_full_name:
-                backup_username = f"sup_{uni.pk}_{excel_row}"
-                sup_user, u_created = create_import_user(sup_full_name, backup_username)
-                
-                if u_created: created_users += 1
-                
-                Staff.objects.get_or_create(user=sup_user, defaults={"role": supervisor_role})
-                AcademicAffiliation.objects.get_or_create(
-                    user=sup_user, university=uni, college=col, department=dep,
-                    defaults={'start_date': timezone.now().date()}
-                )
-                p.created_by = sup_user 
-                p.save()
-
-            # --- D. Students Processing (INSIDE LOOP) ---
-            s_names = [_normalize(x) for x in _str(row.get("students_names")).split(",") if _normalize(x)]
-            s_ids = [_normalize(x) for x in _str(row.get("students_ids")).split(",") if _normalize(x)]
-            s_phones = [_normalize(x) for x in _str(row.get("students_phones")).split(",") if _normalize(x)]
-
-            for i, full_name in enumerate(s_names):
-                sid = s_ids[i] if i < len(s_ids) else None 
-                sphone = s_phones[i] if i < len(s_phones) else None
-                
-                if sid:
-                    name_parts = full_name.split()
-                    s_user, s_user_created = User.objects.get_or_create(
-                        username=sid,
-                        defaults={
-                            "first_name": name_parts[0] if name_parts else "",
-                            "last_name": " ".join(name_parts[1:]) if len(name_parts) > 1 else "",
-                            "name": "",
-                            "phone": sphone
-                        }
-                    )
-                    if s_user_created:
-                        s_user.set_password("123456")
-                        s_user.save()
-                else:
-                    backup_sid = f"std_{p.id}_{i}"
-                    s_user, s_user_created = create_import_user(full_name, backup_sid, sphone)
-
-                if s_user_created: created_users += 1
-
-                Student.objects.update_or_create(
-                    user=s_user,
-                    defaults={
-                        "student_id": sid or s_user.username,
-                        "phone": sphone,
-                        "university": uni,
-                        "college": col,
-                        "department": dep,
-                        "program": prog_obj,
-                        "status": 'active'
-                    }
-                )
-
-                AcademicAffiliation.objects.get_or_create(
-                    user=s_user, university=uni, college=col, department=dep,
-                    defaults={'start_date': timezone.now().date()}
-                )
-
-            if project_created: created_projects += 1
-            else: updated_projects += 1
+        stats, row_errors = commit_project_rows(rows)
 
     return Response({
         "message": "تم الاستيراد بنجاح 🎉",
-        "created_projects": created_projects,
-        "updated_projects": updated_projects,
-        "users_created": created_users
+        **stats,
+        "row_errors": row_errors,
     })
 
 # ==========================================================
@@ -277,7 +146,9 @@ def import_projects_validate(request):
         "total_rows": len(rows),
         "valid_rows": valid_rows,
         "invalid_rows": len(errors),
-        "errors": errors
+        "errors": errors,
+        # أسماء كلية/قسم/برنامج قريبة من الموجود: تُربط تلقائياً عند الاستيراد أو تُقترح
+        "location_matches": location_matches(rows),
     })
 
 # ==========================================================
@@ -407,7 +278,7 @@ def validate_project_rows(rows):
         
         # 1. Check Required Fields
         for key in REQUIRED_KEYS:
-            if not _normalize(row.get(key)):
+            if not clean_text(row.get(key)):
                 # We use the Arabic name from our map for the error message
                 ar_name = [k for k, v in AR_HEADER_MAP.items() if v == key][0]
                 row_errors.append({
@@ -436,8 +307,8 @@ def validate_project_rows(rows):
 
         # 3. Check Students Data Consistency
         # Ensure if names are provided, IDs are also provided (standard practice)
-        s_names = [_normalize(x) for x in _str(row.get("students_names")).split(",") if _normalize(x)]
-        s_ids = [_normalize(x) for x in _str(row.get("students_ids")).split(",") if _normalize(x)]
+        s_names = [clean_text(x) for x in _str(row.get("students_names")).split(",") if clean_text(x)]
+        s_ids = [clean_text(x) for x in _str(row.get("students_ids")).split(",") if clean_text(x)]
         
         if len(s_names) > 0 and len(s_ids) == 0:
             row_errors.append({
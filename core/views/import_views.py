@@ -7,7 +7,10 @@ from django.utils.dateparse import parse_date
 
 import openpyxl
 
+from core.arabic import normalize_arabic
+from core.import_jobs import start_import_job, wants_background
 from core.models import User, Role, UserRoles, AcademicAffiliation, University
+from core.serializers.imports import ImportJobSerializer
 
 
 # ---------------------------
@@ -142,6 +145,89 @@ def validate_rows(rows):
     return valid, errors
 
 
+def commit_user_rows(valid):
+    """
+    كتابة صفوف صالحة (ناتج validate_rows) وإرجاع الإحصائيات.
+    يستدعيها import_users_commit ومهام الاستيراد في الخلفية (core/import_jobs.py) دفعةً دفعة.
+    """
+    created_users = 0
+    updated_users = 0
+    roles_assigned = 0
+    affiliations_created = 0
+
+    for item in valid:
+        email = item["email"]
+        username = item["username"]
+        first_name = item["first_name"]
+        last_name = item["last_name"]
+        role_norm = item["role_norm"]
+        uname_ar = item["university_name_ar"]
+        start_date = item["start_date"]
+
+        # 1) Create or Update User
+        user_obj = User.objects.filter(email__iexact=email).first()
+        if not user_obj:
+            user_obj = User.objects.filter(username__iexact=username).first()
+
+        if user_obj:
+            user_obj.email = email
+            user_obj.username = username
+            user_obj.first_name = first_name
+            user_obj.last_name = last_name
+            user_obj.name = f"{first_name} {last_name}".strip()
+            user_obj.save()
+            updated_users += 1
+        else:
+            user_obj = User.objects.create(
+                username=username,
+                email=email,
+                first_name=first_name,
+                last_name=last_name,
+                name=f"{first_name} {last_name}".strip(),
+            )
+            user_obj.set_password("password123")  # اختياري
+            user_obj.save()
+            created_users += 1
+
+        # 2) Assign Role (keep it role)
+        role_obj = Role.objects.filter(type__iexact=role_norm).first()
+        if role_obj:
+            _, created = UserRoles.objects.get_or_create(user=user_obj, role=role_obj)
+            if created:
+                roles_assigned += 1
+
+        # 3) University (create if not exists)
+        uni = University.objects.filter(normalized_name=normalize_arabic(uname_ar)).first()
+        if not uni:
+            uni = University.objects.create(uname_ar=uname_ar)
+
+        # 4) AcademicAffiliation
+        # unique_together = (user, university, start_date)
+        aff, created = AcademicAffiliation.objects.get_or_create(
+            user=user_obj,
+            university=uni,
+            start_date=start_date,
+            defaults={
+                "college": None,
+                "department": None,
+                "end_date": None,
+            }
+        )
+        if created:
+            affiliations_created += 1
+        else:
+            # تحديث إن لزم (هنا نضمن الجامعة/التاريخ ثابتين)
+            aff.university = uni
+            aff.save()
+
+    return {
+        "created_users": created_users,
+        "updated_users": updated_users,
+        "roles_assigned": roles_assigned,
+        "affiliations_created": affiliations_created,
+    }
+
+
 # ---------------------------
 # API Endpoints
 # ---------------------------
@@ -206,85 +292,18 @@ def import_users_commit(request):
             "message": "Fix validation errors then retry commit."
         }, status=400)
 
-    created_users = 0
-    updated_users = 0
-    roles_assigned = 0
-    affiliations_created = 0
+    if wants_background(request):
+        job = start_import_job("users", f, request.user)
+        return Response(ImportJobSerializer(job).data, status=202)
 
     with transaction.atomic():
-        for item in valid:
-            email = item["email"]
-            username = item["username"]
-            first_name = item["first_name"]
-            last_name = item["last_name"]
-            role_norm = item["role_norm"]
-            uname_ar = item["university_name_ar"]
-            start_date = item["start_date"]
-
-            # 1) Create or Update User
-            user_obj = User.objects.filter(email__iexact=email).first()
-            if not user_obj:
-                user_obj = User.objects.filter(username__iexact=username).first()
-
-            if user_obj:
-                user_obj.email = email
-                user_obj.username = username
-                user_obj.first_name = first_name
-                user_obj.last_name = last_name
-                user_obj.name = f"{first_name} {last_name}".strip()
-                user_obj.save()
-                updated_users += 1
-            else:
-                user_obj = User.objects.create(
-                    username=username,
-                    email=email,
-                    first_name=first_name,
-                    last_name=last_name,
-                    name=f"{first_name} {last_name}".strip(),
-                )
-                user_obj.set_password("password123")  # اختياري
-                user_obj.save()
-                created_users += 1
-
-            # 2) Assign Role (keep it role)
-            role_obj = Role.objects.filter(type__iexact=role_norm).first()
-            if role_obj:
-                _, created = UserRoles.objects.get_or_create(user=user_obj, role=role_obj)
-                if created:
-                    roles_assigned += 1
-
-            # 3) University (create if not exists)
-            uni = University.objects.filter(uname_ar__iexact=uname_ar).first()
-            if not uni:
-                uni = University.objects.create(uname_ar=uname_ar)
-
-            # 4) AcademicAffiliation
-            # unique_together = (user, university, start_date)
-            aff, created = AcademicAffiliation.objects.get_or_create(
-                user=user_obj,
-                university=uni,
-                start_date=start_date,
-                defaults={
-                    "college": None,
-                    "department": None,
-                    "end_date": None,
-                }
-            )
-            if created:
-                affiliations_created += 1
-            else:
-                # تحديث إن لزم (هنا نضمن الجامعة/التاريخ ثابتين)
-                aff.university = uni
-                aff.save()
+        stats = commit_user_rows(valid)
 
     return Response({
         "total_rows": len(rows),
         "valid_rows": len(valid),
         "invalid_rows": 0,
-        "created_users": created_users,
-        "updated_users": updated_users,
-        "roles_assigned": roles_assigned,
-        "affiliations_created": affiliations_created,
+        **stats,
         "errors": [],
         "message": "Import completed successfully."
     })
@@ -14,6 +14,8 @@ from core.serializers.location import ProgramSerializer
 # Add this near the top with your imports
 from rest_framework.permissions import BasePermission
 from core.permissions import PermissionManager
+from django.utils.http import parse_etags
+from core.location_tree import TREE_LEVELS, find_subtree, get_location_tree
 
 # -------------------------------------------------------------------
 # Custom DRF Permission for creating departments
@@ -228,3 +230,40 @@ class FetchRelatedToUniversity(viewsets.ModelViewSet):
             'university': university_serializer.data,
             'branches': branch_serializer.data
         })
+
+
+class LocationTreeView(APIView):
+    """
+    GET /api/locations/tree/
+    شجرة جامعة -> فرع -> كلية -> قسم -> برنامج كاملة من الكاش (core/location_tree.py).
+    ?university= / ?branch= / ?college= / ?department= تعيد الشجرة الفرعية لهذه العقدة.
+    ETag هو رقم نسخة الشجرة: If-None-Match بنفس القيمة يعيد 304 بدون جسم.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        filters = {}
+        for param, _, _ in TREE_LEVELS[:-1]:
+            value = request.query_params.get(param)
+            if value in (None, ''):
+                continue
+            try:
+                filters[param] = int(value)
+            except ValueError:
+                return Response({"error": f"Invalid {param} id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        version, tree = get_location_tree()
+        etag = f'"{version}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            # الشجرة الفرعية تتبع نسخة الشجرة كاملة، فنفس ETag يصلح لكل الروابط
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags or f'W/{etag}' in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = find_subtree(tree, **filters)
+        if data is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, headers=headers)
@@ -1,28 +1,55 @@
 from rest_framework import viewsets,permissions
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 
 
 from core.models import (
-  NotificationLog
+  NotificationLog, NotificationJob
 )
 from core.serializers.notifications import (
+   NotificationJobSerializer,
    NotificationLogSerializer,
 )
 
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
-from core.models import NotificationLog  # تأكدي من استيراد الموديل الصحيح
+from core.models import NotificationLog, User  # تأكدي من استيراد الموديل الصحيح
+from core.notification_counters import get_unread_counts, invalidate_unread_counts
+from core.import_jobs import wants_background
+from core.notification_jobs import resume_notification_job, start_notification_job
+from core.notification_manager import NotificationManager, SystemNotificationManager
+from core.pagination import NotificationKeysetPagination
+from core.permissions import PermissionManager
 
 
 
 class NotificationViewSet(viewsets.ModelViewSet): # غيرتها لـ ModelViewSet ليعمل الحذف
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = NotificationLogSerializer
+    # صفحات بالمؤشر على الفهرس (recipient, -created_at) مع since للأحدث فقط
+    pagination_class = NotificationKeysetPagination
 
     def get_queryset(self):
         return NotificationLog.objects.filter(recipient=self.request.user).order_by('-created_at')
 
+    def filter_queryset(self, queryset):
+        """?is_read=true|false و ?notification_type=a,b في القائمة فقط"""
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        is_read = params.get('is_read')
+        if is_read:
+            value = is_read.strip().lower()
+            if value not in ('true', '1', 'false', '0'):
+                raise ParseError("is_read يجب أن تكون true أو false")
+            queryset = queryset.filter(is_read=value in ('true', '1'))
+        types = [t for t in params.get('notification_type', '').split(',') if t.strip()]
+        if types:
+            queryset = queryset.filter(notification_type__in=[t.strip() for t in types])
+        return queryset
+
     @action(detail=False, methods=['post'], url_path='mark-all-read')
     # def mark_all_read(self, request):
     #     #self.get_queryset().update(status='read')
@@ -32,9 +59,65 @@ class NotificationViewSet(viewsets.ModelViewSet): # غيرتها لـ ModelViewS
     def mark_all_read(self, _request):
         # التعديل هنا: نغير الحقل الصحيح is_read
         self.get_queryset().update(is_read=True)
+        # update لا يرسل إشارات العدادات
+        invalidate_unread_counts(self.request.user.pk)
         return Response({'status': 'success'})
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """العدد من عدادات الكاش (core/notification_counters.py) بدون COUNT على الجدول"""
+        return Response(get_unread_counts(request.user.pk))
         
     def destroy(self, _request, *args, **kwargs):
         notification = self.get_object()
         notification.delete()
         return Response(status=204)
+
+    @action(detail=False, methods=['post'], url_path='broadcast')
+    def broadcast(self, request):
+        """
+        إشعار جماعي (للإداريين): كل المستخدمين النشطين أو recipient_ids.
+        background=1 ينشئ NotificationJob (202) بدل الإرسال داخل الطلب.
+        """
+        if not PermissionManager.is_admin(request.user):
+            return Response({"detail": "ليس لديك صلاحية إرسال إشعار جماعي"}, status=403)
+        title = request.data.get('title')
+        message = request.data.get('message')
+        if not title or not message:
+            return Response({"error": "title و message مطلوبان"}, status=400)
+        notification_type = request.data.get('notification_type') or 'system_info'
+        recipient_ids = request.data.get('recipient_ids')
+        if recipient_ids is not None and not isinstance(recipient_ids, list):
+            return Response({"error": "recipient_ids يجب أن تكون قائمة"}, status=400)
+
+        if wants_background(request):
+            job = start_notification_job(request.user, notification_type, title, message, recipient_ids)
+            return Response(NotificationJobSerializer(job).data, status=202)
+
+        if recipient_ids is None:
+            count = SystemNotificationManager.notify_all_users(title, message, notification_type)
+        else:
+            ids = User.objects.filter(is_active=True, id__in=recipient_ids).values_list('id', flat=True)
+            count = NotificationManager.notify_users(ids.iterator(), notification_type, title, message)
+        return Response({'count': count})
+
+
+class NotificationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    متابعة الإشعارات الجماعية في الخلفية: GET للتقدم و POST resume/ للاستئناف
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = NotificationJobSerializer
+
+    def get_queryset(self):
+        qs = NotificationJob.objects.all()
+        if not self.request.user.is_superuser:
+            qs = qs.filter(created_by=self.request.user)
+        return qs
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        job = self.get_object()
+        if not resume_notification_job(job):
+            return Response({"error": "Job is already running or completed"}, status=400)
+        return Response(self.get_serializer(job).data, status=202)
@@ -1,8 +1,9 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated ,AllowAny
 from django.utils import timezone
+from django.db import transaction
 import django_filters
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Exists, OuterRef
@@ -14,7 +15,10 @@ from core.models import (
     AcademicAffiliation, ProjectState, GroupSupervisors, University,GroupMembers
 )
 from core.serializers import ProjectSerializer
+from core.serializers.groups import GROUP_LIST_PREFETCH
 from core.permissions import PermissionManager
+from core.pagination import ProjectKeysetPagination
+from core.search import ProjectSearchFilter, filter_matching, query_terms, rank_projects, search_index_config
 import logging
 from core.serializers import ProjectRatingSerializer
 
@@ -22,6 +26,25 @@ from core.serializers import ProjectRatingSerializer
 logger = logging.getLogger(__name__)
 
 
+# Everything ProjectSerializer walks (creator, groups, members, supervisors,
+# their roles and staff profiles, program links), so a page of projects is
+# rendered with a fixed number of queries whatever its size.
+PROJECT_LIST_PREFETCH = (
+    "created_by__userroles_set__role",
+    "created_by__staff_profiles__role",
+    *(f"groups__{path}" for path in GROUP_LIST_PREFETCH),
+)
+
+
+def project_list_queryset():
+    return (
+        Project.objects
+        .select_related("state", "created_by", "college", "department", "program", "branch", "university")
+        .prefetch_related(*PROJECT_LIST_PREFETCH)
+        .order_by("-start_date")
+    )
+
+
 class ProjectFilter(django_filters.FilterSet):
 
     # project state
@@ -59,8 +82,16 @@ class ProjectFilter(django_filters.FilterSet):
     # Other filters
     # -------------------------
     year = django_filters.NumberFilter(field_name="start_date")
-    tools = django_filters.CharFilter(field_name="tools", lookup_expr="icontains")
-    field = django_filters.CharFilter(field_name="field", lookup_expr="icontains")
+    # كل كلمات القيمة مطلوبة في الحقل، من فهرس البحث (core/search.py)
+    tools = django_filters.CharFilter(method="filter_indexed_field")
+    field = django_filters.CharFilter(method="filter_indexed_field")
+
+    def filter_indexed_field(self, queryset, name, value):
+        terms = query_terms(value)
+        if not terms:
+            # قيم لا كلمات مفهرسة فيها ("C"، "R"، "C++"): البحث النصي السابق
+            return queryset.filter(**{f"{name}__icontains": value})
+        return filter_matching(queryset, terms, field=name)
 
     def filter_supervisor(self, queryset, name, value):
         return queryset.filter(
@@ -104,23 +135,21 @@ class ProjectViewSet(viewsets.ModelViewSet):
     queryset = Project.objects.all().order_by("start_date")
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # keyset pagination owns the ordering (-start_date, project_id), so there
+    # is no OrderingFilter here: a client ordering would break the cursors
+    pagination_class = ProjectKeysetPagination
+    # ?search= من فهرس البحث (title, title_en, description, field, tools)
+    filter_backends = [DjangoFilterBackend, ProjectSearchFilter]
     filterset_class = ProjectFilter
-    search_fields = ["title", "description"]
-    ordering_fields = ["title", "start_date", "created_by__name", "state__name"]
 
     def get_queryset(self):
      user = self.request.user
+     profile = PermissionManager.get_role_profile(user)
 
-     qs = (
-        Project.objects
-        .select_related("state", "created_by", "college", "department", "program", "branch", "university")
-        .prefetch_related("groups", "groups__groupsupervisors__user")
-        .order_by("-start_date")
-     )
+     qs = project_list_queryset()
 
     # External users → only their projects
-     if UserRoles.objects.filter(user=user, role__type__icontains="External").exists():
+     if any("external" in (r or "").lower() for r in profile.role_types):
         qs = qs.filter(created_by=user)
 
     # Students → projects where they are members
@@ -143,10 +172,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
     # Dean → projects in their colleges
      elif PermissionManager.is_dean(user):
-        college_ids = list(
-            AcademicAffiliation.objects.filter(user=user).values_list("college_id", flat=True)
-        )
-        college_ids = [c for c in college_ids if c]
+        college_ids = profile.college_ids
         if college_ids:
             qs = qs.filter(college__cid__in=college_ids).distinct()
         else:
@@ -272,22 +298,43 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         return Response(self.get_serializer(project).data)
     
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        GET /api/projects/search/?q=...&limit=20
+        أفضل المشاريع ترتيباً (BM25) ضمن ما يراه المستخدم، مع بقية فلاتر القائمة؛
+        قائمة مشاريع (كما يتوقعها projectService.searchProjects) مع score لكل مشروع
+        """
+        query = request.query_params.get("q", "")
+        max_results = search_index_config()["MAX_RESULTS"]
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), max_results)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = rank_projects(query, self.filter_queryset(self.get_queryset()), limit)
+        projects = project_list_queryset().in_bulk([project_id for project_id, _ in ranked])
+        results = []
+        for project_id, score in ranked:
+            if project_id in projects:
+                data = self.get_serializer(projects[project_id]).data
+                data["score"] = round(score, 4)
+                results.append(data)
+        return Response(results)
+
     @action(detail=False, methods=["get"], url_path="public", permission_classes=[AllowAny])
     def public_projects(self, request):
      """
      Public endpoint used for homepage statistics and browsing.
-     Returns all projects without role-based filtering.
+     Returns projects without role-based filtering, one keyset page at a time.
      """
 
-     qs = (
-        Project.objects
-        .select_related("state", "created_by", "college", "department", "program", "branch", "university")
-        .prefetch_related("groups", "groups__groupsupervisors__user")
-        .order_by("-start_date")
-     )
+     qs = project_list_queryset()
+     qs = self.filter_queryset(qs)
 
-     serializer = self.get_serializer(qs, many=True)
-     return Response(serializer.data)
+     page = self.paginate_queryset(qs)
+     serializer = self.get_serializer(page, many=True)
+     return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=["post"], url_path="propose-project")
     def propose_project(self, request):
@@ -385,8 +432,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         # allow dean to edit projects that belong to their affiliated colleges
         if not user_can_edit and PermissionManager.is_dean(user):
-            college_ids = AcademicAffiliation.objects.filter(user=user).values_list('college_id', flat=True)
-            college_ids = [c for c in college_ids if c]
+            college_ids = PermissionManager.get_role_profile(user).college_ids
             if college_ids:
                 if Group.objects.filter(project=project, program_groups__program__department__college__in=college_ids).exists():
                     user_can_edit = True
@@ -415,14 +461,12 @@ class ProjectViewSet(viewsets.ModelViewSet):
         elif project.created_by == user:
             user_can_delete = True
         elif PermissionManager.is_admin(user):
-            user_affiliation = AcademicAffiliation.objects.filter(
-                user=user
-            ).order_by("-start_date").first()
+            user_affiliation = PermissionManager.get_role_profile(user).latest_affiliation
 
-            if user_affiliation and user_affiliation.college:
+            if user_affiliation and user_affiliation["college_id"]:
                 if Group.objects.filter(
                     project=project,
-                    program_groups__program__department__college=user_affiliation.college
+                    program_groups__program__department__college_id=user_affiliation["college_id"]
                 ).exists():
                     user_can_delete = True
 
@@ -502,15 +546,44 @@ class ProjectRatingViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         ip = request.META.get('REMOTE_ADDR')
-        project_id = request.data.get('project')
+        data = request.data.copy()
+        data['ip_address'] = ip
 
-        if ProjectRating.objects.filter(project_id=project_id, ip_address=ip).exists():
-            return Response(
-                {"error": "لقد قمت بتقييم هذا المشروع مسبقًا"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        project_id = serializer.validated_data['project'].pk
+
+        with transaction.atomic():
+            # lock the project row so the rating summary stays consistent
+            project = Project.objects.select_for_update().get(pk=project_id)
+
+            if ProjectRating.objects.filter(project_id=project_id, ip_address=ip).exists():
+                return Response(
+                    {"error": "لقد قمت بتقييم هذا المشروع مسبقًا"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            rating = serializer.save()
+            project.apply_rating_change(added=rating.rating)
 
-        request.data['ip_address'] = ip
-        return super().create(request, *args, **kwargs)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            project = Project.objects.select_for_update().get(pk=serializer.instance.project_id)
+            old_rating = ProjectRating.objects.get(pk=serializer.instance.pk).rating
+            rating = serializer.save()
+            if rating.project_id == project.pk:
+                project.apply_rating_change(added=rating.rating, removed=old_rating)
+            else:
+                project.apply_rating_change(removed=old_rating)
+                new_project = Project.objects.select_for_update().get(pk=rating.project_id)
+                new_project.apply_rating_change(added=rating.rating)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            project = Project.objects.select_for_update().get(pk=instance.project_id)
+            instance.delete()
+            project.apply_rating_change(removed=instance.rating)
 
 
@@ -6,8 +6,17 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import transaction
-from django.http import JsonResponse
-
+from django.http import JsonResponse, StreamingHttpResponse
+
+from core.bulk_fetch import (
+    BULK_FETCH_TABLES,
+    BulkFetchError,
+    plan_request,
+    stream_bulk_fetch,
+    table_versions,
+)
+from core.change_log import CHANGE_LOG_TABLES, change_log_config, changes_since, latest_seq
+from core.notification_counters import invalidate_unread_counts
 from core.serializers.users import (
     UserSerializer,
     StudentSerializer,
@@ -116,63 +125,62 @@ def bulk_fetch(request):
     POST body:
     {
       "requests": [
-        { "table": "projects", "fields": ["project_id", "title"] }
+        {
+          "table": "projects",
+          "fields": ["project_id", "title"],
+          "filters": {"college": 3, "state": [1, 2]},   // optional, whitelisted per table
+          "limit": 500, "after_pk": 0,                 // optional, pages in pk order
+          "since": "<watermark>"                       // optional, from a previous _meta
+        }
       ]
     }
+
+    Response (streamed):
+    {"projects": [...], ..., "_meta": {"projects": {"watermark", "count", "next_after_pk"?, "unchanged"?}}}
     """
-    mapping = {
-        'projects': Project,
-        'groups': Group,
-        'group_members': GroupMembers,
-        'group_supervisors': GroupSupervisors,
-        'users': User,
-        'staff': Staff,
-        'academic_affiliations': AcademicAffiliation,
-        'colleges': College,
-        'departments': Department,
-    }
+    reqs = request.data.get('requests', [])
+    if not isinstance(reqs, list):
+        return JsonResponse({'error': 'requests must be a list'}, status=400)
+
+    versions = table_versions({r.get('table') for r in reqs if r.get('table') in BULK_FETCH_TABLES})
+    plans = []
+    for r in reqs:
+        table = r.get('table') or 'unknown'
+        try:
+            plans.append((table, plan_request(r, request.user, versions.get(table))))
+        except BulkFetchError as e:
+            plans.append((table, {'error': str(e)}))
+
+    return StreamingHttpResponse(stream_bulk_fetch(plans), content_type='application/json')
+
+
+# =============================================================================
+# Delta Sync API
+# =============================================================================
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    """
+    GET /api/sync/?since=<seq>[&tables=projects,groups][&limit=500]
 
-    out = {}
+    {"since", "next", "has_more", "reset", "changes": {table: {"upsert": [rows], "delete": [ids]}}}
+    Without `since` (or with reset=true) the client reloads through bulk-fetch and continues from `next`.
+    """
+    if 'since' not in request.query_params:
+        return Response({'since': None, 'next': latest_seq(), 'has_more': False, 'reset': True, 'changes': {}})
     try:
-        reqs = request.data.get('requests', [])
-        import traceback
-
-        for r in reqs:
-            table = r.get('table')
-            if not table or table not in mapping:
-                out[table or 'unknown'] = {'error': 'unsupported table'}
-                continue
-
-            model = mapping[table]
-            if r.get('fields'):
-                fields = r.get('fields')
-            else:
-                pk = model._meta.pk.name
-                extra = [f.name for f in model._meta.fields if f.name != pk]
-                fields = [pk] + extra[:6]
-
-            try:
-                qs = model.objects.all().values(*fields)
-
-                if table == 'projects':
-                    user = request.user
-                    is_external = UserRoles.objects.filter(
-                        user=user,
-                        role__type__icontains='External'
-                    ).exists()
-                    if is_external:
-                        qs = qs.filter(created_by=user)
-
-                out[table] = list(qs)
-
-            except Exception as e:
-                out[table] = {'error': str(e), 'traceback': traceback.format_exc()}
-
-        return JsonResponse(out, safe=True)
+        since = int(request.query_params['since'])
+        limit = int(request.query_params.get('limit') or change_log_config()['PAGE_SIZE'])
+    except ValueError:
+        return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, change_log_config()['PAGE_SIZE']))
 
-    except Exception as e:
-        import traceback
-        return JsonResponse({'error': str(e), 'traceback': traceback.format_exc()}, status=400)
+    tables = [t for t in request.query_params.get('tables', '').split(',') if t]
+    unknown = [t for t in tables if t not in CHANGE_LOG_TABLES]
+    if unknown:
+        return Response({'error': f"unsupported tables: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(changes_since(since, request.user, tables=tables, limit=limit))
 
 
 # =============================================================================
@@ -200,6 +208,7 @@ def respond_to_group_request(request, approval_id):
                 related_id=approval_id,
                 notification_type='invitation'
             ).update(is_read=True, read_at=timezone.now())
+            invalidate_unread_counts(user.pk)
 
             if response_status == 'accepted':
                 check_and_finalize_group(member_status.request.id)
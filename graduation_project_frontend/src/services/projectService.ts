@@ -2,6 +2,22 @@ import api from './api';
 import { bulkFetch } from './bulkService';
 import { groupService } from './groupService';
 
+// Project lists (/projects/ and /projects/public/) are keyset-paginated:
+// { next, previous, page_size, results }. Follow `next` to get the whole list.
+const PROJECT_PAGE_SIZE = 100;
+
+async function fetchAllProjectPages(url: string, params?: any): Promise<any[]> {
+  const rows: any[] = [];
+  let response = await api.get(url, { params: { page_size: PROJECT_PAGE_SIZE, ...params } });
+  for (;;) {
+    const data = response.data;
+    if (Array.isArray(data)) return rows.concat(data);
+    rows.push(...(data?.results || []));
+    if (!data?.next) return rows;
+    response = await api.get(data.next);
+  }
+}
+
 
 // Basic supervisor interface
 export interface Supervisor {
@@ -141,9 +157,7 @@ export const projectService = {
 
   async getProjects(params?: any) {
     try {
-      const response = await api.get('projects/', { params });
-      // normalize data: either plain array or { results: [...] }
-      const data = Array.isArray(response.data) ? response.data : response.data?.results || [];
+      const data = await fetchAllProjectPages('projects/', params);
       console.log('[projectService] getProjects normalized data:', data);
       return data.map(mapBackendProject);
     } catch (error: any) {
@@ -158,12 +172,8 @@ export const projectService = {
   // Inside projectService
   async getPublicProjects(params?: any) {
     try {
-      // Pass params directly to the request
-      const response = await api.get('/projects/public/', { params });
-
-      // Normalize data: array or { results: [...] }
-      const data = Array.isArray(response.data) ? response.data : response.data?.results || [];
-
+      // Every page of the public catalogue (the homepage statistics count all of it)
+      const data = await fetchAllProjectPages('/projects/public/', params);
       return data.map(mapBackendProject);
     } catch (error: any) {
       console.error(
@@ -392,10 +402,10 @@ async getRatings(projectId: number): Promise<{ average: number; count: number }>
   // Add this inside projectService
   async getUniversityProjects(universityId: number) {
     try {
-      const response = await api.get('/projects/', {
-        params: { university: universityId }  // <-- filter by university
+      const data = await fetchAllProjectPages('/projects/', {
+        university: universityId  // <-- filter by university
       });
-      return (response.data as any[]).map(mapBackendProject);
+      return data.map(mapBackendProject);
     } catch (error) {
       console.error('[projectService] getUniversityProjects failed', error);
       return [];
@@ -404,13 +414,7 @@ async getRatings(projectId: number): Promise<{ average: number; count: number }>
 
   async getCollegeProjects(collegeId: number) {
     try {
-      const response = await api.get('/projects/', {
-        params: { college_id: collegeId }
-      });
-
-      const data = Array.isArray(response.data)
-        ? response.data
-        : response.data?.results || [];
+      const data = await fetchAllProjectPages('/projects/', { college_id: collegeId });
 
       return data.map(mapBackendProject);
     } catch (error) {
@@ -421,13 +425,7 @@ async getRatings(projectId: number): Promise<{ average: number; count: number }>
 
   async getDepartmentProjects(departmentId: number) {
     try {
-      const response = await api.get('/projects/', {
-        params: { department_id: departmentId }
-      });
-
-      const data = Array.isArray(response.data)
-        ? response.data
-        : response.data?.results || [];
+      const data = await fetchAllProjectPages('/projects/', { department_id: departmentId });
 
       return data.map(mapBackendProject);
     } catch (error) {
@@ -438,13 +436,7 @@ async getRatings(projectId: number): Promise<{ average: number; count: number }>
 
   async getProgramProjects(programId: number) {
     try {
-      const response = await api.get('/projects/', {
-        params: { program_id: programId }
-      });
-
-      const data = Array.isArray(response.data)
-        ? response.data
-        : response.data?.results || [];
+      const data = await fetchAllProjectPages('/projects/', { program_id: programId });
 
       return data.map(mapBackendProject);
     } catch (error) {